@@ -2,10 +2,85 @@
 
 import tkinter as tk
 import customtkinter as ctk
+from concurrent.futures import ThreadPoolExecutor
 from app.scroll_picker import PickerButton
-from data.ingredients import INGREDIENTS, ALL_EFFECTS, EFFECT_TO_INGREDIENTS
+from app.virtual_list import VirtualList, LazyRows, Sections
+from rag.tracing import incr, timed
+from data.ingredients import INGREDIENTS, ALL_EFFECTS, INGREDIENT_MASK, effects_in_mask
 from itertools import combinations
 
+JOB_POLL_MS = 30
+
+# Buscas de alquimia fora do thread do Tk; cada painel só quer o pedido mais recente
+_ALCHEMY_POOL = ThreadPoolExecutor(max_workers=2, thread_name_prefix="alchemy")
+
+
+class JobCancelled(Exception):
+    """Raised inside a job by report() once a newer request superseded it."""
+
+
+class LatestJob:
+    """
+    Runs one pane's searches on _ALCHEMY_POOL. Each submit() supersedes the
+    previous one: a queued job is cancelled, a running one stops at its next
+    report() call, and only the newest result reaches deliver() (via after()).
+    """
+
+    def __init__(self, widget):
+        self.widget = widget
+        self.gen = 0
+        self.future = None
+        self._progress = None  # último report() do worker, lido no thread do Tk
+
+    def submit(self, work, deliver, progress=None):
+        """work(report) runs in the pool; report(value) hands `value` to progress() on the Tk thread."""
+        self.gen += 1
+        gen = self.gen
+        if self.future is not None and not self.future.done():
+            incr("alchemy.superseded")
+            self.future.cancel()
+        self._progress = None
+
+        def report(value=None):
+            if gen != self.gen:
+                raise JobCancelled()
+            self._progress = value
+
+        self.future = _ALCHEMY_POOL.submit(work, report)
+        self._poll(gen, self.future, deliver, progress, None)
+
+    def cancel(self):
+        self.gen += 1
+        if self.future is not None:
+            self.future.cancel()
+
+    def _poll(self, gen, future, deliver, progress, shown):
+        if gen != self.gen:
+            return
+        if not future.done():
+            value = self._progress
+            if progress is not None and value != shown:
+                progress(value)
+                shown = value
+            try:
+                self.widget.after(JOB_POLL_MS, self._poll, gen, future, deliver, progress, shown)
+            except tk.TclError:
+                self.cancel()  # janela fechada
+            return
+        try:
+            result = future.result()
+        except JobCancelled:
+            incr("alchemy.cancelled")
+            return
+        except Exception as e:
+            print(f"[WARNING] Alchemy search failed: {e}")
+            result = e
+        try:
+            deliver(result)
+        except tk.TclError:
+            pass
+
+
 class AlchemyMixin:
     def open_alchemy_calc(self):
         win = ctk.CTkToplevel(self)
@@ -37,27 +112,66 @@ class AlchemyMixin:
         pick2.grid(row=0, column=1, padx=6, pady=6)
         pick3.grid(row=0, column=2, padx=6, pady=6)
 
+        read_settings = self._alchemy_settings_row(top)
+
         out = ctk.CTkTextbox(win, wrap="word", fg_color=self.ENTRY_COLOR, text_color=self.TEXT_COLOR)
         out.pack(fill="both", expand=True, padx=12, pady=(0, 12))
 
+        job = LatestJob(out)
+
+        def show(text):
+            out.configure(state="normal"); out.delete("1.0", "end")
+            out.insert("1.0", text)
+            out.configure(state="disabled")
+
         def calc():
             picks = [v.get() for v in (var1, var2, var3) if v.get()]
-            fx = shared_effects(picks)
-            out.configure(state="normal"); out.delete("1.0", "end")
             if not picks:
-                out.insert("1.0", "Choose at least two ingredients to see shared effects.")
-            else:
-                out.insert("1.0", f"Ingredients: {', '.join(picks)}\n\n")
-                if fx:
-                    out.insert("end", "Shared effects:\n")
-                    for e in fx: out.insert("end", f" • {e}\n")
-                else:
-                    out.insert("end", "No shared effects between selected ingredients.")
-            out.configure(state="disabled")
+                show("Choose at least two ingredients to see shared effects.")
+                return
+            settings = read_settings()  # variáveis do Tk só no thread principal
+            show(f"Ingredients: {', '.join(picks)}\n\nCalculating…")
+            job.submit(lambda report: potion_report(picks, settings),
+                       lambda r: show(f"Calculation failed: {r}" if isinstance(r, Exception) else r))
 
         ctk.CTkButton(top, text="Calculate", command=calc).pack(pady=(0, 10))
         calc()
 
+    def _alchemy_settings_row(self, parent):
+        """Skill/perk controls shared by the alchemy windows; returns a reader for potions.py settings."""
+        s = getattr(self, "_alchemy_settings", None)
+        if s is None:
+            s = self._alchemy_settings = {
+                "skill": tk.StringVar(value="15"), "alchemist": tk.StringVar(value="0"),
+                "physician": tk.BooleanVar(value=False), "benefactor": tk.BooleanVar(value=False),
+                "poisoner": tk.BooleanVar(value=False), "fortify_alchemy": tk.StringVar(value="0"),
+            }
+        row = ctk.CTkFrame(parent, fg_color=self.FRAME_COLOR)
+        row.pack(fill="x", padx=10, pady=(0, 6))
+        ctk.CTkLabel(row, text="Alchemy", text_color=self.TEXT_COLOR).pack(side="left", padx=(6, 4))
+        ctk.CTkEntry(row, textvariable=s["skill"], width=50).pack(side="left")
+        ctk.CTkLabel(row, text="Alchemist", text_color=self.TEXT_COLOR).pack(side="left", padx=(10, 4))
+        ctk.CTkOptionMenu(row, variable=s["alchemist"], values=[str(i) for i in range(6)],
+                          width=60).pack(side="left")
+        for key, label in (("physician", "Physician"), ("benefactor", "Benefactor"), ("poisoner", "Poisoner")):
+            ctk.CTkCheckBox(row, text=label, variable=s[key], text_color=self.TEXT_COLOR,
+                            width=20).pack(side="left", padx=(10, 0))
+        ctk.CTkLabel(row, text="Fortify Alchemy %", text_color=self.TEXT_COLOR).pack(side="left", padx=(10, 4))
+        ctk.CTkEntry(row, textvariable=s["fortify_alchemy"], width=50).pack(side="left")
+
+        def read():
+            def num(var, lo, hi):
+                try:
+                    return max(lo, min(hi, float(var.get())))
+                except ValueError:
+                    return lo
+            return {
+                "skill": num(s["skill"], 0, 100), "alchemist": int(num(s["alchemist"], 0, 5)),
+                "physician": s["physician"].get(), "benefactor": s["benefactor"].get(),
+                "poisoner": s["poisoner"].get(), "fortify_alchemy": num(s["fortify_alchemy"], 0, 1000),
+            }
+        return read
+
     def open_ingredient_advisor(self):
         win = ctk.CTkToplevel(self)
         win.title("Ingredient Advisor")
@@ -72,28 +186,52 @@ class AlchemyMixin:
 
         tabs = ctk.CTkTabview(win, fg_color=self.FRAME_COLOR)
         tabs.pack(fill="both", expand=True, padx=12, pady=12)
-        t1 = tabs.add("By Effect"); t2 = tabs.add("By Inventory")
+        t1 = tabs.add("By Effect"); t2 = tabs.add("By Inventory"); t3 = tabs.add("Brew Plan")
 
         ctk.CTkLabel(t1, text="Choose desired effect:", text_color=self.TEXT_COLOR,
                      font=("Georgia", 15, "bold")).pack(anchor="w", padx=10, pady=(10, 6))
         eff_var = tk.StringVar(value=ALL_EFFECTS[0] if ALL_EFFECTS else "")
         eff_pick = PickerButton(t1, ALL_EFFECTS, eff_var, width=320, text_when_empty="Select an effect…")
         eff_pick.pack(anchor="w", padx=10, pady=(0, 10))
+        read_settings = self._alchemy_settings_row(t1)
+        sort_var = tk.StringVar(value="A–Z")
+        ctk.CTkSegmentedButton(t1, values=["A–Z", "Value", "Magnitude"], variable=sort_var
+                               ).pack(anchor="w", padx=10, pady=(0, 10))
 
-        out1 = ctk.CTkTextbox(t1, wrap="word", fg_color=self.ENTRY_COLOR, text_color=self.TEXT_COLOR)
+        out1 = VirtualList(t1, bg=self.ENTRY_COLOR, fg=self.TEXT_COLOR, extended=True)
         out1.pack(fill="both", expand=True, padx=10, pady=(0, 12))
 
+        job1 = LatestJob(out1)
+
         def run_by_effect():
+            # Todas as receitas entram; só as linhas visíveis são formatadas
             effect = eff_var.get()
-            recs = recipes_for_effect(effect)
-            out1.configure(state="normal"); out1.delete("1.0", "end")
-            out1.insert("1.0", f"Recipes for effect: {effect}\n\n")
-            if not recs:
-                out1.insert("end", "No recipes found in the current ingredient database.")
-            else:
-                for r in recs:
-                    out1.insert("end", " • " + " + ".join(r) + "\n")
-            out1.configure(state="disabled")
+            by = sort_var.get()
+            header = [f"Recipes for effect: {effect}", ""]
+            if effect not in ALL_EFFECTS:
+                job1.cancel()
+                out1.set_items(header + ["No recipes found in the current ingredient database."])
+                return
+            settings = read_settings()
+            out1.set_items(header + ["Searching…"])
+
+            def deliver(found):
+                if isinstance(found, Exception):
+                    out1.set_items(header + [f"Search failed: {found}"])
+                    return
+                table, rows, ev = found
+
+                def line(i):
+                    text = " • " + " + ".join(table.names(rows[i]))
+                    if ev is not None:
+                        text += f"  — {int(ev['value'][i])} gold, {effect} {_magnitude_text(effect, ev['magnitude'][i])}"
+                    return text
+                if not len(rows):
+                    out1.set_items(header + ["No recipes found in the current ingredient database."])
+                else:
+                    out1.set_items(Sections([header, LazyRows(len(rows), line)]))
+            job1.submit(lambda report: effect_rows(effect, settings, by="name" if by == "A–Z" else by.lower()),
+                        deliver)
 
         ctk.CTkButton(t1, text="Find Recipes", command=run_by_effect).pack(pady=(0, 10))
         run_by_effect()
@@ -103,79 +241,204 @@ class AlchemyMixin:
         inv_entry = ctk.CTkEntry(t2)
         inv_entry.pack(fill="x", padx=10, pady=(0, 8))
         inv_entry.insert(0, "Blue Mountain Flower, Wheat, Snowberries, Garlic")
-        out2 = ctk.CTkTextbox(t2, wrap="word", fg_color=self.ENTRY_COLOR, text_color=self.TEXT_COLOR)
+        out2 = VirtualList(t2, bg=self.ENTRY_COLOR, fg=self.TEXT_COLOR, extended=True)
         out2.pack(fill="both", expand=True, padx=10, pady=(0, 12))
 
+        job2 = LatestJob(out2)
+
         def run_by_inventory():
-            raw = inv_entry.get()
-            inventory = [x.strip() for x in raw.split(",")]
-            result = recommend_from_inventory(inventory)
-            out2.configure(state="normal"); out2.delete("1.0", "end")
-            if not result:
-                out2.insert("1.0", "No craftable effects with the provided inventory (or unknown names).")
-            else:
-                for eff, recs in result.items():
-                    out2.insert("end", f"\nEffect: {eff}\n")
-                    for r in recs:
-                        out2.insert("end", "  • " + " + ".join(r) + "\n")
-            out2.configure(state="disabled")
+            inventory = [x.strip() for x in inv_entry.get().split(",")]
+            out2.set_items(["Searching…"])
+
+            def progress(step):
+                if step:
+                    out2.set_items([f"Searching… {step[0]}/{step[1]} effects"])
+
+            def deliver(result):
+                if isinstance(result, Exception):
+                    out2.set_items([f"Search failed: {result}"])
+                    return
+                table, found = result
+                if not found:
+                    out2.set_items(["No craftable effects with the provided inventory (or unknown names)."])
+                    return
+                parts = []
+                for eff, rows in found:
+                    parts.append(["", f"Effect: {eff}"])
+                    parts.append(LazyRows(len(rows), lambda i, rows=rows: "  • " + " + ".join(table.names(rows[i]))))
+                out2.set_items(Sections(parts))
+            job2.submit(lambda report: inventory_rows(inventory, progress=report), deliver, progress)
 
         ctk.CTkButton(t2, text="Recommend", command=run_by_inventory).pack(pady=(0, 10))
         run_by_inventory()
 
+        ctk.CTkLabel(t3, text="Ingredients and how many you have (e.g. Wheat x3, 6 Blisterwort):",
+                     text_color=self.TEXT_COLOR, font=("Georgia", 15, "bold")).pack(anchor="w", padx=10, pady=(10, 6))
+        counts_entry = ctk.CTkEntry(t3)
+        counts_entry.pack(fill="x", padx=10, pady=(0, 8))
+        counts_entry.insert(0, "Blue Mountain Flower x6, Wheat x3, Blisterwort x4")
+        plan_settings = self._alchemy_settings_row(t3)
+        goal = ctk.CTkFrame(t3, fg_color=self.FRAME_COLOR); goal.pack(fill="x", padx=10, pady=(0, 8))
+        goal_var = tk.StringVar(value="Most gold")
+        ctk.CTkSegmentedButton(goal, values=["Most gold", "Strongest effect"], variable=goal_var
+                               ).pack(side="left", padx=(0, 10))
+        goal_eff = tk.StringVar(value="Restore Health")
+        PickerButton(goal, ALL_EFFECTS, goal_eff, width=240, text_when_empty="Effect…").pack(side="left")
+        out3 = ctk.CTkTextbox(t3, wrap="word", fg_color=self.ENTRY_COLOR, text_color=self.TEXT_COLOR)
+        out3.pack(fill="both", expand=True, padx=10, pady=(0, 12))
+
+        job3 = LatestJob(out3)
+
+        def show_plan(text):
+            out3.configure(state="normal"); out3.delete("1.0", "end")
+            out3.insert("1.0", text)
+            out3.configure(state="disabled")
+
+        def run_brew_plan():
+            from app.brewing import parse_counts
+            counts, unknown = parse_counts(counts_entry.get())
+            effect = goal_eff.get() if goal_var.get() == "Strongest effect" else None
+            settings = plan_settings()
+            show_plan("Optimizing…")
+
+            def work(report):
+                from app.brewing import optimize_brewing
+                from app.recipe_table import get_recipe_table
+                return optimize_brewing(get_recipe_table(), counts, settings, effect=effect,
+                                        checkpoint=report)
+
+            def deliver(result):
+                if isinstance(result, Exception):
+                    show_plan(f"Optimization failed: {result}")
+                else:
+                    show_brew_result(unknown, effect, result)
+            job3.submit(work, deliver)
+
+        def show_brew_result(unknown, effect, result):
+            out3.configure(state="normal"); out3.delete("1.0", "end")
+            if unknown:
+                out3.insert("end", f"Unknown ingredients ignored: {', '.join(unknown)}\n\n")
+            if not result["plan"]:
+                out3.insert("end", "Nothing worth brewing with these ingredients.")
+            else:
+                unit = f"{effect} total" if effect else "gold"
+                out3.insert("end", f"Brewing plan ({result['total']:.0f} {unit}):\n")
+                for names, times, each in result["plan"]:
+                    out3.insert("end", f"  {times}× " + " + ".join(names) + f"  ({each:.0f} each)\n")
+                if result["leftover"]:
+                    rest = ", ".join(f"{n} x{c}" for n, c in result["leftover"].items())
+                    out3.insert("end", f"\nLeft over: {rest}\n")
+                st = result["stats"]
+                proof = "optimal" if st["optimal"] else ("time limit reached" if st["timed_out"] else "best found")
+                out3.insert("end", f"\nSearch: {st['candidates']} recipes, {st['nodes']} nodes, "
+                                   f"{st['pruned']} pruned, greedy {st['greedy_total']:.0f}, "
+                                   f"{st['seconds'] * 1000:.0f} ms ({proof}).")
+            out3.configure(state="disabled")
+
+        ctk.CTkButton(t3, text="Optimize", command=run_brew_plan).pack(pady=(0, 10))
+
 # Pure logic helpers (can be reused or moved to a utils.py)
+# Tudo em máscaras de bits (data.ingredients): efeito em comum = AND das máscaras.
 def shared_effects(ingredients):
-    if not ingredients:
+    ingredients = list(dict.fromkeys(ingredients))  # o jogo não aceita o mesmo ingrediente duas vezes
+    if len(ingredients) < 2:
         return []
-    effect_counts = {}
-    for ing in ingredients:
-        for eff in INGREDIENTS.get(ing, []):
-            effect_counts[eff] = effect_counts.get(eff, 0) + 1
-    return sorted([e for e, c in effect_counts.items() if c >= 2])
+    masks = [INGREDIENT_MASK.get(ing, 0) for ing in ingredients]
+    shared = 0
+    for a, b in combinations(masks, 2):
+        shared |= a & b
+    return effects_in_mask(shared)
+
+@timed("alchemy.effect_rows")
+def effect_rows(effect, settings=None, by="name"):
+    """
+    (table, rows, ev) for every recipe with `effect`: table order for by="name",
+    else best first by "value" or "magnitude" (ev = potions.evaluate arrays).
+    """
+    from app.recipe_table import get_recipe_table  # numpy fica fora da partida do app
+    table = get_recipe_table()
+    rows = table.rows_with_effect(effect)
+    if by == "name":
+        return table, rows, None
+    from app.potions import rank_rows
+    rows, ev = rank_rows(table, rows, settings, by=by, effect=effect)
+    return table, rows, ev
 
 def recipes_for_effect(effect, max_results=60):
-    pool = EFFECT_TO_INGREDIENTS.get(effect, [])
-    if len(pool) < 2:
+    if effect not in ALL_EFFECTS:
         return []
+    # Linhas já estão na ordem (tamanho, nomes): os primeiros max_results bastam
+    table, rows, _ = effect_rows(effect)
+    return [table.names(r) for r in rows[:max_results]]
 
-    results = []
-    for r in combinations(pool, 2):
-        results.append(tuple(sorted(r)))
+def _magnitude_text(effect, amount):
+    from app.potions import DURATION_SCALED
+    return f"{amount:.0f} {'s' if effect in DURATION_SCALED else 'pts'}"
 
-    if len(pool) >= 3:
-        for r in combinations(pool, 3):
-            shared = shared_effects(list(r))
-            if effect in shared:
-                results.append(tuple(sorted(r)))
+def ranked_recipes_for_effect(effect, settings=None, by="value", max_results=60):
+    """[(ingredients, gold value, effect magnitude text)] best first, over every combination."""
+    if effect not in ALL_EFFECTS:
+        return []
+    table, rows, ev = effect_rows(effect, settings, by=by)
+    return [(table.names(r), int(ev["value"][i]), _magnitude_text(effect, ev["magnitude"][i]))
+            for i, r in enumerate(rows[:max_results])]
 
-    results.sort(key=lambda r: (len(r), r))
-    unique_results = sorted(list(set(results)), key=lambda r: (len(r), r))
-    return unique_results[:max_results]
+@timed("alchemy.potion_report")
+def potion_report(ingredients, settings=None):
+    """Calculator text for `ingredients`: shared effects, then the brewed potion's stats."""
+    from app.potions import describe_potion
+    ingredients = list(dict.fromkeys(ingredients))
+    lines = [f"Ingredients: {', '.join(ingredients)}", ""]
+    if len(ingredients) < 2:
+        lines.append("No potion: pick at least two different ingredients.")
+        return "\n".join(lines)
+    fx = shared_effects(ingredients)
+    if not fx:
+        lines.append("No shared effects between selected ingredients.")
+        return "\n".join(lines)
+    lines.append("Shared effects:")
+    lines += [f" • {e}" for e in fx]
+    kind, effects, value = describe_potion(ingredients, settings)
+    lines += ["", f"{kind} ({value} gold):"]
+    lines += [f" • {name}: {_amount(mag, dur)} — {gold} gold" for name, mag, dur, gold in effects]
+    return "\n".join(lines) + "\n"
 
-def recommend_from_inventory(inventory, max_results=40):
-    inv = [i.strip() for i in inventory if i.strip() in INGREDIENTS]
+def _amount(mag, dur):
+    if mag and dur:
+        return f"{mag} for {dur}s"
+    return f"{mag}" if mag else f"{dur}s"
+
+@timed("alchemy.inventory_rows")
+def inventory_rows(inventory, progress=None):
+    """
+    (table, [(effect, rows)]) for each effect craftable from `inventory`, rows
+    in table order. progress((done, total)) is called after each effect.
+    """
+    inv = sorted({i.strip() for i in inventory if i.strip() in INGREDIENTS})
     if not inv:
-        return {}
-    effect_counts = {}
-    for ing in inv:
-        for eff in INGREDIENTS[ing]:
-            effect_counts[eff] = effect_counts.get(eff, 0) + 1
-    craftable = {e for e, c in effect_counts.items() if c >= 2}
-
-    recipes = {}
-    for eff in sorted(craftable):
-        rs = []
-        for i in range(len(inv)):
-            for j in range(i + 1, len(inv)):
-                a, b = inv[i], inv[j]
-                if eff in set(INGREDIENTS[a]).intersection(INGREDIENTS[b]):
-                    rs.append((a, b))
-        for i in range(len(inv)):
-            for j in range(i + 1, len(inv)):
-                for k in range(j + 1, len(inv)):
-                    a, b, c = inv[i], inv[j], inv[k]
-                    if eff in set(INGREDIENTS[a]).intersection(INGREDIENTS[b], INGREDIENTS[c]):
-                        rs.append((a, b, c))
-        if rs:
-            recipes[eff] = sorted(rs, key=lambda r: (len(r), r))[:max_results]
-    return recipes
+        return None, []
+    from app.recipe_table import get_recipe_table
+    table = get_recipe_table()
+    usable = table.rows_within(inv)
+    effects = effects_in_mask(_craftable_mask(inv))
+    found = []
+    for k, eff in enumerate(effects, 1):
+        rows = table.rows_with_effect(eff, usable)
+        if len(rows):
+            found.append((eff, rows))
+        if progress is not None:
+            progress((k, len(effects)))
+    return table, found
+
+def recommend_from_inventory(inventory, max_results=40):
+    table, found = inventory_rows(inventory)
+    return {eff: [table.names(r) for r in rows[:max_results]] for eff, rows in found}
+
+def _craftable_mask(ingredients):
+    # Efeitos presentes em pelo menos dois ingredientes
+    seen = craftable = 0
+    for ing in ingredients:
+        mask = INGREDIENT_MASK[ing]
+        craftable |= seen & mask
+        seen |= mask
+    return craftable
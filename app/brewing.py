@@ -0,0 +1,171 @@
+# app/brewing.py
+# Plano de preparo com quantidades: quantas vezes fazer cada receita, dado o
+# estoque de cada ingrediente, para maximizar ouro ou a magnitude de um efeito.
+# Guloso para uma solução inicial + branch-and-bound com orçamento de tempo.
+
+import re
+import time
+
+import numpy as np
+
+from data.ingredients import INGREDIENTS, INGREDIENT_NAMES
+from rag.tracing import timed
+
+TIME_BUDGET = 0.5      # s
+MAX_CANDIDATES = 300   # receitas mais "densas" que entram na busca exata
+
+_COUNT = re.compile(r"^\s*(?:(\d+)\s*[x×]?\s+(.+?)|(.+?)\s*(?:[x×:]\s*|\s+)(\d+))\s*$", re.IGNORECASE)
+_INDEX = {name: j for j, name in enumerate(INGREDIENT_NAMES)}
+_LOWER = {name.lower(): name for name in INGREDIENTS}
+
+
+def parse_counts(raw):
+    """
+    "Blue Mountain Flower x6, 3 Wheat, Blisterwort: 4" -> ({name: count}, [unknown]).
+    A name without a number counts as 1.
+    """
+    counts, unknown = {}, []
+    for part in raw.split(","):
+        if not part.strip():
+            continue
+        m = _COUNT.match(part)
+        if m:
+            name, n = (m.group(2), m.group(1)) if m.group(1) else (m.group(3), m.group(4))
+        else:
+            name, n = part, 1
+        name = _LOWER.get(name.strip().lower())
+        if name is None:
+            unknown.append(part.strip())
+        else:
+            counts[name] = counts.get(name, 0) + int(n)
+    return counts, unknown
+
+
+def _candidates(table, counts, settings, effect):
+    from app.potions import evaluate
+    rows = table.rows_within([n for n, c in counts.items() if c > 0])
+    if not len(rows):
+        return rows, np.zeros(0)
+    ev = evaluate(table, rows, settings, effect=effect)
+    gain = ev["magnitude"] if effect else ev["value"].astype("float64")
+    keep = gain > 0
+    return rows[keep], gain[keep]
+
+
+@timed("alchemy.brew_plan")
+def optimize_brewing(table, counts, settings=None, effect=None, time_budget=TIME_BUDGET, checkpoint=None):
+    """
+    Maximizes total gold (effect=None) or total magnitude of `effect` over
+    brews that each consume one of every ingredient of a recipe-table row.
+    checkpoint() is called every 1024 search nodes and may raise to abandon the search.
+    Returns {"plan": [(names, times, gain each)], "total", "leftover", "stats"}.
+    """
+    t0 = time.perf_counter()
+    rows, gain = _candidates(table, counts, settings, effect)
+    size = table.size[rows].astype("float64")
+    # Ordem por ganho por unidade de ingrediente: boa para o guloso e para o limite
+    order = np.lexsort((-gain, -gain / size)) if len(rows) else np.zeros(0, dtype=int)
+    rows, gain, size = rows[order], gain[order], size[order]
+    members = [np.array([j for j in table.combo[r] if j >= 0]) for r in rows]
+    stock = {_INDEX[n]: c for n, c in counts.items() if c > 0}
+
+    # Guloso: receita mais densa enquanto houver estoque
+    left = dict(stock)
+    greedy = [0] * len(rows)
+    for k, ing in enumerate(members):
+        times = min(left[j] for j in ing)
+        if times > 0:
+            greedy[k] = times
+            for j in ing:
+                left[j] -= times
+    greedy_total = float(np.dot(greedy, gain)) if len(rows) else 0.0
+
+    # Branch-and-bound sobre as MAX_CANDIDATES receitas mais densas, com dois limites
+    # superiores (vale o menor; o segundo só no modo efeito, onde os ganhos quase não
+    # variam e a densidade não poda — em ouro ele custa mais do que economiza):
+    # - densidade: cada unidade restante de um ingrediente rende no máximo a melhor
+    #   densidade (ganho / nº de ingredientes) entre as receitas seguintes que o usam;
+    # - vagas: cada preparo gasta 2+ unidades de ingredientes "úteis" (no modo efeito,
+    #   os que têm o efeito), no máximo 1 de cada. Isso limita quantos preparos ainda
+    #   cabem; cada vaga rende no máximo a melhor receita seguinte, e cada receita
+    #   entra no máximo tantas vezes quanto o estoque dos seus ingredientes permite.
+    n = min(len(rows), MAX_CANDIDATES)
+    n_ing = len(INGREDIENT_NAMES)
+    ceiling = np.zeros((n + 1, n_ing))
+    useful = np.zeros((n + 1, n_ing), dtype=bool)
+    carriers = np.ones(n_ing, dtype=bool)
+    if effect:
+        carriers = np.array([effect in INGREDIENTS[name] for name in INGREDIENT_NAMES])
+    for k in range(n - 1, -1, -1):
+        ceiling[k] = ceiling[k + 1]
+        useful[k] = useful[k + 1]
+        for j in members[k]:
+            ceiling[k, j] = max(ceiling[k, j], gain[k] / size[k])
+        useful[k, members[k]] |= carriers[members[k]]
+    # Receitas seguintes em ordem de ganho; ingredientes com -1 -> posição extra de estoque infinito
+    by_gain = [k + np.argsort(-gain[k:n], kind="stable") for k in range(n)]
+    padded = np.full((n, 3), n_ing)
+    for k in range(n):
+        padded[k, :len(members[k])] = members[k]
+    stock_ext = np.full(n_ing + 1, np.inf)
+
+    def slot_bound(k):
+        units = left[useful[k]]
+        if not len(units):
+            return 0.0
+        total_units = units.sum()
+        slots = min(total_units // 2, total_units - units.max())
+        order = by_gain[k]
+        stock_ext[:n_ing] = left
+        caps = stock_ext[padded[order]].min(axis=1)
+        before = np.cumsum(caps) - caps
+        taken = np.clip(slots - before, 0, caps)
+        return float(taken @ gain[order])
+    best = {"total": greedy_total, "times": list(greedy)}
+    stats = {"candidates": len(rows), "searched": n, "nodes": 0, "pruned": 0,
+             "greedy_total": greedy_total, "optimal": n == len(rows), "timed_out": False}
+    deadline = t0 + time_budget
+    times = [0] * len(rows)
+    left = np.zeros(n_ing)
+    for j, c in stock.items():
+        left[j] = c
+
+    def search(k, total):
+        stats["nodes"] += 1
+        if stats["nodes"] & 1023 == 0:
+            if checkpoint is not None:
+                checkpoint()
+            if time.perf_counter() > deadline:
+                stats["timed_out"] = True
+                return
+        if total > best["total"] + 1e-9:
+            best["total"], best["times"] = total, list(times)
+        if k >= n:
+            return
+        if (total + float(left @ ceiling[k]) <= best["total"] + 1e-9
+                or effect and total + slot_bound(k) <= best["total"] + 1e-9):
+            stats["pruned"] += 1
+            return
+        ing = members[k]
+        most = int(min(left[j] for j in ing))
+        for t in range(most, -1, -1):
+            if stats["timed_out"]:
+                return
+            times[k] = t
+            left[ing] -= t
+            search(k + 1, total + t * gain[k])
+            left[ing] += t
+        times[k] = 0
+
+    search(0, 0.0)
+    if stats["timed_out"]:
+        stats["optimal"] = False
+
+    plan = [(table.names(rows[k]), t, float(gain[k])) for k, t in enumerate(best["times"]) if t]
+    used = {}
+    for names, t, _ in plan:
+        for name in names:
+            used[name] = used.get(name, 0) + t
+    leftover = {name: c - used.get(name, 0) for name, c in counts.items() if c - used.get(name, 0) > 0}
+    stats["seconds"] = time.perf_counter() - t0
+    return {"plan": plan, "total": best["total"], "leftover": leftover, "stats": stats}
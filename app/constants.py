@@ -13,6 +13,10 @@ TITLE_FONT = ("Georgia", 28)
 BODY_FONT = ("Georgia", 14)
 BUTTON_FONT = ("Georgia", 14, "bold")
 
+# Arquivo opcional com locais do mapa (CSV: name,x,y,category ou JSON equivalente);
+# sem ele, o mapa mostra só as cidades abaixo
+POI_FILES = ("data/poi.csv", "data/poi.json")
+
 # Cidades e suas coordenadas no mapa
 CITIES = {
     "Solitude":   (900, 160),
@@ -0,0 +1,92 @@
+# app/diagnostics.py
+# Painel de diagnóstico: latências (spans) e contadores do rag.tracing,
+# atualizado enquanto a janela está aberta, com exportação JSON/CSV.
+
+import os
+import time
+import tkinter as tk
+import customtkinter as ctk
+from rag.config import TRACE_DIR
+from rag.tracing import TRACER
+
+REFRESH_MS = 1000
+
+
+def format_snapshot(snap):
+    """Fixed-width text table of a TRACER.snapshot()."""
+    def ms(v):
+        return "-" if v is None else f"{v:.1f}" if v < 100 else f"{v:.0f}"
+
+    lines = [f"{'span':<26}{'count':>7}{'err':>5}{'mean':>9}{'p50':>9}{'p95':>9}{'max':>9}  (ms)"]
+    for name, s in snap["spans"].items():
+        lines.append(f"{name:<26}{s['count']:>7}{s['errors']:>5}{ms(s['mean_ms']):>9}"
+                     f"{ms(s['p50_ms']):>9}{ms(s['p95_ms']):>9}{ms(s['max_ms']):>9}")
+    if not snap["spans"]:
+        lines.append("(nothing measured yet)")
+    lines += ["", f"{'counter':<26}{'value':>7}"]
+    lines += [f"{name:<26}{n:>7}" for name, n in snap["counters"].items()]
+    recent = snap["recent"][-15:]
+    if recent:
+        lines += ["", "recent spans:"]
+        for r in reversed(recent):
+            when = time.strftime("%H:%M:%S", time.localtime(r["end"]))
+            where = f" (in {r['parent']})" if r["parent"] else ""
+            flag = "  ERROR" if r["error"] else ""
+            lines.append(f"  {when}  {r['name']:<24}{ms(r['ms']):>9}{where}{flag}")
+    return "\n".join(lines)
+
+
+class DiagnosticsMixin:
+    def open_diagnostics(self):
+        win = ctk.CTkToplevel(self)
+        win.title("Diagnostics")
+        win.geometry("860x560")
+        win.configure(fg_color=self.BG_COLOR)
+        try:
+            win.iconbitmap("media/skyrim_icon.ico")
+        except Exception:
+            pass
+
+        self._show_toplevel(win)
+
+        bar = ctk.CTkFrame(win, fg_color=self.FRAME_COLOR, corner_radius=10)
+        bar.pack(fill="x", padx=12, pady=(12, 6))
+        status = ctk.CTkLabel(bar, text="", text_color=self.TEXT_COLOR, anchor="w")
+
+        out = ctk.CTkTextbox(win, wrap="none", font=("Courier", 13),
+                             fg_color=self.ENTRY_COLOR, text_color=self.TEXT_COLOR)
+        out.pack(fill="both", expand=True, padx=12, pady=(0, 12))
+
+        def refresh():
+            out.configure(state="normal"); out.delete("1.0", "end")
+            out.insert("1.0", format_snapshot(TRACER.snapshot()))
+            out.configure(state="disabled")
+
+        def tick():
+            try:
+                if not win.winfo_exists():
+                    return
+                refresh()
+                win.after(REFRESH_MS, tick)
+            except tk.TclError:
+                pass  # janela fechada
+
+        def export(ext):
+            path = os.path.join(TRACE_DIR, time.strftime(f"trace_%Y%m%d_%H%M%S.{ext}"))
+            try:
+                TRACER.export(path)
+                print(f"[OK] Diagnostics exported to '{path}'.")
+                status.configure(text=f"Saved {path}")
+            except Exception as e:
+                print(f"[ERROR] Exporting diagnostics: {e}")
+                status.configure(text=f"Export failed: {e}")
+
+        def reset():
+            TRACER.reset()
+            refresh()
+
+        ctk.CTkButton(bar, text="Export JSON", width=110, command=lambda: export("json")).pack(side="left", padx=6, pady=8)
+        ctk.CTkButton(bar, text="Export CSV", width=110, command=lambda: export("csv")).pack(side="left", padx=6)
+        ctk.CTkButton(bar, text="Reset", width=80, command=reset).pack(side="left", padx=6)
+        status.pack(side="left", fill="x", expand=True, padx=10)
+        tick()
@@ -4,12 +4,24 @@ import os
 import platform
 import tkinter as tk
 from tkinter import messagebox
-from PIL import Image, ImageTk
 import customtkinter as ctk
-from app.constants import CITIES, BG_COLOR, FRAME_COLOR, TEXT_COLOR
+from concurrent.futures import ThreadPoolExecutor
+from app.constants import CITIES, POI_FILES, BG_COLOR, FRAME_COLOR, TEXT_COLOR
+from app.map_tiles import TilePyramid, TileLayer
+from rag.config import CACHE_DIR
+from rag.tracing import incr, timed
+
+REFINE_DELAY_MS = 150  # sem eventos de zoom/pan por esse tempo -> refina em LANCZOS
+REFINE_POLL_MS = 20
+PICK_RADIUS = 30  # px de tela para o clique direito "pegar" um local
+
+# Um worker basta: só a última visão pedida interessa
+_REFINE_POOL = ThreadPoolExecutor(max_workers=1, thread_name_prefix="map-refine")
 
 class MapWindowMixin:
     def open_map_window(self):
+        # numpy (marcadores/POIs) só entra quando o mapa é aberto, não na partida do app
+        from app.map_markers import MarkerLayer
         map_path = "media/skyrim_full_map.png"
         if not os.path.exists(map_path):
             messagebox.showerror("Map not found", "File 'skyrim_full_map.png' was not found.")
@@ -37,66 +49,198 @@ class MapWindowMixin:
         ctk.CTkButton(toolbar, text="+", width=36, command=lambda: self._map_zoom(step=1.1)).grid(row=0, column=2, padx=4)
         ctk.CTkButton(toolbar, text="Reset", command=self._map_reset_view).grid(row=0, column=3, padx=4)
 
+        self._map_search = ctk.CTkEntry(toolbar, placeholder_text="Find place…", width=200)
+        self._map_search.grid(row=0, column=4, padx=(12, 4))
+        self._map_search.bind("<Return>", lambda e: self._map_find_place())
+        self._map_info = ctk.CTkLabel(toolbar, text="Right-click a marker for its name.",
+                                      text_color=TEXT_COLOR, font=("Georgia", 12))
+        self._map_info.grid(row=0, column=5, padx=8)
+
         self._map_canvas = tk.Canvas(win, bg=BG_COLOR, highlightthickness=0)
         self._map_canvas.grid(row=1, column=0, padx=10, pady=10, sticky="nsew")
         win.grid_rowconfigure(1, weight=1)
         win.grid_columnconfigure(0, weight=1)
 
-        self._map_img_original = Image.open(map_path).convert("RGBA")
+        self._map_tiles = TileLayer(self._map_canvas, self._load_map_pyramid(map_path))
         self._map_scale = 1.0
         self._img_ofs_x = 10
         self._img_ofs_y = 10
         self._pan_start = None
-        self._overlay_ids = []
+        pois = self._load_poi_table()
+        self._map_markers = MarkerLayer(
+            self._map_canvas, pois.xs, pois.ys, pois.names,
+            colors=pois.marker_colors(), priority=pois.marker_priority(),
+        )
+        self._render_gen = 0          # cada pedido de render invalida os refinamentos anteriores
+        self._preview_pending = False
+        self._refine_job = None
+        self._refine_future = None    # resize em LANCZOS na fila/rodando no _REFINE_POOL
 
         self._render_map(first_time=True)
+        self._draw_route()
 
         # bindings
         self._map_canvas.bind("<ButtonPress-1>", self._on_pan_start)
         self._map_canvas.bind("<B1-Motion>", self._on_pan_move)
+        self._map_canvas.bind("<ButtonPress-3>", self._on_map_pick)
         self._map_canvas.bind("<MouseWheel>", self._on_wheel_zoom)
         self._map_canvas.bind("<Button-4>", lambda e: self._wheel_zoom_generic(e, 1))
         self._map_canvas.bind("<Button-5>", lambda e: self._wheel_zoom_generic(e, -1))
+        self._map_canvas.bind("<Configure>", lambda e: self._request_map_render())
 
         # IMPORTANT: mostrar primeiro (traz pra frente) e só depois maximizar
         self._show_toplevel(win)
         self._maximize_toplevel(win)
 
+    def _load_map_pyramid(self, map_path):
+        # A pirâmide é a mesma para todas as janelas de mapa; só é montada uma vez
+        pyramid = getattr(self, "_map_pyramid", None)
+        if pyramid is None or pyramid.image_path != map_path:
+            pyramid = self._map_pyramid = TilePyramid(map_path, CACHE_DIR)
+        return pyramid
+
+    def _load_poi_table(self):
+        from app.poi import load_poi_table
+        pois = getattr(self, "_map_pois", None)
+        if pois is None:
+            pois = self._map_pois = load_poi_table(POI_FILES, CACHE_DIR, CITIES)
+        return pois
+
+    def _describe_poi(self, i):
+        pois = self._map_pois
+        return f"{pois.names[i]} ({pois.categories[pois.cat[i]]})"
+
+    def _on_map_pick(self, event):
+        # Tela -> coordenadas do mapa; raio fixo em px de tela
+        mx = (self._map_canvas.canvasx(event.x) - self._img_ofs_x) / self._map_scale
+        my = (self._map_canvas.canvasy(event.y) - self._img_ofs_y) / self._map_scale
+        i = self._map_pois.nearest(mx, my, max_dist=PICK_RADIUS / self._map_scale)
+        self._map_info.configure(text=self._describe_poi(i) if i is not None else "Nothing here.")
+
+    def _map_find_place(self):
+        query = self._map_search.get().strip()
+        if not query:
+            return
+        found = self._map_pois.search_prefix(query, limit=1)
+        if not found:
+            self._map_info.configure(text=f"No place starts with '{query}'.")
+            return
+        i = found[0]
+        # Centraliza o local mantendo o zoom atual
+        w = self._map_canvas.winfo_width()
+        h = self._map_canvas.winfo_height()
+        self._img_ofs_x = w / 2 - float(self._map_pois.xs[i]) * self._map_scale
+        self._img_ofs_y = h / 2 - float(self._map_pois.ys[i]) * self._map_scale
+        self._map_info.configure(text=self._describe_poi(i))
+        self._request_map_render()
+
+    @timed("map.render")
     def _render_map(self, first_time=False):
-        ow, oh = self._map_img_original.size
-        disp_w = max(1, int(ow * self._map_scale))
-        disp_h = max(1, int(oh * self._map_scale))
-        self._map_img_display = self._map_img_original.resize((disp_w, disp_h), Image.LANCZOS)
-        self._map_tk = ImageTk.PhotoImage(self._map_img_display)
-
-        if first_time:
-            self._img_id = self._map_canvas.create_image(
-                self._img_ofs_x, self._img_ofs_y, image=self._map_tk, anchor="nw"
-            )
-        else:
-            self._map_canvas.itemconfig(self._img_id, image=self._map_tk)
-        self._map_canvas.coords(self._img_id, self._img_ofs_x, self._img_ofs_y)
-        self._redraw_city_markers()
-
-    def _redraw_city_markers(self):
-        for iid in getattr(self, "_overlay_ids", []):
+        # Só os tiles que cruzam a área visível do canvas são desenhados
+        self._map_tiles.render(self._map_scale, self._img_ofs_x, self._img_ofs_y)
+        self._map_markers.render(self._map_scale, self._img_ofs_x, self._img_ofs_y)
+
+    def show_route(self, route):
+        """Keeps `route` (rag.travel.Route) to be drawn on the map, now or when it opens."""
+        self._map_route = route
+        canvas = getattr(self, "_map_canvas", None)
+        try:
+            if canvas is not None and canvas.winfo_exists():
+                self._request_map_render()
+        except tk.TclError:
+            pass
+
+    def _draw_route(self):
+        # Uma única linha com tag "route", refeita a cada render (barato)
+        canvas = self._map_canvas
+        canvas.delete("route")
+        route = getattr(self, "_map_route", None)
+        if route is None or len(route.points) < 2:
+            return
+        coords = []
+        for x, y in route.points:
+            coords += [self._img_ofs_x + x * self._map_scale, self._img_ofs_y + y * self._map_scale]
+        canvas.create_line(*coords, fill="#f1c40f", width=3, dash=(8, 4), tags=("route",))
+        canvas.tag_raise(self._map_markers.TAG)
+
+    def _request_map_render(self):
+        """
+        Coalesces a burst of zoom/pan events: one cheap preview per idle tick,
+        then a single high-quality pass once the input has been quiet for
+        REFINE_DELAY_MS.
+        """
+        self._render_gen += 1
+        canvas = self._map_canvas
+        if not self._preview_pending:
+            self._preview_pending = True
+            canvas.after_idle(self._render_map_preview)
+        if self._refine_job is not None:
+            canvas.after_cancel(self._refine_job)
+        self._cancel_refine()  # a visão mudou: o resize pendente não serve mais
+        self._refine_job = canvas.after(REFINE_DELAY_MS, self._refine_map)
+
+    def _cancel_refine(self):
+        # Um worker só: um resize velho na fila atrasaria o da visão atual
+        future = self._refine_future
+        self._refine_future = None
+        if future is not None and future.cancel():
+            incr("map.refine_cancelled")
+
+    @timed("map.preview")
+    def _render_map_preview(self):
+        self._preview_pending = False
+        try:
+            self._map_tiles.render(self._map_scale, self._img_ofs_x, self._img_ofs_y, preview=True)
+            # Marcadores: transformação in-place pela tag + só os visíveis viram itens
+            self._map_markers.render(self._map_scale, self._img_ofs_x, self._img_ofs_y)
+            self._draw_route()
+        except tk.TclError:
+            pass  # janela fechada no meio do caminho
+
+    def _refine_map(self):
+        self._refine_job = None
+        gen = self._render_gen
+        tiles = self._map_tiles
+        try:
+            keys = tiles.missing_high_quality(self._map_scale, self._img_ofs_x, self._img_ofs_y)
+        except tk.TclError:
+            return
+        if not keys:
+            self._finish_refine(gen, [])
+            return
+        # Resize em LANCZOS fora do thread do Tk; o PhotoImage é criado no retorno.
+        # Já rodando não dá para cancelar o future: o worker para entre tiles quando fica velho
+        self._cancel_refine()
+        future = self._refine_future = _REFINE_POOL.submit(
+            timed("map.refine_resample")(tiles.resample_tiles), keys, lambda: gen != self._render_gen)
+        self._map_canvas.after(REFINE_POLL_MS, self._poll_refine, gen, future)
+
+    def _poll_refine(self, gen, future):
+        if gen != self._render_gen:
+            incr("map.refine_superseded")
+            return  # visão mudou; o próximo _refine_map já foi agendado
+        if not future.done():
             try:
-                self._map_canvas.delete(iid)
-            except Exception:
+                self._map_canvas.after(REFINE_POLL_MS, self._poll_refine, gen, future)
+            except tk.TclError:
                 pass
-        self._overlay_ids = []
-        r = 5
-        for name, (xi, yi) in CITIES.items():
-            x = self._img_ofs_x + xi * self._map_scale
-            y = self._img_ofs_y + yi * self._map_scale
-            dot = self._map_canvas.create_oval(
-                x - r, y - r, x + r, y + r, fill="#e74c3c", outline="#111111", width=1
-            )
-            self._overlay_ids.append(dot)
-            label = self._map_canvas.create_text(
-                x + 10, y - 8, text=name, fill="#e0dcd1", font=("Georgia", 11), anchor="w"
-            )
-            self._overlay_ids.append(label)
+            return
+        try:
+            resampled = future.result()
+        except Exception as e:
+            print(f"[WARNING] Map refine failed: {e}")
+            return
+        self._finish_refine(gen, resampled)
+
+    @timed("map.refine_install")
+    def _finish_refine(self, gen, resampled):
+        if gen != self._render_gen:
+            return
+        try:
+            self._map_tiles.install(resampled)
+            self._map_tiles.render(self._map_scale, self._img_ofs_x, self._img_ofs_y)
+        except tk.TclError:
+            pass
 
     def _on_pan_start(self, event):
         self._pan_start = (event.x, event.y)
@@ -107,10 +251,9 @@ class MapWindowMixin:
         dx = event.x - self._pan_start[0]
         dy = event.y - self._pan_start[1]
         self._pan_start = (event.x, event.y)
-        self._map_canvas.move(self._img_id, dx, dy)
-        self._img_ofs_x, self._img_ofs_y = self._map_canvas.coords(self._img_id)
-        for iid in self._overlay_ids:
-            self._map_canvas.move(iid, dx, dy)
+        self._img_ofs_x += dx
+        self._img_ofs_y += dy
+        self._request_map_render()
 
     def _on_wheel_zoom(self, event):
         self._wheel_zoom_generic(event, 1 if event.delta > 0 else -1)
@@ -131,8 +274,8 @@ class MapWindowMixin:
             h = self._map_canvas.winfo_height()
             focus = (w / 2, h / 2)
         fx, fy = focus
-        ox, oy = self._map_canvas.coords(self._img_id)
-        ow, oh = self._map_img_original.size
+        ox, oy = self._img_ofs_x, self._img_ofs_y
+        ow, oh = self._map_tiles.pyramid.size
         old_w = ow * prev
         old_h = oh * prev
         new_w = ow * new_scale
@@ -142,13 +285,13 @@ class MapWindowMixin:
         self._img_ofs_x = fx - relx * new_w
         self._img_ofs_y = fy - rely * new_h
         self._map_scale = new_scale
-        self._render_map(first_time=False)
+        self._request_map_render()
 
     def _map_reset_view(self):
         self._map_scale = 1.0
         self._img_ofs_x = 10
         self._img_ofs_y = 10
-        self._render_map(first_time=False)
+        self._request_map_render()
 
     def _maximize_toplevel(self, win):
         system = platform.system()
@@ -0,0 +1,159 @@
+# app/map_markers.py
+# Camada de marcadores do mapa: índice espacial em grade sobre as coordenadas
+# do mapa, só os marcadores visíveis viram itens do canvas, e zoom/pan movem
+# todos de uma vez pela tag (canvas.scale / canvas.move).
+
+import math
+
+import numpy as np
+
+GRID_CELL = 128          # px do mapa por célula do índice
+VIEW_MARGIN = 64         # px de tela além da borda que ainda contam como visíveis
+LABEL_CELL = (140, 22)   # "caixa" de um rótulo na tela, para o declutter
+LABELS_MIN_SCALE = 0.35  # abaixo disso só os rótulos prioritários disputam espaço
+LOW_ZOOM_LABELS = 12     # prioridade (rank) máxima com rótulo em zoom baixo
+
+MARKER_GLYPH = "●"  # texto, não oval: canvas.scale move o ponto sem mudar o tamanho
+DEFAULT_COLOR = "#e74c3c"
+LABEL_COLOR = "#e0dcd1"
+
+
+class GridIndex:
+    """Bucketed point index: points sorted by cell id, cell slices via searchsorted."""
+
+    def __init__(self, xs, ys, cell=GRID_CELL):
+        self.xs = np.asarray(xs, dtype="float32")
+        self.ys = np.asarray(ys, dtype="float32")
+        self.cell = cell
+        cx = np.floor(self.xs / cell).astype("int64")
+        cy = np.floor(self.ys / cell).astype("int64")
+        self._cx0 = int(cx.min()) if len(cx) else 0
+        self._cy0 = int(cy.min()) if len(cy) else 0
+        self._ncols = int(cx.max()) - self._cx0 + 1 if len(cx) else 1
+        self._nrows = int(cy.max()) - self._cy0 + 1 if len(cy) else 1
+        keys = (cy - self._cy0) * self._ncols + (cx - self._cx0)
+        self._order = np.argsort(keys, kind="stable").astype("int32")
+        self._keys = keys[self._order]
+
+    def query(self, x0, y0, x1, y1):
+        """Ids of the points inside the map-space rectangle, in id order."""
+        c0 = max(0, math.floor(x0 / self.cell) - self._cx0)
+        c1 = min(self._ncols - 1, math.floor(x1 / self.cell) - self._cx0)
+        r0 = max(0, math.floor(y0 / self.cell) - self._cy0)
+        r1 = min(self._nrows - 1, math.floor(y1 / self.cell) - self._cy0)
+        if c0 > c1 or r0 > r1:
+            return np.empty(0, dtype="int32")
+        parts = []
+        for r in range(r0, r1 + 1):
+            # As células de uma linha são contíguas no array ordenado
+            lo = np.searchsorted(self._keys, r * self._ncols + c0, side="left")
+            hi = np.searchsorted(self._keys, r * self._ncols + c1, side="right")
+            parts.append(self._order[lo:hi])
+        ids = np.concatenate(parts)
+        keep = (self.xs[ids] >= x0) & (self.xs[ids] <= x1) & (self.ys[ids] >= y0) & (self.ys[ids] <= y1)
+        return np.sort(ids[keep])
+
+
+class MarkerLayer:
+    """
+    Markers at map coordinates (xs, ys). `priority` is a rank (0 = most
+    important) deciding who keeps a label when labels would overlap;
+    `colors[i]` is the marker color.
+    """
+
+    TAG = "poi"
+    LABEL_TAG = "poilabel"
+
+    def __init__(self, canvas, xs, ys, names, colors=None, priority=None, font=("Georgia", 11)):
+        self.canvas = canvas
+        self.index = GridIndex(xs, ys)
+        self.names = names
+        self.colors = colors
+        self.priority = (np.asarray(priority) if priority is not None
+                         else np.arange(len(names)))
+        self.font = font
+        self._dots = {}    # id -> canvas item
+        self._labels = {}  # id -> canvas item
+        self._view = None  # (scale, ofs_x, ofs_y) em que os itens estão posicionados
+
+    def __len__(self):
+        return len(self.index.xs)
+
+    def _screen(self, i, scale, ofs_x, ofs_y):
+        return ofs_x + float(self.index.xs[i]) * scale, ofs_y + float(self.index.ys[i]) * scale
+
+    def _transform(self, scale, ofs_x, ofs_y):
+        # Leva os itens já existentes da visão anterior para a nova sem recriar nada
+        if self._view is None or not (self._dots or self._labels):
+            return
+        old_scale, old_x, old_y = self._view
+        k = scale / old_scale
+        if abs(k - 1.0) < 1e-9:
+            dx, dy = ofs_x - old_x, ofs_y - old_y
+            if dx or dy:
+                self.canvas.move(self.TAG, dx, dy)
+            return
+        # p' = o' + (p - o) * k  ==  x0 + (p - x0) * k  com  x0 = (o' - o*k) / (1 - k)
+        x0 = (ofs_x - old_x * k) / (1 - k)
+        y0 = (ofs_y - old_y * k) / (1 - k)
+        self.canvas.scale(self.TAG, x0, y0, k, k)
+
+    def visible(self, scale, ofs_x, ofs_y):
+        vw = max(1, self.canvas.winfo_width())
+        vh = max(1, self.canvas.winfo_height())
+        m = VIEW_MARGIN
+        return self.index.query((-m - ofs_x) / scale, (-m - ofs_y) / scale,
+                                (vw + m - ofs_x) / scale, (vh + m - ofs_y) / scale)
+
+    def _declutter(self, ids, scale, ofs_x, ofs_y):
+        """Greedy by priority: a label takes its screen cell and the next one to the right."""
+        if scale < LABELS_MIN_SCALE:
+            ids = ids[self.priority[ids] < LOW_ZOOM_LABELS]
+        taken = set()
+        placed = []
+        cw, ch = LABEL_CELL
+        for i in ids[np.argsort(self.priority[ids], kind="stable")]:
+            x, y = self._screen(int(i), scale, ofs_x, ofs_y)
+            cx, cy = int(x // cw), int(y // ch)
+            cells = ((cx, cy), (cx + 1, cy))
+            if any(c in taken for c in cells):
+                continue
+            taken.update(cells)
+            placed.append(int(i))
+        return placed
+
+    def render(self, scale, ofs_x, ofs_y):
+        self._transform(scale, ofs_x, ofs_y)
+        self._view = (scale, ofs_x, ofs_y)
+
+        ids = self.visible(scale, ofs_x, ofs_y)
+        self._sync(self._dots, ids.tolist(), self._create_dot, scale, ofs_x, ofs_y)
+        self._sync(self._labels, self._declutter(ids, scale, ofs_x, ofs_y),
+                   self._create_label, scale, ofs_x, ofs_y)
+        self.canvas.tag_raise(self.LABEL_TAG)
+
+    def _sync(self, items, wanted, create, scale, ofs_x, ofs_y):
+        wanted = set(wanted)
+        for i in [i for i in items if i not in wanted]:
+            self.canvas.delete(items.pop(i))
+        for i in wanted:
+            if i not in items:
+                x, y = self._screen(i, scale, ofs_x, ofs_y)
+                items[i] = create(i, x, y)
+
+    def _create_dot(self, i, x, y):
+        color = self.colors[i] if self.colors is not None else DEFAULT_COLOR
+        return self.canvas.create_text(x, y, text=MARKER_GLYPH, fill=color,
+                                       font=(self.font[0], 12), tags=(self.TAG,))
+
+    def _create_label(self, i, x, y):
+        # Âncora "sw" no próprio ponto: o rótulo fica acima/à direita e acompanha o scale
+        return self.canvas.create_text(x, y, text="  " + self.names[i], fill=LABEL_COLOR,
+                                       font=self.font, anchor="sw",
+                                       tags=(self.TAG, self.LABEL_TAG))
+
+    def clear(self):
+        self.canvas.delete(self.TAG)
+        self._dots = {}
+        self._labels = {}
+        self._view = None
@@ -0,0 +1,234 @@
+# app/map_tiles.py
+# Pirâmide de tiles do mapa (cache em disco) e camada de canvas que só desenha
+# os tiles visíveis, em vez de redimensionar o mapa inteiro a cada zoom.
+
+import hashlib
+import math
+import os
+import threading
+from collections import OrderedDict
+
+from PIL import Image, ImageTk
+
+TILE_SIZE = 256
+PHOTO_CACHE_PIXELS = 24_000_000  # PhotoImages prontos (por nível/escala/tile), ~96 MB
+TILE_CACHE_SIZE = 256   # tiles PIL decodificados
+PREVIEW_CACHE_SIZE = 64  # tiles de pré-visualização (NEAREST), descartáveis
+
+
+class TilePyramid:
+    """
+    Level 0 is the full-resolution map; level n is downsampled by 2**n.
+    Every level is cut into TILE_SIZE tiles stored under
+    cache/map_tiles/<map hash>/<level>/<tx>_<ty>.png, built once per map file.
+    """
+
+    def __init__(self, image_path, cache_dir, tile_size=TILE_SIZE):
+        self.image_path = image_path
+        self.tile_size = tile_size
+        with open(image_path, "rb") as f:
+            digest = hashlib.sha1(f.read()).hexdigest()[:16]
+        self.root = os.path.join(cache_dir, "map_tiles", f"{digest}_{tile_size}")
+        self._tiles = OrderedDict()
+        self._lock = threading.Lock()
+        if not self._load_info():
+            self._build()
+
+    def _load_info(self):
+        info = os.path.join(self.root, "levels.txt")
+        if not os.path.exists(info):
+            return False
+        with open(info, "r", encoding="ascii") as f:
+            self.level_sizes = [tuple(int(v) for v in line.split()) for line in f if line.strip()]
+        self.size = self.level_sizes[0]
+        return True
+
+    def _build(self):
+        print("[INFO] Building map tile pyramid (first run only)...")
+        img = Image.open(self.image_path).convert("RGBA")
+        self.level_sizes = []
+        level = 0
+        while True:
+            self.level_sizes.append(img.size)
+            folder = os.path.join(self.root, str(level))
+            os.makedirs(folder, exist_ok=True)
+            w, h = img.size
+            for ty in range(math.ceil(h / self.tile_size)):
+                for tx in range(math.ceil(w / self.tile_size)):
+                    box = (tx * self.tile_size, ty * self.tile_size,
+                           min(w, (tx + 1) * self.tile_size), min(h, (ty + 1) * self.tile_size))
+                    img.crop(box).save(os.path.join(folder, f"{tx}_{ty}.png"), compress_level=1)
+            if max(w, h) <= self.tile_size:
+                break
+            img = img.resize((max(1, w // 2), max(1, h // 2)), Image.LANCZOS)
+            level += 1
+        # levels.txt por último: marca a pirâmide como completa
+        with open(os.path.join(self.root, "levels.txt"), "w", encoding="ascii") as f:
+            f.writelines(f"{w} {h}\n" for w, h in self.level_sizes)
+        self.size = self.level_sizes[0]
+        print(f"[OK] Map tiles ready ({len(self.level_sizes)} levels).")
+
+    @property
+    def max_level(self):
+        return len(self.level_sizes) - 1
+
+    def level_for_scale(self, scale):
+        # Nível mais grosso que ainda tem resolução >= à pedida (só reduz ao desenhar)
+        if scale >= 1.0:
+            return 0
+        return max(0, min(self.max_level, int(math.floor(math.log2(1.0 / scale)))))
+
+    def grid(self, level):
+        w, h = self.level_sizes[level]
+        return math.ceil(w / self.tile_size), math.ceil(h / self.tile_size)
+
+    def tile(self, level, tx, ty):
+        key = (level, tx, ty)
+        with self._lock:
+            img = self._tiles.get(key)
+            if img is not None:
+                self._tiles.move_to_end(key)
+                return img
+        path = os.path.join(self.root, str(level), f"{tx}_{ty}.png")
+        with Image.open(path) as f:
+            img = f.convert("RGBA")
+        with self._lock:
+            self._tiles[key] = img
+            while len(self._tiles) > TILE_CACHE_SIZE:
+                self._tiles.popitem(last=False)
+        return img
+
+
+class TileLayer:
+    """
+    Canvas items for the tiles intersecting the viewport. High-quality tiles
+    are kept in a pixel-budgeted LRU of PhotoImages; preview tiles (NEAREST)
+    stand in for them while a zoom burst is still going on.
+    """
+
+    TAG = "maptile"
+
+    def __init__(self, canvas, pyramid, resample=Image.LANCZOS, preview_resample=Image.NEAREST):
+        self.canvas = canvas
+        self.pyramid = pyramid
+        self.resample = resample
+        self.preview_resample = preview_resample
+        self._photos = OrderedDict()
+        self._photo_pixels = 0
+        self._previews = OrderedDict()
+        self._items = {}  # (tx, ty) -> canvas item id, do nível/escala atuais
+        self._shown = {}  # (tx, ty) -> PhotoImage em uso (o Tk apaga a imagem sem referência)
+        self._view_key = None
+
+    def _remember(self, key, photo):
+        self._photos[key] = photo
+        self._photo_pixels += key[3] * key[4]
+        while self._photo_pixels > PHOTO_CACHE_PIXELS and len(self._photos) > 1:
+            (_, _, _, ow, oh), _ = self._photos.popitem(last=False)
+            self._photo_pixels -= ow * oh
+
+    def _scaled(self, key, resample):
+        level, tx, ty, w, h = key
+        tile = self.pyramid.tile(level, tx, ty)
+        return tile if tile.size == (w, h) else tile.resize((w, h), resample)
+
+    def _photo(self, key, preview=False):
+        photo = self._photos.get(key)
+        if photo is not None:
+            self._photos.move_to_end(key)
+            return photo
+        if preview:
+            photo = self._previews.get(key)
+            if photo is None:
+                photo = ImageTk.PhotoImage(self._scaled(key, self.preview_resample))
+                self._previews[key] = photo
+                while len(self._previews) > PREVIEW_CACHE_SIZE:
+                    self._previews.popitem(last=False)
+            return photo
+        photo = ImageTk.PhotoImage(self._scaled(key, self.resample))
+        self._remember(key, photo)
+        return photo
+
+    def _layout(self, scale, ofs_x, ofs_y):
+        """(level, [(tile key, x, y)]) for the tiles that intersect the canvas."""
+        p = self.pyramid
+        level = p.level_for_scale(scale)
+        f = scale * (2 ** level)  # fator do tile do nível para a tela
+        lw, lh = p.level_sizes[level]
+        nx, ny = p.grid(level)
+        t = p.tile_size
+        base_x, base_y = round(ofs_x), round(ofs_y)
+        vw = max(1, self.canvas.winfo_width())
+        vh = max(1, self.canvas.winfo_height())
+
+        tx0 = max(0, int(math.floor(-base_x / (t * f))))
+        tx1 = min(nx - 1, int(math.floor((vw - base_x) / (t * f))))
+        ty0 = max(0, int(math.floor(-base_y / (t * f))))
+        ty1 = min(ny - 1, int(math.floor((vh - base_y) / (t * f))))
+
+        tiles = []
+        for ty in range(ty0, ty1 + 1):
+            sy0 = math.floor(ty * t * f)
+            sy1 = math.floor(min((ty + 1) * t, lh) * f)
+            for tx in range(tx0, tx1 + 1):
+                sx0 = math.floor(tx * t * f)
+                sx1 = math.floor(min((tx + 1) * t, lw) * f)
+                key = (level, tx, ty, max(1, sx1 - sx0), max(1, sy1 - sy0))
+                tiles.append((key, base_x + sx0, base_y + sy0))
+        return (level, round(f, 6)), tiles
+
+    def render(self, scale, ofs_x, ofs_y, preview=False):
+        """
+        Draws the visible tiles for map scale `scale` with the map origin at
+        (ofs_x, ofs_y). With preview=True, tiles without a high-quality version
+        are drawn with the cheap resampler instead.
+        """
+        view_key, tiles = self._layout(scale, ofs_x, ofs_y)
+        if view_key != self._view_key:
+            self.clear()
+            self._view_key = view_key
+
+        visible = set()
+        for key, x, y in tiles:
+            photo = self._photo(key, preview)
+            pos = key[1:3]
+            iid = self._items.get(pos)
+            if iid is None:
+                iid = self.canvas.create_image(x, y, image=photo, anchor="nw", tags=(self.TAG,))
+                self._items[pos] = iid
+            else:
+                if self._shown.get(pos) is not photo:
+                    self.canvas.itemconfig(iid, image=photo)
+                self.canvas.coords(iid, x, y)
+            self._shown[pos] = photo
+            visible.add(pos)
+
+        for pos in [k for k in self._items if k not in visible]:
+            self.canvas.delete(self._items.pop(pos))
+            self._shown.pop(pos, None)
+        self.canvas.tag_lower(self.TAG)
+
+    def missing_high_quality(self, scale, ofs_x, ofs_y):
+        """Tile keys in view that only have a preview so far."""
+        _, tiles = self._layout(scale, ofs_x, ofs_y)
+        return [key for key, _, _ in tiles if key not in self._photos]
+
+    def resample_tiles(self, keys, stale=None):
+        # Só PIL: pode rodar num worker (o resize libera o GIL). stale() -> True interrompe
+        out = []
+        for key in keys:
+            if stale is not None and stale():
+                break
+            out.append((key, self._scaled(key, self.resample)))
+        return out
+
+    def install(self, resampled):
+        # No thread do Tk: PhotoImage só pode ser criado aqui
+        for key, img in resampled:
+            if key not in self._photos:
+                self._remember(key, ImageTk.PhotoImage(img))
+
+    def clear(self):
+        self.canvas.delete(self.TAG)
+        self._items = {}
+        self._shown = {}
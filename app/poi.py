@@ -0,0 +1,192 @@
+# app/poi.py
+# Pontos de interesse do mapa em colunas NumPy (coords + código de categoria),
+# carregados de CSV/JSON e guardados em cache binário (.npz) por hash do arquivo.
+
+import bisect
+import csv
+import hashlib
+import json
+import os
+import unicodedata
+
+import numpy as np
+
+from app.map_markers import GridIndex
+
+POI_CACHE_VERSION = 1
+
+# Ordem de importância das categorias (rank do rótulo no mapa); as demais vêm depois
+CATEGORY_PRIORITY = ("city", "town", "settlement", "landmark", "dungeon", "shrine", "ingredient")
+CATEGORY_COLORS = {
+    "city": "#e74c3c",
+    "town": "#e67e22",
+    "settlement": "#f1c40f",
+    "landmark": "#9b59b6",
+    "dungeon": "#95a5a6",
+    "shrine": "#3498db",
+    "ingredient": "#2ecc71",
+}
+OTHER_COLOR = "#bdc3c7"
+
+
+def fold(text):
+    """Lowercase without accents, for name lookups."""
+    text = unicodedata.normalize("NFKD", text.lower())
+    return "".join(ch for ch in text if not unicodedata.combining(ch)).strip()
+
+
+class PoiTable:
+    """
+    Columnar POIs: xs/ys (float32, map pixels), cat (uint16 code into
+    `categories`) and names. Names are also kept folded and sorted for
+    prefix search; the spatial grid answers nearest-to-click queries.
+    """
+
+    def __init__(self, names, xs, ys, cat, categories):
+        self.names = names
+        self.xs = np.asarray(xs, dtype="float32")
+        self.ys = np.asarray(ys, dtype="float32")
+        self.cat = np.asarray(cat, dtype="uint16")
+        self.categories = list(categories)
+        self.grid = GridIndex(self.xs, self.ys)
+        self._name_order = None  # montado na primeira busca por nome
+        self._sorted_names = None
+
+    def __len__(self):
+        return len(self.names)
+
+    @classmethod
+    def from_rows(cls, rows):
+        """rows: iterable of (name, x, y, category)."""
+        names, xs, ys, cat = [], [], [], []
+        categories, codes = [], {}
+        for name, x, y, category in rows:
+            category = (category or "other").strip().lower()
+            code = codes.setdefault(category, len(categories))
+            if code == len(categories):
+                categories.append(category)
+            names.append(str(name).strip())
+            xs.append(float(x))
+            ys.append(float(y))
+            cat.append(code)
+        return cls(names, xs, ys, cat, categories)
+
+    @classmethod
+    def from_cities(cls, cities):
+        return cls.from_rows((name, x, y, "city") for name, (x, y) in cities.items())
+
+    # ---- consultas ----
+    def nearest(self, x, y, max_dist=None):
+        """Id of the POI closest to map point (x, y); None if none within max_dist."""
+        if not len(self):
+            return None
+        r = float(self.grid.cell)
+        while True:
+            if max_dist is not None:
+                r = min(r, max_dist)
+            ids = self.grid.query(x - r, y - r, x + r, y + r)
+            if len(ids):
+                d2 = (self.xs[ids] - x) ** 2 + (self.ys[ids] - y) ** 2
+                best = int(np.argmin(d2))
+                # Fora do círculo de raio r pode existir outro mais perto, fora da caixa
+                if d2[best] <= r * r or len(ids) == len(self):
+                    if max_dist is not None and d2[best] > max_dist * max_dist:
+                        return None
+                    return int(ids[best])
+            if max_dist is not None and r >= max_dist:
+                return None
+            r *= 2
+
+    def search_prefix(self, prefix, limit=20):
+        """Ids whose (folded) name starts with `prefix`, alphabetically."""
+        if self._name_order is None:
+            folded = [fold(n) for n in self.names]
+            self._name_order = sorted(range(len(folded)), key=lambda i: (folded[i], i))
+            self._sorted_names = [folded[i] for i in self._name_order]
+        key = fold(prefix)
+        lo = bisect.bisect_left(self._sorted_names, key)
+        out = []
+        for pos in range(lo, min(len(self._sorted_names), lo + limit)):
+            if not self._sorted_names[pos].startswith(key):
+                break
+            out.append(self._name_order[pos])
+        return out
+
+    # ---- camada de marcadores ----
+    def marker_colors(self):
+        palette = np.array([CATEGORY_COLORS.get(c, OTHER_COLOR) for c in self.categories] or [OTHER_COLOR])
+        return palette[self.cat]
+
+    def marker_priority(self):
+        """Rank per POI: category importance first, then file order."""
+        rank = np.array([CATEGORY_PRIORITY.index(c) if c in CATEGORY_PRIORITY else len(CATEGORY_PRIORITY)
+                         for c in self.categories] or [0], dtype="int64")
+        order = np.lexsort((np.arange(len(self)), rank[self.cat]))
+        priority = np.empty(len(self), dtype="int64")
+        priority[order] = np.arange(len(self))
+        return priority
+
+    # ---- cache binário ----
+    def save(self, path):
+        blobs = [n.encode("utf-8") for n in self.names]
+        offsets = np.zeros(len(blobs) + 1, dtype="int64")
+        offsets[1:] = np.cumsum([len(b) for b in blobs])
+        tmp = path + ".tmp.npz"
+        np.savez(tmp, version=POI_CACHE_VERSION, xs=self.xs, ys=self.ys, cat=self.cat,
+                 categories=np.array(self.categories, dtype=str),
+                 names=np.frombuffer(b"".join(blobs), dtype="uint8"), name_offsets=offsets)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as z:
+            if int(z["version"]) != POI_CACHE_VERSION:
+                raise ValueError("POI cache version mismatch")
+            blob = z["names"].tobytes()
+            off = z["name_offsets"]
+            names = [blob[off[i]:off[i + 1]].decode("utf-8") for i in range(len(off) - 1)]
+            return cls(names, z["xs"], z["ys"], z["cat"], z["categories"].tolist())
+
+
+def _read_rows(path):
+    if path.lower().endswith(".json"):
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if isinstance(data, dict):
+            data = data.get("pois", [])
+        return [(d["name"], d["x"], d["y"], d.get("category")) for d in data]
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        return [(r["name"], r["x"], r["y"], r.get("category")) for r in csv.DictReader(f)]
+
+
+def load_poi_table(paths, cache_dir, fallback_cities):
+    """
+    First existing file in `paths` (CSV with name,x,y,category columns or a
+    JSON list of the same objects), via cache/poi_<hash>.npz. Without a file,
+    the built-in cities are used.
+    """
+    path = next((p for p in paths if os.path.exists(p)), None)
+    if path is None:
+        return PoiTable.from_cities(fallback_cities)
+
+    with open(path, "rb") as f:
+        digest = hashlib.sha1(f.read()).hexdigest()[:16]
+    cache_path = os.path.join(cache_dir, f"poi_{digest}.npz")
+    if os.path.exists(cache_path):
+        try:
+            return PoiTable.load(cache_path)
+        except Exception as e:
+            print(f"[WARNING] Could not load POI cache: {e}. Rebuilding...")
+
+    try:
+        table = PoiTable.from_rows(_read_rows(path))
+    except Exception as e:
+        print(f"[ERROR] Could not read POI file '{path}': {e}")
+        return PoiTable.from_cities(fallback_cities)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        table.save(cache_path)
+    except Exception as e:
+        print(f"[WARNING] Could not save POI cache: {e}")
+    print(f"[OK] {len(table)} map locations loaded from {path}.")
+    return table
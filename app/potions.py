@@ -0,0 +1,198 @@
+# app/potions.py
+# Magnitude, duração e valor em ouro de poções/venenos (fórmulas da UESP),
+# vetorizado sobre as linhas da tabela de receitas (app.recipe_table).
+
+import numpy as np
+
+from data.ingredients import (
+    ALL_EFFECTS, EFFECT_DATA, INGREDIENT_NAMES, INGREDIENT_MASK, INGREDIENT_OVERRIDES, INGREDIENTS,
+)
+
+INGREDIENT_MULT = 4.0
+SKILL_FACTOR = 1.5
+ALCHEMIST_STEP = 20  # % por rank do Alchemist (0-5)
+PERK_BONUS = 1.25    # Physician, Benefactor, Poisoner
+RESTORE_EFFECTS = ("Restore Health", "Restore Magicka", "Restore Stamina")
+# Magnitude fixa (ou inexistente); a habilidade aumenta a duração
+DURATION_SCALED = ("Damage Magicka Regen", "Damage Stamina Regen", "Slow",
+                   "Invisibility", "Paralysis", "Waterbreathing")
+
+DEFAULT_SETTINGS = {
+    "skill": 15,            # Alchemy
+    "alchemist": 0,         # rank 0-5
+    "physician": False,
+    "benefactor": False,
+    "poisoner": False,
+    "fortify_alchemy": 0,   # % somado dos equipamentos
+}
+
+_BASE = np.array([EFFECT_DATA[e][:3] for e in ALL_EFFECTS], dtype="float64")  # mag, dur, custo
+HARMFUL = np.array([EFFECT_DATA[e][3] for e in ALL_EFFECTS])
+_RESTORE = np.array([e in RESTORE_EFFECTS for e in ALL_EFFECTS])
+_SCALES_MAG = np.array([e not in DURATION_SCALED for e in ALL_EFFECTS])
+
+# (ingrediente, efeito): quem carrega o efeito e com que multiplicadores (mag, dur, valor)
+_CARRIES = np.array([[e in INGREDIENTS[i] for e in ALL_EFFECTS] for i in INGREDIENT_NAMES])
+_MULTS = np.ones((3, len(INGREDIENT_NAMES), len(ALL_EFFECTS)))
+for (_ing, _eff), _m in INGREDIENT_OVERRIDES.items():
+    _MULTS[:, INGREDIENT_NAMES.index(_ing), ALL_EFFECTS.index(_eff)] = _m
+# Por efeito com override: tabela ingrediente -> altera? (a última posição é o -1 de combo)
+_OVERRIDERS = {}
+for (_ing, _eff) in INGREDIENT_OVERRIDES:
+    _lut = _OVERRIDERS.setdefault(ALL_EFFECTS.index(_eff), np.zeros(len(INGREDIENT_NAMES) + 1, dtype=bool))
+    _lut[INGREDIENT_NAMES.index(_ing)] = True
+
+
+def _settings(settings):
+    return {**DEFAULT_SETTINGS, **(settings or {})}
+
+
+def power_factor(settings=None):
+    s = _settings(settings)
+    return (INGREDIENT_MULT
+            * (1 + (SKILL_FACTOR - 1) * s["skill"] / 100)
+            * (1 + s["fortify_alchemy"] / 100)
+            * (1 + ALCHEMIST_STEP * s["alchemist"] / 100))
+
+
+def effect_stats(settings=None, poison=None, mag_mult=1.0, dur_mult=1.0, value_mult=1.0):
+    """
+    Per-effect (magnitude, duration, value) arrays, indexed like ALL_EFFECTS.
+    poison=False applies Benefactor to beneficial effects, poison=True applies
+    Poisoner to harmful ones, None applies neither. The multipliers may be
+    (ingredients, effects) arrays, giving one row per ingredient.
+    """
+    s = _settings(settings)
+    pf = np.full(len(ALL_EFFECTS), power_factor(s))
+    if s["physician"]:
+        pf[_RESTORE] *= PERK_BONUS
+    if poison is True and s["poisoner"]:
+        pf[HARMFUL] *= PERK_BONUS
+    if poison is False and s["benefactor"]:
+        pf[~HARMFUL] *= PERK_BONUS
+
+    base_mag = _BASE[:, 0] * mag_mult
+    base_dur = _BASE[:, 1] * dur_mult
+    mag = np.where(_SCALES_MAG, np.floor(base_mag * pf + 0.5), np.floor(base_mag + 0.5))
+    dur = np.where(_SCALES_MAG, np.floor(base_dur + 0.5), np.floor(base_dur * pf + 0.5))
+    value = (_BASE[:, 2] * np.maximum(mag, 1) ** 1.1
+             * np.where(dur > 0, (np.maximum(dur, 1) / 10) ** 1.1, 1.0)) * value_mult
+    return mag, dur, value
+
+
+def ingredient_stats(settings=None, poison=None):
+    """effect_stats with the ingredient overrides: (ingredients, effects) arrays."""
+    return effect_stats(settings, poison, *_MULTS)
+
+
+def _strongest(ingredients, e, neutral_value):
+    """Per row of `ingredients` (-1 = none), the one carrying effect `e` with the highest value."""
+    ids = np.maximum(ingredients, 0)
+    carries = (ingredients >= 0) & _CARRIES[ids, e]
+    score = np.where(carries, neutral_value[ids, e], -np.inf)
+    return ids[np.arange(len(ids)), np.argmax(score, axis=1)]
+
+
+def effect_bits(masks):
+    """(n, W) uint64 effect masks -> (n, n_effects) bool."""
+    cols = [((masks[:, i // 64] >> np.uint64(i % 64)) & np.uint64(1)).astype(bool)
+            for i in range(len(ALL_EFFECTS))]
+    return np.column_stack(cols) if cols else np.zeros((len(masks), 0), dtype=bool)
+
+
+def evaluate(table, rows, settings=None, effect=None):
+    """
+    Vectorized over `rows` of the recipe table. Returns a dict of arrays:
+    value (gold), poison (bool), strongest (effect index) and, when `effect`
+    is given, magnitude (that effect's magnitude, or its duration for
+    DURATION_SCALED effects).
+    """
+    rows = np.asarray(rows, dtype="int64")
+    bits = effect_bits(table.potion_mask[rows])
+    potion = effect_stats(settings, poison=False)
+    poison = effect_stats(settings, poison=True)
+    neutral_value = effect_stats(settings, poison=None)[2]
+    col = e = None
+    if effect is not None:
+        e = ALL_EFFECTS.index(effect)
+        col = 0 if _SCALES_MAG[e] else 1  # magnitude, ou a duração quando é ela que escala
+        a_potion = np.where(bits[:, e], potion[col][e], 0.0)
+        a_poison = np.where(bits[:, e], poison[col][e], 0.0)
+
+    # Valor por (linha, efeito): base, trocado pelo do ingrediente mais forte
+    # nas linhas em que algum ingrediente com override carrega o efeito
+    v_potion = np.where(bits, potion[2], 0.0)
+    v_poison = np.where(bits, poison[2], 0.0)
+    v_neutral = np.where(bits, neutral_value, -1.0)
+    if _OVERRIDERS:
+        combo = table.combo[rows]
+        ing_potion = ingredient_stats(settings, poison=False)
+        ing_poison = ingredient_stats(settings, poison=True)
+        ing_neutral = ingredient_stats(settings, poison=None)[2]
+        for oe, who in _OVERRIDERS.items():
+            r = np.flatnonzero(bits[:, oe] & who[combo].any(axis=1))
+            if not len(r):
+                continue
+            best = _strongest(combo[r], oe, ing_neutral)
+            v_potion[r, oe] = ing_potion[2][best, oe]
+            v_poison[r, oe] = ing_poison[2][best, oe]
+            v_neutral[r, oe] = ing_neutral[best, oe]
+            if oe == e:
+                a_potion[r] = ing_potion[col][best, e]
+                a_poison[r] = ing_poison[col][best, e]
+
+    # O efeito mais valioso decide se a mistura é poção ou veneno
+    strongest = np.argmax(v_neutral, axis=1)
+    is_poison = HARMFUL[strongest]
+    # Cada efeito vale o seu floor, como no jogo e em describe_potion; o total é a soma
+    value = np.where(is_poison, np.floor(v_poison).sum(axis=1), np.floor(v_potion).sum(axis=1))
+    result = {"value": value.astype("int64"), "poison": is_poison, "strongest": strongest}
+
+    if effect is not None:
+        result["magnitude"] = np.where(is_poison, a_poison, a_potion)
+    return result
+
+
+def rank_rows(table, rows, settings=None, by="value", effect=None, limit=None):
+    """Rows sorted by gold value or by `effect` magnitude, best first (ties keep table order)."""
+    rows = np.asarray(rows, dtype="int64")
+    if not len(rows):
+        return rows, {}
+    ev = evaluate(table, rows, settings, effect=effect)
+    key = ev["magnitude"] if by == "magnitude" else ev["value"]
+    order = np.argsort(-key, kind="stable")[:limit]
+    return rows[order], {k: v[order] for k, v in ev.items()}
+
+
+def describe_potion(ingredients, settings=None):
+    """
+    Effects of brewing `ingredients` together: (kind, [(effect, magnitude,
+    duration, value)], total value), strongest effect first. Values are whole
+    gold and the total is their sum. None if fewer than two distinct
+    ingredients share an effect.
+    """
+    ingredients = list(dict.fromkeys(ingredients))  # o mesmo ingrediente duas vezes não conta
+    masks = [INGREDIENT_MASK.get(i, 0) for i in ingredients]
+    shared = 0
+    for a in range(len(masks)):
+        for b in range(a + 1, len(masks)):
+            shared |= masks[a] & masks[b]
+    effects = [e for e in range(len(ALL_EFFECTS)) if shared >> e & 1]
+    if not effects:
+        return None
+
+    ids = np.array([[INGREDIENT_NAMES.index(i) for i in ingredients if i in INGREDIENT_MASK]])
+    neutral_value = ingredient_stats(settings, None)[2]
+    strongest_of = {e: _strongest(ids, e, neutral_value)[0] for e in effects}
+
+    def stats(poison):
+        mag, dur, value = ingredient_stats(settings, poison)
+        return {e: (mag[j, e], dur[j, e], value[j, e]) for e, j in strongest_of.items()}
+
+    neutral = stats(None)
+    strongest = max(effects, key=lambda e: neutral[e][2])
+    poison = bool(HARMFUL[strongest])
+    best = stats(poison)
+    rows = sorted(((ALL_EFFECTS[e], int(best[e][0]), int(best[e][1]), int(best[e][2])) for e in effects),
+                  key=lambda r: -r[3])
+    return ("Poison" if poison else "Potion"), rows, sum(r[3] for r in rows)
@@ -0,0 +1,156 @@
+# app/recipe_table.py
+# Tabela pré-calculada com toda combinação de 2 e 3 ingredientes que gera poção,
+# em arrays NumPy persistidos em cache/ (invalidada por hash de INGREDIENTS).
+# "By Effect" e "By Inventory" viram filtros sobre essa tabela.
+
+import hashlib
+import json
+import os
+import threading
+from itertools import combinations
+
+import numpy as np
+
+from data.ingredients import INGREDIENTS, INGREDIENT_NAMES, ALL_EFFECTS, INGREDIENT_MASK
+
+TABLE_VERSION = 1
+TABLE_FILE = "recipes_{}.npz"
+WORDS = (len(ALL_EFFECTS) + 63) // 64  # uint64 por máscara de efeitos
+
+_INDEX = {name: j for j, name in enumerate(INGREDIENT_NAMES)}
+
+
+def ingredients_hash():
+    data = json.dumps(INGREDIENTS, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(f"{TABLE_VERSION}\0{data}".encode("utf-8")).hexdigest()[:16]
+
+
+def _mask_words(mask):
+    return [(mask >> (64 * w)) & 0xFFFFFFFFFFFFFFFF for w in range(WORDS)]
+
+
+def _has_bit(masks, bit):
+    return ((masks[:, bit // 64] >> np.uint64(bit % 64)) & np.uint64(1)).astype(bool)
+
+
+class RecipeTable:
+    """
+    One row per combination, ordered by (size, ingredient names):
+      combo       int16 (n, 3)   indices into INGREDIENT_NAMES, -1 = no third
+      all_mask    uint64 (n, W)  effects every ingredient of the row has
+      potion_mask uint64 (n, W)  effects of the brewed potion (shared by >= 2)
+    """
+
+    def __init__(self, combo, all_mask, potion_mask):
+        self.combo = combo
+        self.all_mask = all_mask
+        self.potion_mask = potion_mask
+        self.size = 2 + (combo[:, 2] >= 0)
+
+    def __len__(self):
+        return len(self.combo)
+
+    @classmethod
+    def build(cls):
+        order = sorted(range(len(INGREDIENT_NAMES)), key=lambda j: INGREDIENT_NAMES[j])
+        masks = np.array([_mask_words(INGREDIENT_MASK[INGREDIENT_NAMES[j]]) for j in order],
+                         dtype="uint64").reshape(len(order), WORDS)
+        ids = np.array(order, dtype="int16")
+        k = len(order)
+
+        # Pares e trios em ordem lexicográfica de nome (posições em `order`)
+        pairs = np.fromiter((p for c in combinations(range(k), 2) for p in c),
+                            dtype="int32").reshape(-1, 2)
+        trios = np.fromiter((p for c in combinations(range(k), 3) for p in c),
+                            dtype="int32").reshape(-1, 3)
+        a, b = masks[pairs[:, 0]], masks[pairs[:, 1]]
+        pair_mask = a & b
+        keep = pair_mask.any(axis=1)
+        pair_rows = np.column_stack([ids[pairs[keep]], np.full(int(keep.sum()), -1, dtype="int16")])
+
+        a, b, c = masks[trios[:, 0]], masks[trios[:, 1]], masks[trios[:, 2]]
+        trio_potion = (a & b) | (a & c) | (b & c)
+        keep3 = trio_potion.any(axis=1)
+        trio_rows = ids[trios[keep3]]
+
+        combo = np.concatenate([pair_rows, trio_rows]).astype("int16")
+        all_mask = np.concatenate([pair_mask[keep], (a & b & c)[keep3]])
+        potion_mask = np.concatenate([pair_mask[keep], trio_potion[keep3]])
+        return cls(combo, all_mask, potion_mask)
+
+    def save(self, path):
+        tmp = path + ".tmp.npz"
+        np.savez(tmp, combo=self.combo, all_mask=self.all_mask, potion_mask=self.potion_mask)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as z:
+            return cls(z["combo"], z["all_mask"], z["potion_mask"])
+
+    # ---- filtros ----
+    def names(self, row):
+        return tuple(INGREDIENT_NAMES[j] for j in self.combo[row] if j >= 0)
+
+    def rows_with_effect(self, effect, rows=None):
+        """Rows (optionally within `rows`) whose ingredients all have `effect`, in table order."""
+        bit = ALL_EFFECTS.index(effect)
+        if rows is None:
+            return np.flatnonzero(_has_bit(self.all_mask, bit))
+        return rows[_has_bit(self.all_mask[rows], bit)]
+
+    def rows_within(self, ingredients):
+        """Rows made only of `ingredients`, in table order."""
+        allowed = np.zeros(len(INGREDIENT_NAMES) + 1, dtype=bool)
+        allowed[-1] = True  # -1 (sem terceiro ingrediente) sempre passa
+        for name in ingredients:
+            allowed[_INDEX[name]] = True
+        return np.flatnonzero(allowed[self.combo].all(axis=1))
+
+
+_TABLE = None
+_TABLE_LOCK = threading.Lock()  # as buscas da alquimia rodam em workers
+
+
+def get_recipe_table(cache_dir=None):
+    """Loads the table for the current INGREDIENTS from cache/, building it if needed."""
+    if _TABLE is not None:
+        return _TABLE
+    from rag.tracing import span
+    with _TABLE_LOCK, span("alchemy.table_load"):
+        return _get_recipe_table(cache_dir)
+
+
+def _get_recipe_table(cache_dir):
+    global _TABLE
+    if _TABLE is not None:
+        return _TABLE
+    if cache_dir is None:
+        from rag.config import CACHE_DIR
+        cache_dir = CACHE_DIR
+    path = os.path.join(cache_dir, TABLE_FILE.format(ingredients_hash()))
+    if os.path.exists(path):
+        try:
+            _TABLE = RecipeTable.load(path)
+            return _TABLE
+        except Exception as e:
+            print(f"[WARNING] Could not load recipe table: {e}. Rebuilding...")
+    _TABLE = RecipeTable.build()
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        _TABLE.save(path)
+        # Tabelas de versões antigas do INGREDIENTS não servem mais
+        for name in os.listdir(cache_dir):
+            if name.startswith("recipes_") and name.endswith(".npz") and name != os.path.basename(path):
+                os.remove(os.path.join(cache_dir, name))
+    except Exception as e:
+        print(f"[WARNING] Could not save recipe table: {e}")
+    return _TABLE
+
+
+if __name__ == "__main__":
+    # python -m app.recipe_table : monta a tabela antes de abrir o app
+    import time
+    t0 = time.perf_counter()
+    table = get_recipe_table()
+    print(f"[OK] Recipe table: {len(table)} combinations ({time.perf_counter() - t0:.2f}s).")
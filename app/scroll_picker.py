@@ -3,6 +3,10 @@
 import tkinter as tk
 import tkinter.font as tkfont
 import customtkinter as ctk
+from app.search_index import get_search_index
+from app.virtual_list import VirtualList, LazyRows
+
+FILTER_DEBOUNCE_MS = 120  # espera o usuário parar de digitar antes de filtrar
 
 class ScrollPicker(ctk.CTkToplevel):
     def __init__(self, master, values, title="Choose", initial="", width=420, height=480):
@@ -24,6 +28,8 @@ class ScrollPicker(ctk.CTkToplevel):
         self.focus_force()
 
         self._all = list(values)
+        self._index = get_search_index(self._all)  # compartilhado entre pickers com a mesma lista
+        self._filter_job = None
         self.result = None
 
         wrap = ctk.CTkFrame(self, fg_color=getattr(master, "FRAME_COLOR", "#3c322a"))
@@ -43,29 +49,20 @@ class ScrollPicker(ctk.CTkToplevel):
         list_wrap = ctk.CTkFrame(wrap, fg_color=getattr(master, "FRAME_COLOR", "#3c322a"))
         list_wrap.pack(fill="both", expand=True, padx=10, pady=(0, 10))
 
-        self.lb = tk.Listbox(
-            list_wrap, activestyle="none", highlightthickness=0,
+        # Só as linhas visíveis viram itens do Tk; o filtro troca a lista de trás
+        self.lb = VirtualList(
+            list_wrap,
             bg=getattr(master, "ENTRY_COLOR", "#2b2621"),
             fg=getattr(master, "TEXT_COLOR", "#e0dcd1"),
-            selectbackground="#5a4a3a", selectforeground="#e0dcd1",
-            font=tkfont.Font(family="Georgia", size=16)
+            select_bg="#5a4a3a", select_fg="#e0dcd1",
+            font=tkfont.Font(family="Georgia", size=16),
+            on_activate=lambda _i: self._accept(),
         )
         self.lb.pack(side="left", fill="both", expand=True)
 
-        sb = tk.Scrollbar(list_wrap, orient="vertical", command=self.lb.yview)
-        sb.pack(side="right", fill="y")
-        self.lb.configure(yscrollcommand=sb.set)
-
-        self.lb.bind("<MouseWheel>", lambda e: self.lb.yview_scroll(-int(e.delta/120), "units"))
-        self.lb.bind("<Button-4>",  lambda e: self.lb.yview_scroll(-1, "units"))
-        self.lb.bind("<Button-5>",  lambda e: self.lb.yview_scroll(+1, "units"))
-
         self.entry.bind("<KeyRelease>", self._on_filter)
         self.entry.bind("<Return>", lambda e: self._accept())
-        self.lb.bind("<Return>", lambda e: self._accept())
-        self.lb.bind("<Escape>", lambda e: self._cancel())
         self.bind("<Escape>", lambda e: self._cancel())
-        self.lb.bind("<Double-Button-1>", lambda e: self._accept())
 
         btns = ctk.CTkFrame(wrap, fg_color=getattr(master, "FRAME_COLOR", "#3c322a"))
         btns.pack(fill="x", padx=10, pady=(0, 10))
@@ -82,20 +79,27 @@ class ScrollPicker(ctk.CTkToplevel):
                 pass
 
     def _refill(self, data=None):
-        data = self._all if data is None else data
-        self.lb.delete(0, "end")
-        for v in data:
-            self.lb.insert("end", v)
+        self.lb.set_items(self._all if data is None else data)
 
     def _on_filter(self, _=None):
-        q = self.entry.get().strip().lower()
+        if self._filter_job is not None:
+            self.after_cancel(self._filter_job)
+        self._filter_job = self.after(FILTER_DEBOUNCE_MS, self._apply_filter)
+
+    def _apply_filter(self):
+        self._filter_job = None
+        q = self.entry.get().strip()
         if not q:
             self._refill()
             return
-        view = [v for v in self._all if q in v.lower()]
-        self._refill(view)
+        hits = self._index.search(q)
+        self._refill(LazyRows(len(hits), lambda k: self._all[hits[k]]))
 
     def _accept(self):
+        if self._filter_job is not None:
+            # Enter antes do debounce: aplica o filtro pendente primeiro
+            self.after_cancel(self._filter_job)
+            self._apply_filter()
         sel = self.lb.curselection()
         if sel:
             self.result = self.lb.get(sel[0])
@@ -0,0 +1,117 @@
+# app/search_index.py
+# Índice de busca dos pickers: n-gramas dos valores normalizados (sem acento,
+# minúsculos), com ranking prefixo > início de palavra > substring e, quando
+# quase nada casa, tolerância a erro de digitação. Um índice por lista de valores.
+
+import unicodedata
+from collections import Counter, OrderedDict
+
+GRAM = 3
+INDEX_CACHE_SIZE = 8
+FUZZY_WHEN_FEWER = 5  # abaixo disso de resultados exatos, procura também com erro
+FUZZY_CANDIDATES = 200  # os que mais compartilham n-gramas; só eles pagam a distância de edição
+
+
+def fold(text):
+    text = unicodedata.normalize("NFKD", text.lower())
+    return "".join(ch for ch in text if not unicodedata.combining(ch))
+
+
+def _grams(text, n):
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+
+def _edit_distance(a, b, limit):
+    """Damerau-Levenshtein (adjacent swaps), stopping early once it exceeds `limit`."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    prev2, prev = None, list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        cur = [i] + [0] * len(b)
+        for j, cb in enumerate(b, 1):
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (ca != cb))
+            if prev2 is not None and i > 1 and j > 1 and ca == b[j - 2] and a[i - 2] == cb:
+                cur[j] = min(cur[j], prev2[j - 2] + 1)
+        if min(cur) > limit:
+            return limit + 1
+        prev2, prev = prev, cur
+    return prev[-1]
+
+
+class SearchIndex:
+    """
+    Postings for every 1..GRAM-gram of each folded value. A query is answered
+    from the postings of its own grams, so typing never rescans every value.
+    """
+
+    def __init__(self, values):
+        self.values = list(values)
+        self._folded = [fold(v) for v in self.values]
+        self._postings = {}
+        for i, text in enumerate(self._folded):
+            for n in range(1, GRAM + 1):
+                for g in _grams(text, n):
+                    self._postings.setdefault(g, []).append(i)
+
+    def _exact(self, q):
+        n = min(GRAM, len(q))
+        lists = sorted((self._postings.get(g, []) for g in _grams(q, n)), key=len)
+        if not lists or not lists[0]:
+            return []
+        candidates = set(lists[0]).intersection(*lists[1:])
+        return [i for i in sorted(candidates) if q in self._folded[i]]
+
+    def _fuzzy(self, q, exclude):
+        limit = 1 if len(q) <= 5 else 2
+        # Candidatos: os que mais compartilham n-gramas (bigramas em consultas curtas,
+        # onde uma troca de letras já destrói quase todos os trigramas)
+        n = 2 if len(q) <= 6 else GRAM
+        shared = Counter()
+        for g in _grams(q, n):
+            shared.update(self._postings.get(g, ()))
+        found = []
+        for i, _ in shared.most_common(FUZZY_CANDIDATES):
+            if i in exclude:
+                continue
+            # Compara com o trecho de mesmo tamanho no começo de cada palavra
+            words = self._folded[i].split()
+            starts = [self._folded[i]] + [" ".join(words[k:]) for k in range(1, len(words))]
+            d = min(_edit_distance(q, s[:len(q)], limit) for s in starts)
+            if d <= limit:
+                found.append((d, i))
+        return [i for _, i in sorted(found)]
+
+    def search(self, query, limit=None):
+        """Indices into `values`, best first: prefix, word start, substring, then typo matches."""
+        q = fold(query).strip()
+        if not q:
+            return list(range(len(self.values)))[:limit]
+        exact = self._exact(q)
+
+        def rank(i):
+            text = self._folded[i]
+            if text.startswith(q):
+                return 0
+            if (" " + q) in text or ("-" + q) in text:
+                return 1
+            return 2
+        out = sorted(exact, key=lambda i: (rank(i), i))
+        if len(out) < FUZZY_WHEN_FEWER and len(q) >= 3:
+            out += self._fuzzy(q, set(out))
+        return out[:limit]
+
+
+_INDEXES = OrderedDict()
+
+
+def get_search_index(values):
+    """One index per distinct values list, shared by every picker that shows it."""
+    key = tuple(values)
+    index = _INDEXES.get(key)
+    if index is None:
+        index = _INDEXES[key] = SearchIndex(key)
+        while len(_INDEXES) > INDEX_CACHE_SIZE:
+            _INDEXES.popitem(last=False)
+    else:
+        _INDEXES.move_to_end(key)
+    return index
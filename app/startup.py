@@ -0,0 +1,27 @@
+# app/startup.py
+
+import time
+
+
+class StartupTimings:
+    """Marks seconds since process start; prints a breakdown when enabled (--timings)."""
+
+    def __init__(self, t0, enabled=False):
+        self.t0 = t0
+        self.enabled = enabled
+        self.marks = {}
+        self._reported = False
+
+    def mark(self, name):
+        if name not in self.marks:
+            self.marks[name] = time.perf_counter() - self.t0
+
+    def report_when(self, *required):
+        if not self.enabled or self._reported or not all(r in self.marks for r in required):
+            return
+        self._reported = True
+        print("[INFO] Startup timings (seconds since launch):")
+        prev = 0.0
+        for name, t in sorted(self.marks.items(), key=lambda kv: kv[1]):
+            print(f"  {name:<16} {t:7.3f}  (+{t - prev:.3f})")
+            prev = t
@@ -2,8 +2,10 @@
 
 import os
 import platform
+import queue
 import random
 import tkinter as tk
+from collections import deque
 from threading import Thread
 from tkinter import messagebox
 
@@ -13,18 +15,46 @@ from PIL import Image, ImageTk
 from app.constants import *
 from app.map import MapWindowMixin
 from app.alchemy import AlchemyMixin
+from app.diagnostics import DiagnosticsMixin
 from app.scroll_picker import ScrollPicker, PickerButton
 from data.advice import MAGE_ADVICE
-from rag.pipeline import search_relevant_context, generate_response
+from rag.config import (
+    CACHE_DIR, QUERY_CACHE_FILE, QUERY_CACHE_MAX_ENTRIES, QUERY_CACHE_TTL, QUERY_EMBED_TIMEOUT,
+    ASK_WORKERS, ASK_MAX_PENDING, ASK_SEARCH_TIMEOUT, ASK_FIRST_TOKEN_TIMEOUT, ASK_GENERATE_TIMEOUT,
+    ASK_SHUTDOWN_TIMEOUT, ASK_STAGE_WORKERS,
+)
+from rag.gemini import EMPTY_ANSWER, ERROR_ANSWER, generate_response_stream
+from rag.query_cache import QueryCache
+from rag.service import AskCancelled, AskService, StageTimeout
+from rag.tracing import incr
+from rag.travel import TravelGraph, travel_context
 
 
-class SkyrimAssistantApp(ctk.CTk, MapWindowMixin, AlchemyMixin):
-    def __init__(self, rag_pipeline):
+STREAM_POLL_MS = 40
+
+
+class SkyrimAssistantApp(ctk.CTk, MapWindowMixin, AlchemyMixin, DiagnosticsMixin):
+    def __init__(self, timings=None):
         super().__init__()
-        self.rag_pipeline = rag_pipeline  # (texts, index)
+        self.timings = timings
+        self.rag_pipeline = None  # (texts, index, lexical), carregado em segundo plano
+        self.kb_version = None
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        self.query_cache = QueryCache(
+            os.path.join(CACHE_DIR, QUERY_CACHE_FILE),
+            max_entries=QUERY_CACHE_MAX_ENTRIES, ttl_seconds=QUERY_CACHE_TTL
+        )
+        # Perguntas na ordem em que aparecem na tela; a primeira é a que está sendo mostrada
+        self.ask_service = AskService(self.run_rag_pipeline, workers=ASK_WORKERS, max_pending=ASK_MAX_PENDING,
+                                      stage_workers=ASK_STAGE_WORKERS)
+        self._asks = deque()
+        self._answer_start = None  # índice do texto onde começa a resposta em exibição
+        self._streamed = False
+        self.travel = TravelGraph(CITIES)
 
         self.title("Skyrim Survival Mode Companion")
         self.geometry("1280x720")
+        self.protocol("WM_DELETE_WINDOW", self._on_close)
         self._maximize_window()
 
         try:
@@ -56,13 +86,14 @@ class SkyrimAssistantApp(ctk.CTk, MapWindowMixin, AlchemyMixin):
 
         toolbar = ctk.CTkFrame(self, fg_color=self.FRAME_COLOR, corner_radius=10)
         toolbar.grid(row=1, column=0, padx=20, pady=(0, 8), sticky="ew")
-        toolbar.grid_columnconfigure((0, 1, 2, 3), weight=0)
-        toolbar.grid_columnconfigure(4, weight=1)
+        toolbar.grid_columnconfigure((0, 1, 2, 3, 4), weight=0)
+        toolbar.grid_columnconfigure(5, weight=1)
 
         ctk.CTkButton(toolbar, text="Open Map", command=self.open_map_window).grid(row=0, column=0, padx=6, pady=10)
         ctk.CTkButton(toolbar, text="Potion Calculator", command=self.open_alchemy_calc).grid(row=0, column=1, padx=6)
         ctk.CTkButton(toolbar, text="Ingredient Advisor", command=self.open_ingredient_advisor).grid(row=0, column=2, padx=6)
         ctk.CTkButton(toolbar, text="Random Mage Advice", command=self.show_random_advice).grid(row=0, column=3, padx=6)
+        ctk.CTkButton(toolbar, text="Diagnostics", command=self.open_diagnostics).grid(row=0, column=4, padx=6)
 
         self.main_frame = ctk.CTkFrame(self, fg_color=self.FRAME_COLOR, corner_radius=10)
         self.main_frame.grid(row=2, column=0, padx=20, pady=(0, 16), sticky="nsew")
@@ -79,7 +110,6 @@ class SkyrimAssistantApp(ctk.CTk, MapWindowMixin, AlchemyMixin):
             corner_radius=6
         )
         self.response_textbox.grid(row=0, column=0, padx=15, pady=15, sticky="nsew")
-        self._set_response("Greetings, Dovahkiin. What do the cold winds of Skyrim whisper to your mind?")
 
         bottom = ctk.CTkFrame(self.main_frame, fg_color=self.FRAME_COLOR)
         bottom.grid(row=1, column=0, padx=15, pady=(0, 15), sticky="ew")
@@ -100,30 +130,210 @@ class SkyrimAssistantApp(ctk.CTk, MapWindowMixin, AlchemyMixin):
         )
         self.ask_button.grid(row=0, column=1)
 
+        self.cache_label = ctk.CTkLabel(
+            bottom, text="", font=("Georgia", 11), text_color=self.TEXT_COLOR, anchor="w"
+        )
+        self.cache_label.grid(row=1, column=0, columnspan=2, pady=(4, 0), sticky="w")
+        self._update_cache_label()
+
+        if self.timings:
+            self.timings.mark("window_created")
+            self.bind("<Map>", self._on_first_paint, add="+")
+        self.start_loading_knowledge_base()
+
+    def _on_first_paint(self, _event=None):
+        # <Map> chega antes do desenho; o idle seguinte já é a janela pintada
+        self.after_idle(lambda: self._startup_mark("first_paint"))
+
+    def _startup_mark(self, name):
+        if self.timings:
+            self.timings.mark(name)
+            self.timings.report_when("first_paint", "kb_loaded")
+
+    def start_loading_knowledge_base(self):
+        self._set_response("The Mage is unrolling the ancient scrolls... (loading the knowledge base)")
+        self.ask_button.configure(state="disabled", text="Scrolls loading...")
+        Thread(target=self._load_knowledge_base, daemon=True).start()
+
+    def _load_knowledge_base(self):
+        result = None
+        try:
+            # Import pesado (numpy, faiss, fitz, Gemini) fica fora do caminho da janela
+            from rag.pipeline import setup_rag_pipeline
+            self._startup_mark("kb_imported")
+            texts, index, lexical, _, version = setup_rag_pipeline()
+            if texts and (index is not None or lexical is not None):
+                result = (texts, index, lexical, version)
+        except Exception as e:
+            print(f"[ERROR] Loading knowledge base: {e}")
+        self.after(0, self._on_knowledge_base_loaded, result)
+
+    def _on_knowledge_base_loaded(self, result):
+        self._startup_mark("kb_loaded")
+        if result is None:
+            print("\n[CRITICAL] Knowledge base failed to load.")
+            self._set_response(
+                "The scrolls could not be read.\n\nCheck that you have:\n"
+                "  - API key in 'secrets/API_KEY.txt'\n"
+                "  - At least one PDF in the 'files/' folder\n\n"
+                "The map and alchemy tools still work."
+            )
+            self.ask_button.configure(state="disabled", text="Mage unavailable")
+            return
+        *self.rag_pipeline, self.kb_version = result
+        if result[1] is None:
+            print("[WARNING] Vector index unavailable; answering from keyword search only.")
+        self._set_response("Greetings, Dovahkiin. What do the cold winds of Skyrim whisper to your mind?")
+        self.ask_button.configure(state="normal", text="Ask the Mage")
+
     def _set_response(self, text):
         self.response_textbox.configure(state="normal")
         self.response_textbox.delete("1.0", "end")
         self.response_textbox.insert("1.0", text)
         self.response_textbox.configure(state="disabled")
 
+    def _append_response(self, text):
+        self.response_textbox.configure(state="normal")
+        self.response_textbox.insert("end", text)
+        self.response_textbox.see("end")
+        self.response_textbox.configure(state="disabled")
+
     def handle_ask_button(self, event=None):
         query = self.user_input.get()
-        if not query.strip() or self.ask_button.cget("state") == "disabled":
+        if not query.strip() or self.rag_pipeline is None or self.ask_button.cget("state") == "disabled":
+            return
+        try:
+            request = self.ask_service.submit(query)
+        except queue.Full:
+            print("[WARNING] Too many questions waiting; try again in a moment.")
+            self.bell()
             return
         self.user_input.delete(0, "end")
-        self._set_response(f"Dovahkiin: {query}\n\nThe Mage consults the ancient scrolls...")
-        self.ask_button.configure(state="disabled", text="Consulting...")
-        Thread(target=self.run_rag_pipeline, args=(query,)).start()
+        self._asks.append(request)
+        if len(self._asks) == 1:
+            self._show_question(request, first=True)
+            self.after(STREAM_POLL_MS, self._drain_stream)
+        self._update_ask_button()
+
+    def _show_question(self, request, first=False):
+        if first:
+            self._set_response(f"Dovahkiin: {request.query}\n\n")
+        else:
+            self._append_response(f"\n\n———\n\nDovahkiin: {request.query}\n\n")
+        self._answer_start = self.response_textbox.index("end-1c")
+        self._append_response("The Mage consults the ancient scrolls...")
+        self._streamed = False
 
-    def run_rag_pipeline(self, query):
-        texts, index = self.rag_pipeline
-        context = search_relevant_context(query, index, texts, top_k=5, use_cosine=True)
-        answer = generate_response(query, context)
-        self.after(0, self.update_ui_with_response, answer)
+    def _update_ask_button(self):
+        waiting = len(self._asks) - 1
+        self.ask_button.configure(text=f"Ask the Mage ({waiting} waiting)" if waiting > 0 else "Ask the Mage")
+
+    def run_rag_pipeline(self, request):
+        # Roda num worker do AskService; cada etapa lenta tem prazo próprio
+        from rag.pipeline import retrieve, build_context
+        query = request.query
+        texts, index, lexical = self.rag_pipeline
+        # Perguntas de viagem: rotas do grafo local (ms); o mapa desenha a mais rápida no sentido pedido
+        routes = self.travel.routes_for_query(query)
+        if routes:
+            walk, fastest = routes[0]
+            request.emit("route", fastest or walk)
+        cached = self.query_cache.get(query, self.kb_version)
+        if cached and cached["answer"]:
+            incr("ask.cache_hits")
+            request.emit("done", cached["answer"])
+            return
+        cacheable = True
+        try:
+            if cached:
+                ids = cached["chunk_ids"]
+            else:
+                ids, degraded = request.stage("search", retrieve, query, index, texts, 5, True, lexical,
+                                              QUERY_EMBED_TIMEOUT, timeout=ASK_SEARCH_TIMEOUT)
+                # Resultado só do BM25 (embed falhou) não entra: ficaria no cache por todo o TTL
+                cacheable = not degraded
+                if cacheable:
+                    self.query_cache.put(query, self.kb_version, ids)
+            context = build_context(texts, ids) or "No relevant passages found."
+        except AskCancelled:
+            raise
+        except Exception as e:
+            print(f"[ERROR] Context search: {e}")
+            context = "An error occurred while searching the guides."
+            cacheable = False
+        if routes:
+            context = f"{travel_context(routes)}\n\n{context}"
+        pieces = []
+        try:
+            for piece in request.stream("generate", generate_response_stream, query, context,
+                                        first_timeout=ASK_FIRST_TOKEN_TIMEOUT, timeout=ASK_GENERATE_TIMEOUT):
+                pieces.append(piece)
+                request.emit("chunk", piece)
+        except StageTimeout as e:
+            print(f"[ERROR] Gemini generation: {e}")
+            piece = ("\n\n" if pieces else "") + ERROR_ANSWER
+            pieces.append(piece)
+            request.emit("chunk", piece)
+        answer = "".join(pieces).strip() or EMPTY_ANSWER
+        if cacheable and not answer.endswith(ERROR_ANSWER):
+            self.query_cache.put(query, self.kb_version, ids, answer)
+        request.emit("done", answer)
+
+    def _drain_stream(self):
+        # Roda no thread do Tk: aplica os pedaços que o worker da pergunta em exibição já produziu
+        if not self._asks:
+            return
+        request = self._asks[0]
+        done = None
+        try:
+            while done is None:
+                kind, payload = request.events.get_nowait()
+                if kind == "chunk":
+                    if not self._streamed:
+                        self._replace_answer("")
+                        self._streamed = True
+                    self._append_response(payload)
+                elif kind == "route":
+                    self.show_route(payload)
+                else:
+                    done = payload
+        except queue.Empty:
+            pass
+        if done is not None:
+            self.update_ui_with_response(done)
+            self._asks.popleft()
+            if self._asks:
+                self._show_question(self._asks[0])
+            self._update_ask_button()
+        if self._asks:
+            self.after(STREAM_POLL_MS, self._drain_stream)
+
+    def _replace_answer(self, text):
+        self.response_textbox.configure(state="normal")
+        self.response_textbox.delete(self._answer_start, "end")
+        self.response_textbox.insert("end", text)
+        self.response_textbox.see("end")
+        self.response_textbox.configure(state="disabled")
 
     def update_ui_with_response(self, answer):
-        self._set_response(answer)
-        self.ask_button.configure(state="normal", text="Ask the Mage")
+        if not self._streamed:
+            self._replace_answer(answer)
+        self._update_cache_label()
+
+    def _on_close(self):
+        # Perguntas em andamento são abandonadas; os workers são daemon
+        self.ask_service.cancel_all()
+        self._asks.clear()
+        self.destroy()
+
+    def shutdown(self):
+        self.ask_service.shutdown(timeout=ASK_SHUTDOWN_TIMEOUT)
+
+    def _update_cache_label(self):
+        st = self.query_cache.stats()
+        self.cache_label.configure(
+            text=f"Answer cache: {st['hits']} hits / {st['misses']} misses ({st['hit_rate']:.0%})"
+        )
 
     def show_random_advice(self):
         advice = random.choice(MAGE_ADVICE)
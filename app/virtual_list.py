@@ -0,0 +1,241 @@
+# app/virtual_list.py
+# Lista "virtual" sobre um Canvas: só as linhas visíveis viram itens do Tk,
+# recicladas ao rolar. Os dados ficam numa sequência (pode ser preguiçosa),
+# e ordenar/filtrar é trocar a sequência, não mexer no widget.
+
+import bisect
+import tkinter as tk
+import tkinter.font as tkfont
+from collections.abc import Sequence
+
+
+class LazyRows(Sequence):
+    """`length` rows produced by `getter(i)` only when a row is drawn."""
+
+    def __init__(self, length, getter):
+        self._length = length
+        self._getter = getter
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += self._length
+        if not 0 <= i < self._length:
+            raise IndexError(i)
+        return self._getter(i)
+
+
+class Sections(Sequence):
+    """Several sequences read as one (e.g. a header list followed by lazy rows)."""
+
+    def __init__(self, parts):
+        self._parts = [p for p in parts if len(p)]
+        self._starts = []
+        total = 0
+        for p in self._parts:
+            self._starts.append(total)
+            total += len(p)
+        self._length = total
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += self._length
+        if not 0 <= i < self._length:
+            raise IndexError(i)
+        k = bisect.bisect_right(self._starts, i) - 1
+        return self._parts[k][i - self._starts[k]]
+
+
+class VirtualList(tk.Frame):
+    """
+    List over any sequence of strings. Offers the small part of the Listbox
+    API the app uses: curselection, get, selection_set, see. With
+    extended=True, Shift+click / Shift+arrows select a range of rows;
+    Ctrl+C (Cmd+C on macOS) copies the selected rows as text.
+    """
+
+    PAD_X = 8
+
+    def __init__(self, master, items=(), font=None, bg="#2b2621", fg="#e0dcd1",
+                 select_bg="#5a4a3a", select_fg="#e0dcd1", on_activate=None, row_height=None,
+                 extended=False):
+        super().__init__(master, bg=bg)
+        self.font = font or tkfont.Font(family="Georgia", size=14)
+        self.row_height = row_height or self.font.metrics("linespace") + 6
+        self.colors = (bg, fg, select_bg, select_fg)
+        self.on_activate = on_activate
+        self.extended = extended
+
+        self.canvas = tk.Canvas(self, bg=bg, highlightthickness=0, takefocus=1)
+        self.scrollbar = tk.Scrollbar(self, orient="vertical", command=self.yview)
+        self.scrollbar.pack(side="right", fill="y")
+        self.canvas.pack(side="left", fill="both", expand=True)
+
+        self._items = items
+        self._offset = 0      # px rolados desde o topo
+        self._selected = None
+        self._anchor = None   # outra ponta da faixa selecionada (extended)
+        self._pool = []       # [(retângulo, texto)] reutilizados entre redesenhos
+
+        c = self.canvas
+        c.bind("<Configure>", lambda e: self._redraw())
+        c.bind("<MouseWheel>", self._on_wheel)
+        c.bind("<Button-4>", lambda e: self.yview("scroll", -3, "units"))
+        c.bind("<Button-5>", lambda e: self.yview("scroll", 3, "units"))
+        c.bind("<Button-1>", self._on_click)
+        c.bind("<Shift-Button-1>", lambda e: self._on_click(e, extend=True))
+        c.bind("<Shift-Up>", lambda e: self._move(-1, extend=True))
+        c.bind("<Shift-Down>", lambda e: self._move(1, extend=True))
+        copy_key = "<Command-c>" if self.tk.call("tk", "windowingsystem") == "aqua" else "<Control-c>"
+        c.bind(copy_key, lambda e: self.copy())
+        c.bind("<Double-Button-1>", lambda e: self._activate())
+        c.bind("<Return>", lambda e: self._activate())
+        c.bind("<Up>", lambda e: self._move(-1))
+        c.bind("<Down>", lambda e: self._move(1))
+        c.bind("<Prior>", lambda e: self._move(-self._page()))
+        c.bind("<Next>", lambda e: self._move(self._page()))
+        c.bind("<Home>", lambda e: self._move(-len(self._items)))
+        c.bind("<End>", lambda e: self._move(len(self._items)))
+
+    # ---- dados ----
+    def set_items(self, items, keep_position=False):
+        self._items = items
+        self._selected = self._anchor = None
+        if not keep_position:
+            self._offset = 0
+        self._redraw()
+
+    @property
+    def items(self):
+        return self._items
+
+    def __len__(self):
+        return len(self._items)
+
+    # ---- API no estilo Listbox ----
+    def curselection(self):
+        if self._selected is None:
+            return ()
+        lo, hi = sorted((self._selected, self._anchor if self.extended else self._selected))
+        return tuple(range(lo, hi + 1))
+
+    def get(self, index):
+        return self._items[index]
+
+    def selection_set(self, index):
+        self._selected = self._anchor = index if 0 <= index < len(self._items) else None
+        self._redraw()
+
+    def copy(self):
+        """Puts the selected rows on the clipboard, one per line."""
+        rows = self.curselection()
+        if rows:
+            self.clipboard_clear()
+            self.clipboard_append("\n".join(str(self._items[i]) for i in rows))
+        return "break"
+
+    def see(self, index):
+        h = self._view_height()
+        top = index * self.row_height
+        if top < self._offset:
+            self._offset = top
+        elif top + self.row_height > self._offset + h:
+            self._offset = top + self.row_height - h
+        self._redraw()
+
+    # ---- rolagem (protocolo do Scrollbar) ----
+    def yview(self, *args):
+        total = len(self._items) * self.row_height
+        if not args:
+            return self._fractions(total)
+        if args[0] == "moveto":
+            self._offset = float(args[1]) * total
+        elif args[0] == "scroll":
+            step = self.row_height if args[2] == "units" else self._view_height()
+            self._offset += int(args[1]) * step
+        self._redraw()
+
+    def _fractions(self, total):
+        if total <= 0:
+            return 0.0, 1.0
+        return self._offset / total, min(1.0, (self._offset + self._view_height()) / total)
+
+    def _view_height(self):
+        return max(1, self.canvas.winfo_height())
+
+    def _on_wheel(self, event):
+        # Windows manda múltiplos de 120; o macOS manda ±1..3 por evento
+        if abs(event.delta) >= 120:
+            steps = -int(event.delta / 120) * 3
+        else:
+            steps = -1 if event.delta > 0 else 1 if event.delta < 0 else 0
+        self.yview("scroll", steps, "units")
+
+    def _page(self):
+        return max(1, self._view_height() // self.row_height - 1)
+
+    # ---- desenho ----
+    def _redraw(self):
+        c = self.canvas
+        bg, fg, sel_bg, sel_fg = self.colors
+        h = self._view_height()
+        w = max(1, c.winfo_width())
+        rh = self.row_height
+        n = len(self._items)
+        total = n * rh
+        self._offset = max(0, min(self._offset, max(0, total - h)))
+
+        chosen = self.curselection()
+        lo, hi = (chosen[0], chosen[-1]) if chosen else (-1, -2)
+        first = int(self._offset // rh)
+        needed = h // rh + 2
+        while len(self._pool) < needed:
+            rect = c.create_rectangle(0, 0, 0, 0, width=0, fill=bg)
+            text = c.create_text(self.PAD_X, 0, anchor="w", font=self.font, fill=fg)
+            self._pool.append((rect, text))
+
+        for k, (rect, text) in enumerate(self._pool):
+            i = first + k
+            if k >= needed or i >= n:
+                c.itemconfigure(rect, state="hidden")
+                c.itemconfigure(text, state="hidden")
+                continue
+            y = i * rh - self._offset
+            selected = lo <= i <= hi
+            c.coords(rect, 0, y, w, y + rh)
+            c.itemconfigure(rect, state="normal", fill=sel_bg if selected else bg)
+            c.coords(text, self.PAD_X, y + rh / 2)
+            c.itemconfigure(text, state="normal", text=str(self._items[i]), fill=sel_fg if selected else fg)
+        self.scrollbar.set(*self._fractions(total))
+
+    # ---- interação ----
+    def _on_click(self, event, extend=False):
+        self.canvas.focus_set()
+        i = int((event.y + self._offset) // self.row_height)
+        if 0 <= i < len(self._items):
+            if not extend or self._anchor is None:
+                self._anchor = i
+            self._selected = i
+            self._redraw()
+
+    def _move(self, delta, extend=False):
+        if not len(self._items):
+            return
+        cur = self._selected if self._selected is not None else -1 if delta > 0 else len(self._items)
+        self._selected = max(0, min(len(self._items) - 1, cur + delta))
+        if not extend or self._anchor is None:
+            self._anchor = self._selected
+        self.see(self._selected)
+
+    def _activate(self):
+        if self.on_activate is not None and self._selected is not None:
+            self.on_activate(self._selected)
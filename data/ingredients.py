@@ -124,4 +124,106 @@ EFFECT_TO_INGREDIENTS = {effect: [] for effect in ALL_EFFECTS}
 for ingredient, effects in INGREDIENTS.items():
     for effect in effects:
         EFFECT_TO_INGREDIENTS[effect].append(ingredient)
-        
\ No newline at end of file
+        
+# Bitsets: bit i de uma máscara de efeitos = ALL_EFFECTS[i] (ordem alfabética),
+# bit j de uma máscara de ingredientes = INGREDIENT_NAMES[j]
+INGREDIENT_NAMES = list(INGREDIENTS)
+EFFECT_BIT = {effect: 1 << i for i, effect in enumerate(ALL_EFFECTS)}
+INGREDIENT_MASK = {
+    ingredient: sum(EFFECT_BIT[e] for e in set(effects))
+    for ingredient, effects in INGREDIENTS.items()
+}
+EFFECT_INGREDIENT_MASK = {effect: 0 for effect in ALL_EFFECTS}
+for j, ingredient in enumerate(INGREDIENT_NAMES):
+    for effect in set(INGREDIENTS[ingredient]):
+        EFFECT_INGREDIENT_MASK[effect] |= 1 << j
+
+
+def iter_bits(mask):
+    """Indices of the set bits, lowest first."""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+def effects_in_mask(mask):
+    return [ALL_EFFECTS[i] for i in iter_bits(mask)]
+
+
+def ingredients_in_mask(mask):
+    return [INGREDIENT_NAMES[j] for j in iter_bits(mask)]
+
+# Valores base de cada efeito (UESP, Skyrim:Alchemy Effects):
+# efeito: (magnitude, duração em s, custo base, nocivo)
+EFFECT_DATA = {
+    "Cure Disease":             (5, 0, 0.5, False),
+    "Damage Health":            (2, 1, 3.0, True),
+    "Damage Magicka":           (3, 0, 2.2, True),
+    "Damage Magicka Regen":     (100, 5, 0.5, True),
+    "Damage Stamina":           (3, 0, 1.8, True),
+    "Damage Stamina Regen":     (100, 5, 0.3, True),
+    "Fear":                     (1, 30, 5.0, True),
+    "Fortify Alteration":       (4, 60, 0.2, False),
+    "Fortify Barter":           (1, 30, 2.0, False),
+    "Fortify Block":            (4, 60, 0.5, False),
+    "Fortify Carry Weight":     (4, 300, 0.15, False),
+    "Fortify Conjuration":      (5, 60, 0.25, False),
+    "Fortify Destruction":      (5, 60, 0.5, False),
+    "Fortify Enchanting":       (1, 30, 0.6, False),
+    "Fortify Health":           (4, 60, 0.35, False),
+    "Fortify Heavy Armor":      (2, 60, 0.5, False),
+    "Fortify Illusion":         (4, 60, 0.4, False),
+    "Fortify Light Armor":      (2, 60, 0.5, False),
+    "Fortify Lockpicking":      (2, 30, 0.5, False),
+    "Fortify Magicka":          (4, 60, 0.3, False),
+    "Fortify Marksman":         (4, 60, 0.5, False),
+    "Fortify One-Handed":       (4, 60, 0.5, False),
+    "Fortify Pickpocket":       (4, 60, 0.5, False),
+    "Fortify Restoration":      (4, 60, 0.5, False),
+    "Fortify Smithing":         (4, 30, 0.75, False),
+    "Fortify Sneak":            (4, 60, 0.5, False),
+    "Fortify Stamina":          (4, 60, 0.3, False),
+    "Fortify Two-Handed":       (4, 60, 0.5, False),
+    "Frenzy":                   (1, 10, 15.0, True),
+    "Invisibility":             (0, 4, 100.0, False),
+    "Lingering Damage Health":  (1, 10, 12.0, True),
+    "Lingering Damage Magicka": (1, 10, 10.0, True),
+    "Lingering Damage Stamina": (1, 10, 1.8, True),
+    "Paralysis":                (0, 1, 500.0, True),
+    "Ravage Health":            (2, 10, 0.4, True),
+    "Ravage Magicka":           (2, 10, 1.0, True),
+    "Ravage Stamina":           (2, 10, 1.6, True),
+    "Regenerate Health":        (5, 300, 0.1, False),
+    "Regenerate Magicka":       (5, 300, 0.1, False),
+    "Regenerate Stamina":       (5, 300, 0.1, False),
+    "Resist Fire":              (3, 60, 0.5, False),
+    "Resist Frost":             (3, 60, 0.5, False),
+    "Resist Magic":             (1, 60, 1.0, False),
+    "Resist Poison":            (4, 60, 0.5, False),
+    "Resist Shock":             (3, 60, 0.5, False),
+    "Restore Health":           (5, 0, 0.5, False),
+    "Restore Magicka":          (5, 0, 0.6, False),
+    "Restore Stamina":          (5, 0, 0.6, False),
+    "Slow":                     (50, 5, 1.0, True),
+    "Waterbreathing":           (0, 5, 30.0, False),
+    "Weakness to Fire":         (3, 30, 0.6, True),
+    "Weakness to Frost":        (3, 30, 0.5, True),
+    "Weakness to Magic":        (2, 30, 1.0, True),
+    "Weakness to Poison":       (2, 30, 1.0, True),
+    "Weakness to Shock":        (3, 30, 0.7, True),
+}
+
+# Ingredientes cujo efeito foge do valor base (UESP, páginas de cada ingrediente):
+# (ingrediente, efeito) -> (mult. de magnitude, mult. de duração, mult. de valor).
+# Na poção vale o ingrediente mais forte da combinação para cada efeito.
+INGREDIENT_OVERRIDES = {
+    ("Blisterwort", "Restore Health"):       (0.6, 1.0, 1.0),
+    ("Crimson Nirnroot", "Damage Health"):   (3.0, 1.0, 1.0),
+    ("Crimson Nirnroot", "Damage Stamina"):  (3.0, 1.0, 1.0),
+    ("Deathbell", "Damage Health"):          (1.5, 1.0, 1.0),
+    ("Eye of Sabre Cat", "Restore Health"):  (0.4, 1.0, 1.0),
+    ("Giant's Toe", "Fortify Health"):       (1.0, 1.0, 2.5),
+    ("Imp Stool", "Restore Health"):         (0.6, 1.0, 1.0),
+    ("River Betty", "Damage Health"):        (2.5, 1.0, 1.0),
+}
@@ -1,28 +1,32 @@
 # main.py
 
+import time
+_T0 = time.perf_counter()
+
+import multiprocessing
+import sys
+
 import customtkinter as ctk
+from app.startup import StartupTimings
 from app.ui import SkyrimAssistantApp
-from rag.pipeline import setup_rag_pipeline
 
 ctk.set_appearance_mode("dark")
 ctk.set_default_color_theme("blue")
 
 def main():
-    print("[INFO] Preparing Skyrim Survival Mode Assistant...")
-    texts, index, _ = setup_rag_pipeline()
-
-    if index is None:
-        print("\n[CRITICAL] Knowledge base failed to load.")
-        print("Check that you have:")
-        print("  - API key in 'secrets/API_KEY.txt'")
-        print("  - At least one PDF in the 'files/' folder")
-        input("\nPress Enter to close...")
-        return
+    # python main.py --timings : mostra o tempo de import, carga do cache e primeira pintura
+    timings = StartupTimings(_T0, enabled="--timings" in sys.argv)
+    timings.mark("imports")
 
+    print("[INFO] Preparing Skyrim Survival Mode Assistant...")
     print("[INFO] Launching App...")
-    app = SkyrimAssistantApp((texts, index))
-    app.mainloop()
+    app = SkyrimAssistantApp(timings=timings)
+    try:
+        app.mainloop()
+    finally:
+        app.shutdown()  # cancela perguntas pendentes sem esperar chamadas de rede travadas
     print("[INFO] App closed.")
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()  # extração de PDFs em processos (executável)
     main()
@@ -0,0 +1,100 @@
+# rag/chunk_store.py
+
+import json
+import mmap
+import os
+from collections.abc import Sequence
+
+import numpy as np
+
+TEXT_FILE = "chunks.bin"
+INDEX_FILE = "chunks_index.npy"
+META_FILE = "chunks_meta.json"
+
+INDEX_DTYPE = np.dtype([
+    ("offset", "<u8"),   # posição em bytes no chunks.bin
+    ("length", "<u4"),   # tamanho em bytes (UTF-8)
+    ("source", "<u2"),   # índice em meta["sources"]
+    ("page", "<u4"),
+    ("section", "<i4"),  # índice em meta["sections"], -1 = sem seção
+])
+
+
+class ChunkStore(Sequence):
+    """
+    Read-only chunk texts backed by mmap. Only the rows that are accessed get
+    decoded, so startup cost does not grow with the number of chunks.
+    """
+
+    def __init__(self, directory):
+        with open(os.path.join(directory, META_FILE), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        self.sources = meta["sources"]
+        self.sections = meta["sections"]
+        self._index = np.load(os.path.join(directory, INDEX_FILE), mmap_mode="r")
+        self._file = open(os.path.join(directory, TEXT_FILE), "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+
+    def __len__(self):
+        return len(self._index)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        row = self._index[i]
+        start = int(row["offset"])
+        return self._mm[start:start + int(row["length"])].decode("utf-8")
+
+    def meta(self, i):
+        row = self._index[i]
+        section = int(row["section"])
+        return {
+            "source": self.sources[int(row["source"])],
+            "page": int(row["page"]),
+            "section": self.sections[section] if section >= 0 else None,
+            "offset": int(row["offset"]),
+            "length": int(row["length"]),
+        }
+
+    def close(self):
+        if isinstance(self._mm, mmap.mmap):
+            self._mm.close()
+        self._file.close()
+        self._index = np.empty(0, dtype=INDEX_DTYPE)
+
+
+def chunk_store_exists(directory):
+    return all(os.path.exists(os.path.join(directory, n)) for n in (TEXT_FILE, INDEX_FILE, META_FILE))
+
+
+def write_chunk_store(directory, texts, metadata):
+    """Writes texts + metadata (dicts with source/page/section) atomically."""
+    sources, sections = [], []
+    source_ids, section_ids = {}, {}
+    index = np.zeros(len(texts), dtype=INDEX_DTYPE)
+    tmp = {n: os.path.join(directory, n + ".tmp") for n in (TEXT_FILE, INDEX_FILE, META_FILE)}
+
+    offset = 0
+    with open(tmp[TEXT_FILE], "wb") as f:
+        for i, (text, meta) in enumerate(zip(texts, metadata)):
+            data = text.encode("utf-8")
+            f.write(data)
+            src = source_ids.setdefault(meta["source"], len(sources))
+            if src == len(sources):
+                sources.append(meta["source"])
+            sec = -1
+            if meta.get("section"):
+                sec = section_ids.setdefault(meta["section"], len(sections))
+                if sec == len(sections):
+                    sections.append(meta["section"])
+            index[i] = (offset, len(data), src, meta.get("page", 0), sec)
+            offset += len(data)
+
+    with open(tmp[INDEX_FILE], "wb") as f:
+        np.save(f, index)
+    with open(tmp[META_FILE], "w", encoding="utf-8") as f:
+        json.dump({"sources": sources, "sections": sections}, f, ensure_ascii=False)
+
+    for name in (TEXT_FILE, INDEX_FILE, META_FILE):
+        os.replace(tmp[name], os.path.join(directory, name))
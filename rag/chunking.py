@@ -0,0 +1,141 @@
+# rag/chunking.py
+# Chunker que respeita a estrutura do PDF (blocos, títulos e páginas do fitz)
+# em vez de cortar o texto inteiro em "\n\n".
+
+import re
+from collections import namedtuple
+
+from rag.config import CHUNKING
+
+Chunk = namedtuple("Chunk", "text section")
+Block = namedtuple("Block", "text size bold")
+
+NOISE_CHARS = 20  # números de página, rodapés soltos
+HEADING_SIZE_RATIO = 1.15
+HEADING_MAX_CHARS = 120
+BOLD_FLAG = 16
+
+_SENTENCE_END = re.compile(r"(?<=[.!?;:])\s+")
+
+
+def page_blocks(page):
+    """Text blocks of a fitz page, with the block's largest font size and boldness."""
+    blocks = []
+    for b in page.get_text("dict").get("blocks", []):
+        if b.get("type") != 0:
+            continue
+        lines, size, chars, bold_chars = [], 0.0, 0, 0
+        for line in b.get("lines", []):
+            spans = line.get("spans", [])
+            lines.append("".join(s.get("text", "") for s in spans))
+            for s in spans:
+                n = len(s.get("text", "").strip())
+                chars += n
+                size = max(size, s.get("size", 0.0))
+                if s.get("flags", 0) & BOLD_FLAG:
+                    bold_chars += n
+        text = " ".join(" ".join(l.split()) for l in lines).strip()
+        if text:
+            blocks.append(Block(text, size, chars > 0 and bold_chars == chars))
+    return blocks
+
+
+def _body_size(blocks):
+    # Tamanho de fonte com mais caracteres na página = corpo do texto
+    weights = {}
+    for b in blocks:
+        weights[round(b.size, 1)] = weights.get(round(b.size, 1), 0) + len(b.text)
+    return max(weights, key=weights.get) if weights else 0.0
+
+
+def is_heading(block, body_size):
+    if len(block.text) > HEADING_MAX_CHARS or block.text[-1:] in ".,;":
+        return False
+    return block.size >= body_size * HEADING_SIZE_RATIO or (block.bold and block.size >= body_size)
+
+
+def _split_long(text, max_chars):
+    """Splits an oversized block on sentence ends, then on whitespace."""
+    pieces, cur = [], ""
+    for sentence in _SENTENCE_END.split(text):
+        while len(sentence) > max_chars:
+            cut = sentence.rfind(" ", 0, max_chars)
+            cut = cut if cut > max_chars // 2 else max_chars
+            head, sentence = sentence[:cut].strip(), sentence[cut:].strip()
+            if cur:
+                pieces.append(cur)
+                cur = ""
+            pieces.append(head)
+        if cur and len(cur) + 1 + len(sentence) > max_chars:
+            pieces.append(cur)
+            cur = sentence
+        else:
+            cur = f"{cur} {sentence}".strip()
+    if cur:
+        pieces.append(cur)
+    return pieces
+
+
+def _tail(text, n):
+    if n <= 0 or len(text) <= n:
+        return ""
+    cut = text.find(" ", len(text) - n)
+    return text[cut + 1:] if cut != -1 else ""
+
+
+def chunk_blocks(blocks, settings=None):
+    """
+    Groups a page's blocks into chunks of about `target_chars`, never above
+    `max_chars`. Headings start a new section (and a new chunk); fragments
+    below `min_chars` are merged into a neighbour of the same section; chunks
+    in the same section share `overlap_chars` of trailing context.
+    Returns a list of Chunk; `section` is None until the page's first heading.
+    """
+    cfg = dict(CHUNKING, **(settings or {}))
+    target, max_chars = cfg["target_chars"], cfg["max_chars"]
+    min_chars, overlap = cfg["min_chars"], cfg["overlap_chars"]
+    body = _body_size(blocks)
+
+    sections = []  # [(title, [pieces])]
+    title, pieces = None, []
+    for b in blocks:
+        if is_heading(b, body):
+            if pieces:
+                sections.append((title, pieces))
+            title, pieces = b.text, [b.text]
+            continue
+        pieces.extend(_split_long(b.text, max_chars) if len(b.text) > max_chars else [b.text])
+    if pieces:
+        sections.append((title, pieces))
+
+    chunks = []
+    for title, pieces in sections:
+        texts, cur = [], ""
+        for p in pieces:
+            if cur and len(cur) + 1 + len(p) > max_chars:
+                texts.append(cur)
+                cur = ""
+            cur = f"{cur}\n{p}" if cur else p
+            if len(cur) >= target:
+                texts.append(cur)
+                cur = ""
+        if cur:
+            if texts and len(cur) < min_chars and len(texts[-1]) + 1 + len(cur) <= max_chars:
+                texts[-1] = f"{texts[-1]}\n{cur}"
+            else:
+                texts.append(cur)
+        for i, t in enumerate(texts):
+            if i and overlap:
+                prefix = _tail(texts[i - 1], min(overlap, max_chars - len(t) - 3))
+                t = f"{prefix} … {t}" if prefix else t
+            chunks.append(Chunk(t, title))
+
+    # Seções minúsculas (ex.: só o título) são fundidas com a seguinte
+    merged = []
+    for c in chunks:
+        if merged and len(merged[-1].text) < min_chars \
+                and len(merged[-1].text) + 1 + len(c.text) <= max_chars:
+            prev = merged.pop()
+            c = Chunk(f"{prev.text}\n{c.text}", prev.section if c.section is None else c.section)
+        merged.append(c)
+    return [c for c in merged if len(c.text) >= NOISE_CHARS]
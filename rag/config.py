@@ -1,17 +1,72 @@
 # rag/config.py
 
 import os
-import google.generativeai as genai
 
 # Caminho do arquivo com a chave da API
 API_KEY_PATH = "secrets/API_KEY.txt"
 
+# Pastas de dados e cache
+FILES_DIR = "files"
+CACHE_DIR = "cache"
+
 # Modelos Gemini
 EMBED_MODEL = "models/embedding-001"
 GEN_MODEL = "models/gemini-2.5-pro"
 
+# Embeddings: tamanho máximo do lote (limite da API) e requisições simultâneas
+EMBED_BATCH_SIZE = 100
+EMBED_WORKERS = 4
+
+# Chunking (em caracteres; ~4 caracteres por token). Mudar qualquer valor força rebuild do cache.
+CHUNKING = {
+    "version": "blocks-v1",
+    "target_chars": 1200,
+    "max_chars": 2000,
+    "min_chars": 200,
+    "overlap_chars": 150,
+}
+
+# Primeira execução sem cache: instala a base pronta (rag/kb_bundle.py) de
+# KB_BUNDLE_FILE, na pasta do app, ou de KB_BUNDLE_URL (asset do release). Sem
+# nenhuma, os guias são buscados só por palavras-chave; EMBED_ON_FIRST_RUN = True
+# embeda tudo pela API do Gemini (gasta cota).
+KB_BUNDLE_FILE = "knowledge_base.zip"
+KB_BUNDLE_URL = ""
+EMBED_ON_FIRST_RUN = False
+
+# Índice vetorial: "auto" (pelo tamanho do corpus), "flat", "ivf_flat", "ivf_pq" ou "hnsw"
+INDEX_KIND = "auto"
+
+# Busca híbrida: candidatos por lista (× top_k) e prazo do embedding da pergunta (s)
+HYBRID_CANDIDATES = 4
+QUERY_EMBED_TIMEOUT = 8.0
+
+# "Ask the Mage": workers, perguntas na fila e prazo de cada etapa (s).
+# O embed da pergunta usa QUERY_EMBED_TIMEOUT; "search" cobre embed + FAISS + BM25.
+ASK_WORKERS = 2
+ASK_MAX_PENDING = 8
+ASK_SEARCH_TIMEOUT = 15.0
+ASK_FIRST_TOKEN_TIMEOUT = 30.0
+ASK_GENERATE_TIMEOUT = 90.0
+ASK_SHUTDOWN_TIMEOUT = 2.0
+# Uma etapa que estoura o prazo é abandonada, mas sua thread só é liberada quando
+# a chamada à API termina; o embed e a geração passam o próprio prazo ao cliente
+# (QUERY_EMBED_TIMEOUT, ASK_GENERATE_TIMEOUT). Por isso há 2 threads de etapa por
+# worker: a etapa em curso e, no máximo, uma abandonada ainda terminando.
+ASK_STAGE_WORKERS = ASK_WORKERS * 2
+
+# Exportação das métricas do painel de diagnóstico (JSON/CSV)
+TRACE_DIR = os.path.join(CACHE_DIR, "traces")
+
+# Cache de respostas do "Ask the Mage"
+QUERY_CACHE_FILE = "query_cache.sqlite"
+QUERY_CACHE_MAX_ENTRIES = 500
+QUERY_CACHE_TTL = 7 * 24 * 3600
+QUERY_VECTOR_MAX_ENTRIES = 2000  # embeddings de perguntas guardados (LRU)
+
 # Função para carregar a chave da API e configurar a lib
 def configure_gemini():
+    import google.generativeai as genai
     try:
         if os.path.exists(API_KEY_PATH):
             with open(API_KEY_PATH, "r") as file:
@@ -0,0 +1,147 @@
+# rag/embed_store.py
+
+import hashlib
+import json
+import os
+import threading
+
+import numpy as np
+
+VEC_FILE = "embeddings.f32"
+KEYS_FILE = "embeddings_keys.txt"
+META_FILE = "embeddings_meta.json"
+
+
+class EmbeddingStore:
+    """
+    Content-addressed embedding cache: sha1(model + text) -> float32 vector.
+    Vectors live in an append-only float32 matrix read through np.memmap,
+    keys in a parallel text file (one hex digest per line, same row order).
+    """
+
+    def __init__(self, directory, model):
+        self.model = model
+        self.vec_path = os.path.join(directory, VEC_FILE)
+        self.keys_path = os.path.join(directory, KEYS_FILE)
+        self.meta_path = os.path.join(directory, META_FILE)
+        self._lock = threading.Lock()
+        self._rows = {}
+        self._dim = None
+        self._mm = None
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+
+    def _load(self):
+        meta = {}
+        if os.path.exists(self.meta_path):
+            try:
+                with open(self.meta_path, "r", encoding="utf-8") as f:
+                    meta = json.load(f)
+            except Exception as e:
+                print(f"[WARNING] Embedding store metadata unreadable: {e}")
+        if meta.get("model") != self.model or not meta.get("dim"):
+            self._reset()
+            return
+        self._dim = int(meta["dim"])
+        keys = []
+        if os.path.exists(self.keys_path):
+            with open(self.keys_path, "r", encoding="ascii") as f:
+                keys = [line.strip() for line in f if line.strip()]
+        n_vecs = os.path.getsize(self.vec_path) // (4 * self._dim) if os.path.exists(self.vec_path) else 0
+        # Uma escrita interrompida pode deixar chaves ou vetores sobrando: vale o menor
+        n = min(len(keys), n_vecs)
+        if n < len(keys) or n < n_vecs:
+            keys = keys[:n]
+            with open(self.keys_path, "w", encoding="ascii") as f:
+                f.writelines(k + "\n" for k in keys)
+            with open(self.vec_path, "r+b") as f:
+                f.truncate(n * 4 * self._dim)
+        self._rows = {k: i for i, k in enumerate(keys)}
+
+    def _reset(self):
+        for path in (self.vec_path, self.keys_path, self.meta_path):
+            if os.path.exists(path):
+                os.remove(path)
+        self._rows, self._dim, self._mm = {}, None, None
+
+    def __len__(self):
+        return len(self._rows)
+
+    def key(self, text):
+        return hashlib.sha1(f"{self.model}\0{text}".encode("utf-8")).hexdigest()
+
+    def _matrix(self):
+        if self._mm is None or len(self._mm) != len(self._rows):
+            self._mm = np.memmap(self.vec_path, dtype="float32", mode="r",
+                                 shape=(len(self._rows), self._dim))
+        return self._mm
+
+    def missing(self, texts):
+        """Unique texts (first-seen order) that have no stored vector yet."""
+        seen, out = set(), []
+        with self._lock:
+            for t in texts:
+                k = self.key(t)
+                if k not in self._rows and k not in seen:
+                    seen.add(k)
+                    out.append(t)
+        return out
+
+    def get(self, text):
+        with self._lock:
+            row = self._rows.get(self.key(text))
+            if row is None:
+                return None
+            return np.array(self._matrix()[row], dtype="float32")
+
+    def get_many(self, texts):
+        """Returns an (n, dim) float32 array, or None if any text is missing."""
+        with self._lock:
+            rows = [self._rows.get(self.key(t)) for t in texts]
+            if not rows or any(r is None for r in rows):
+                return None
+            return np.array(self._matrix()[rows], dtype="float32")
+
+    def put_many(self, texts, vectors):
+        vectors = np.asarray(vectors, dtype="float32")
+        if len(texts) == 0:
+            return
+        with self._lock:
+            if self._dim is None:
+                self._dim = int(vectors.shape[1])
+                with open(self.meta_path, "w", encoding="utf-8") as f:
+                    json.dump({"model": self.model, "dim": self._dim}, f)
+            elif vectors.shape[1] != self._dim:
+                raise ValueError(f"Embedding dim {vectors.shape[1]} != store dim {self._dim}")
+            new_keys, new_rows, seen = [], [], set()
+            for t, v in zip(texts, vectors):
+                k = self.key(t)
+                if k in self._rows or k in seen:
+                    continue
+                seen.add(k)
+                new_keys.append(k)
+                new_rows.append(v)
+            if not new_keys:
+                return
+            self._mm = None  # solta o mapeamento antes de crescer o arquivo
+            with open(self.vec_path, "ab") as f:
+                f.write(np.ascontiguousarray(new_rows, dtype="float32").tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+            with open(self.keys_path, "a", encoding="ascii") as f:
+                f.writelines(k + "\n" for k in new_keys)
+            base = len(self._rows)
+            for i, k in enumerate(new_keys):
+                self._rows[k] = base + i
+
+
+_STORES = {}
+_STORES_LOCK = threading.Lock()
+
+
+def get_embedding_store(directory, model):
+    with _STORES_LOCK:
+        key = (os.path.abspath(directory), model)
+        if key not in _STORES:
+            _STORES[key] = EmbeddingStore(directory, model)
+        return _STORES[key]
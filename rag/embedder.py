@@ -0,0 +1,150 @@
+# rag/embedder.py
+
+import hashlib
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+import numpy as np
+
+
+class RateLimitError(RuntimeError):
+    pass
+
+
+def is_rate_limit(exc):
+    if isinstance(exc, RateLimitError):
+        return True
+    text = f"{type(exc).__name__} {exc}".lower()
+    return any(s in text for s in ("resourceexhausted", "429", "rate limit", "quota"))
+
+
+class EmbeddingExecutor:
+    """
+    Embeds texts with bounded concurrency. Each batch is retried with
+    exponential backoff; batch size shrinks on errors and grows back on
+    success. Finished batches go straight into the EmbeddingStore, which is
+    the on-disk checkpoint: a rerun only embeds what is still missing.
+    """
+
+    def __init__(self, embed_fn, store, max_workers=4, batch_size=100, min_batch_size=8,
+                 max_retries=5, base_delay=1.0, max_delay=30.0, sleep=time.sleep):
+        self.embed_fn = embed_fn
+        self.store = store
+        self.max_workers = max(1, max_workers)
+        self.max_batch_size = max(1, batch_size)
+        self.min_batch_size = max(1, min(min_batch_size, self.max_batch_size))
+        self.batch_size = self.max_batch_size
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.sleep = sleep
+        self._lock = threading.Lock()
+        self._cooldown_until = 0.0
+        self.stats = {"batches": 0, "retries": 0, "rate_limited": 0, "failed": 0, "embedded": 0}
+
+    def run(self, texts):
+        """Embeds every text missing from the store. Returns the texts that still failed."""
+        todo = self.store.missing(texts)
+        if not todo:
+            return []
+        cursor = 0
+        retry = deque()
+        failed = []
+        inflight = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="embed") as pool:
+            while cursor < len(todo) or retry or inflight:
+                while len(inflight) < self.max_workers and (retry or cursor < len(todo)):
+                    if retry:
+                        batch, attempt = retry.popleft()
+                    else:
+                        batch, attempt = todo[cursor:cursor + self.batch_size], 0
+                        cursor += len(batch)
+                    fut = pool.submit(self._call, batch, attempt)
+                    inflight[fut] = (batch, attempt)
+                done, _ = wait(inflight, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    batch, attempt = inflight.pop(fut)
+                    try:
+                        vectors = fut.result()
+                        self.store.put_many(batch, vectors)
+                        self._on_success(len(batch))
+                    except Exception as e:
+                        self._on_failure(e)
+                        if attempt + 1 > self.max_retries:
+                            print(f"[ERROR] Embedding batch of {len(batch)} gave up: {e}")
+                            self.stats["failed"] += len(batch)
+                            failed.extend(batch)
+                            continue
+                        self.stats["retries"] += 1
+                        for piece in self._split(batch):
+                            retry.append((piece, attempt + 1))
+        return failed
+
+    def _call(self, batch, attempt):
+        delay = 0.0
+        if attempt:
+            delay = min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))
+            delay *= 0.5 + random.random()
+        with self._lock:
+            delay = max(delay, self._cooldown_until - time.monotonic())
+        if delay > 0:
+            self.sleep(delay)
+        vectors = self.embed_fn(batch)
+        if vectors is None or len(vectors) != len(batch):
+            raise RuntimeError("Embedding response size does not match the batch.")
+        return np.asarray(vectors, dtype="float32")
+
+    def _split(self, batch):
+        size = self.batch_size
+        if len(batch) <= size:
+            return [batch]
+        return [batch[i:i + size] for i in range(0, len(batch), size)]
+
+    def _on_success(self, n):
+        with self._lock:
+            self.stats["batches"] += 1
+            self.stats["embedded"] += n
+            self.batch_size = min(self.max_batch_size, self.batch_size + max(1, self.batch_size // 4))
+
+    def _on_failure(self, exc):
+        with self._lock:
+            self.batch_size = max(self.min_batch_size, self.batch_size // 2)
+            if is_rate_limit(exc):
+                self.stats["rate_limited"] += 1
+                # Todos os workers esperam juntos quando a API manda desacelerar
+                self._cooldown_until = max(self._cooldown_until, time.monotonic() + self.base_delay)
+
+
+class FakeEmbedder:
+    """
+    Local stand-in for the embedding API: deterministic vectors per text, with
+    configurable latency and injected errors / rate limits.
+    """
+
+    def __init__(self, dim=16, latency=0.0, error_rate=0.0, rate_limit_rate=0.0, seed=0):
+        self.dim = dim
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+
+    def __call__(self, batch):
+        with self._lock:
+            self.calls += 1
+            roll = self._rng.random()
+        if self.latency:
+            time.sleep(self.latency)
+        if roll < self.rate_limit_rate:
+            raise RateLimitError("429 rate limit exceeded (fake)")
+        if roll < self.rate_limit_rate + self.error_rate:
+            raise RuntimeError("transient embedding failure (fake)")
+        return [self.vector(t) for t in batch]
+
+    def vector(self, text):
+        seed = int(hashlib.sha1(text.encode("utf-8")).hexdigest()[:8], 16)
+        return np.random.default_rng(seed).standard_normal(self.dim).astype("float32")
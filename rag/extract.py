@@ -0,0 +1,81 @@
+# rag/extract.py
+# Extração de texto dos PDFs em vários processos. Fica num módulo leve (só fitz)
+# para que os processos filhos não importem o resto do pipeline.
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import fitz  # PyMuPDF
+
+from rag.chunking import Chunk, chunk_blocks, page_blocks
+
+PAGES_PER_TASK = 16
+MIN_PAGES_FOR_POOL = 32
+
+
+def _extract_range(task):
+    file_name, start, stop, settings = task
+    pages = []
+    with fitz.open(file_name) as doc:
+        for page_no in range(start, stop):
+            pages.append((page_no, chunk_blocks(page_blocks(doc[page_no]), settings)))
+    return file_name, pages
+
+
+def _plan_tasks(file_names, pages_per_task, settings):
+    tasks = []
+    for file_name in file_names:
+        if not os.path.exists(file_name):
+            print(f"[WARNING] File '{file_name}' not found.")
+            continue
+        try:
+            with fitz.open(file_name) as doc:
+                n_pages = doc.page_count
+        except Exception as e:
+            print(f"[ERROR] Processing '{file_name}': {e}")
+            continue
+        for start in range(0, n_pages, pages_per_task):
+            tasks.append((file_name, start, min(n_pages, start + pages_per_task), settings))
+    return tasks
+
+
+def _safe_extract(task):
+    try:
+        return _extract_range(task)
+    except Exception as e:
+        print(f"[ERROR] Processing '{task[0]}' pages {task[1]}-{task[2] - 1}: {e}")
+        return task[0], []
+
+
+def _with_sections(results):
+    # O título da seção continua valendo nas páginas seguintes até o próximo título
+    current = {}
+    for file_name, pages in results:
+        for page_no, chunks in pages:
+            section = current.get(file_name)
+            out = []
+            for c in chunks:
+                if c.section is None:
+                    c = Chunk(c.text, section)
+                section = c.section
+                out.append(c)
+            current[file_name] = section
+            yield file_name, page_no, out
+
+
+def iter_pdf_chunks(file_names, settings=None, max_workers=None, pages_per_task=PAGES_PER_TASK):
+    """
+    Yields (file_name, page_no, [Chunk]) page by page, always in file order and
+    then page order, regardless of which worker finished first.
+    """
+    tasks = _plan_tasks(file_names, pages_per_task, settings)
+    total_pages = sum(stop - start for _, start, stop, _ in tasks)
+    workers = max_workers or min(len(tasks), os.cpu_count() or 1)
+
+    if workers <= 1 or total_pages < MIN_PAGES_FOR_POOL:
+        yield from _with_sections(map(_safe_extract, tasks))
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # map() devolve na ordem de submissão, mas à medida que cada tarefa termina
+        yield from _with_sections(pool.map(_safe_extract, tasks))
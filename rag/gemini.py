@@ -1,31 +1,65 @@
 # rag/gemini.py
 
-from rag.config import GEN_MODEL
-import google.generativeai as genai
+import time
 
-def generate_response(query, context):
+from rag.config import GEN_MODEL, ASK_GENERATE_TIMEOUT
+from rag.tracing import incr, observe
+
+EMPTY_ANSWER = "The scrolls revealed nothing clear this time."
+ERROR_ANSWER = "The cold winds of Skyrim seem to interfere with my magic. Try again."
+
+# Remove a marcação markdown num único passo (vale para a resposta inteira ou por pedaço)
+_MARKDOWN = str.maketrans("", "", "*#_")
+
+def build_prompt(query, context):
     system = (
         "You are a wise old mage from High Hrothgar, offering help in Skyrim Survival Mode.\n"
         "Respond only with the CONTEXT. Never invent information.\n"
         "If no answer exists in the context, say so.\n"
-        "For travel, suggest both walking and carriage routes.\n"
+        "For travel, suggest both walking and carriage routes; when the context has\n"
+        "TRAVEL ROUTES, use exactly those routes and times, in the direction the player asked.\n"
         "Keep answers short and immersive."
     )
-    prompt = (
+    return (
         f"{system}\n\n"
         f"CONTEXT:\n{context}\n\n"
         f"PLAYER'S QUESTION:\n\"{query}\"\n\n"
         f"Your answer (short, direct, immersive):"
         )
 
+def generate_response_stream(query, context):
+    """
+    Yields the answer piece by piece as the model produces it, with markdown
+    already stripped. On failure the last piece is ERROR_ANSWER.
+    """
+    import google.generativeai as genai
+    started = False
+    error = False
+    t0 = time.perf_counter()
     try:
         model = genai.GenerativeModel(GEN_MODEL)
-        resp = model.generate_content(prompt)
-        text = getattr(resp, "text", "") or ""
-        text = text.strip()
-        for c in ["*", "#", "_"]:
-            text = text.replace(c, "")
-        return text or "The scrolls revealed nothing clear this time."
+        stream = model.generate_content(build_prompt(query, context), stream=True,
+                                        request_options={"timeout": ASK_GENERATE_TIMEOUT})
+        for chunk in stream:
+            text = (getattr(chunk, "text", "") or "").translate(_MARKDOWN)
+            if not started:
+                text = text.lstrip()
+            if text:
+                if not started:
+                    observe("generate.first_token", (time.perf_counter() - t0) * 1000)
+                started = True
+                yield text
+        if not started:
+            yield EMPTY_ANSWER
     except Exception as e:
         print(f"[ERROR] Gemini generation: {e}")
-        return "The cold winds of Skyrim seem to interfere with my magic. Try again."
+        error = True
+        incr("generate.errors")
+        yield ("\n\n" if started else "") + ERROR_ANSWER
+    finally:
+        # Gerador: o span é medido à mão, do pedido até o último pedaço entregue
+        observe("generate", (time.perf_counter() - t0) * 1000, error)
+
+def generate_response(query, context):
+    text = "".join(generate_response_stream(query, context)).strip()
+    return text or EMPTY_ANSWER
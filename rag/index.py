@@ -0,0 +1,185 @@
+# rag/index.py
+# Construção do índice FAISS: busca exata (flat) ou aproximada (IVF-Flat, IVF-PQ, HNSW)
+# escolhida pelo tamanho do corpus.
+
+import math
+import time
+
+import numpy as np
+import faiss
+
+INDEX_KINDS = ("flat", "ivf_flat", "ivf_pq", "hnsw")
+FAISS_FILE = "skyrim_guide.index"
+
+# Limites da seleção automática (nº de vetores)
+AUTO_HNSW_MIN = 20_000
+AUTO_IVF_PQ_MIN = 200_000
+
+HNSW_M = 32
+HNSW_EF_CONSTRUCTION = 80
+HNSW_EF_SEARCH = 64
+IVF_NPROBE = 16
+PQ_NBITS = 8
+MIN_POINTS_PER_CENTROID = 39  # abaixo disso o k-means do FAISS reclama
+
+
+def choose_index_kind(n_vectors):
+    if n_vectors >= AUTO_IVF_PQ_MIN:
+        return "ivf_pq"
+    if n_vectors >= AUTO_HNSW_MIN:
+        return "hnsw"
+    return "flat"
+
+
+def _nlist_for(n_vectors):
+    nlist = int(4 * math.sqrt(n_vectors))
+    return max(1, min(nlist, n_vectors // MIN_POINTS_PER_CENTROID))
+
+
+def _pq_subquantizers(d):
+    # Maior divisor de d com sub-vetores de pelo menos 4 dimensões, até 64
+    for m in range(min(64, d // 4), 0, -1):
+        if d % m == 0:
+            return m
+    return 1
+
+
+def _pq_nbits(n_vectors):
+    # Cada sub-quantizador tem 2^nbits centróides; corpus pequeno pede menos bits
+    nbits = PQ_NBITS
+    while nbits > 4 and n_vectors < (1 << nbits) * MIN_POINTS_PER_CENTROID:
+        nbits -= 1
+    return nbits
+
+
+def _min_training_points(kind, n_vectors):
+    # k-means do IVF (nlist centróides) e, no PQ, 2^nbits centróides por sub-quantizador
+    centroids = _nlist_for(n_vectors)
+    if kind == "ivf_pq":
+        centroids = max(centroids, 1 << _pq_nbits(n_vectors))
+    return centroids * MIN_POINTS_PER_CENTROID
+
+
+def resolve_index_kind(kind, n_vectors):
+    """The kind create_faiss_index builds for `kind` ("auto" or one of INDEX_KINDS) and n vectors."""
+    kind = choose_index_kind(n_vectors) if kind == "auto" else kind
+    if kind not in INDEX_KINDS:
+        return "flat"
+    if kind in ("ivf_flat", "ivf_pq") and n_vectors < _min_training_points(kind, n_vectors):
+        return "flat"
+    return kind
+
+
+def create_faiss_index(embeddings, use_cosine=True, kind="auto"):
+    if embeddings is None or len(embeddings) == 0:
+        print("[WARNING] No embeddings to index.")
+        return None
+    n, d = embeddings.shape
+    requested = kind
+    kind = resolve_index_kind(kind, n)
+    if requested not in INDEX_KINDS + ("auto",):
+        print(f"[WARNING] Unknown index kind '{requested}', using flat.")
+    elif requested != "auto" and kind != requested:
+        print(f"[WARNING] {n} vectors are too few to train '{requested}' "
+              f"(needs {_min_training_points(requested, n)}); using flat.")
+    metric = faiss.METRIC_INNER_PRODUCT if use_cosine else faiss.METRIC_L2
+
+    if kind == "hnsw":
+        index = faiss.IndexHNSWFlat(d, HNSW_M, metric)
+        index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+        index.hnsw.efSearch = HNSW_EF_SEARCH
+    elif kind in ("ivf_flat", "ivf_pq"):
+        nlist = _nlist_for(n)
+        quantizer = faiss.IndexFlatIP(d) if use_cosine else faiss.IndexFlatL2(d)
+        if kind == "ivf_flat":
+            index = faiss.IndexIVFFlat(quantizer, d, nlist, metric)
+        else:
+            index = faiss.IndexIVFPQ(quantizer, d, nlist, _pq_subquantizers(d), _pq_nbits(n), metric)
+        try:
+            index.train(embeddings)
+            index.nprobe = min(IVF_NPROBE, nlist)
+        except Exception as e:
+            print(f"[WARNING] Training '{kind}' failed ({str(e).splitlines()[0]}); using flat.")
+            kind = "flat"
+    if kind == "flat":
+        index = faiss.IndexFlatIP(d) if use_cosine else faiss.IndexFlatL2(d)
+
+    index.add(embeddings)
+    print(f"[OK] FAISS index created ({kind}, {n} vectors).")
+    return index
+
+
+def describe_index(index):
+    """Kind and search-time parameters of an index, for the cache manifest."""
+    if isinstance(index, faiss.IndexHNSW):
+        return {"kind": "hnsw", "ef_search": int(index.hnsw.efSearch)}
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        kind = "ivf_pq" if isinstance(faiss.downcast_index(index), faiss.IndexIVFPQ) else "ivf_flat"
+        return {"kind": kind, "nlist": int(ivf.nlist), "nprobe": int(ivf.nprobe)}
+    return {"kind": "flat"}
+
+
+def apply_search_params(index, params):
+    if not params:
+        return index
+    if isinstance(index, faiss.IndexHNSW) and "ef_search" in params:
+        index.hnsw.efSearch = int(params["ef_search"])
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None and "nprobe" in params:
+        ivf.nprobe = int(params["nprobe"])
+    return index
+
+
+def recall_report(embeddings, kinds=("ivf_flat", "ivf_pq", "hnsw"), k=10, n_queries=200,
+                  use_cosine=True, seed=0):
+    """
+    Builds each index kind over `embeddings` and compares it with the flat
+    index: recall@k of the flat top-k and mean query latency (ms).
+    Queries are sampled from the corpus itself.
+    """
+    embeddings = np.ascontiguousarray(embeddings, dtype="float32")
+    rng = np.random.default_rng(seed)
+    q_idx = rng.choice(len(embeddings), size=min(n_queries, len(embeddings)), replace=False)
+    queries = embeddings[q_idx]
+    k = min(k, len(embeddings))
+
+    def timed_search(index):
+        t0 = time.perf_counter()
+        _, ids = index.search(queries, k)
+        return ids, (time.perf_counter() - t0) * 1000 / len(queries)
+
+    flat = create_faiss_index(embeddings, use_cosine, kind="flat")
+    truth, flat_ms = timed_search(flat)
+    rows = [{"kind": "flat", "recall": 1.0, "ms_per_query": flat_ms, **describe_index(flat)}]
+    for kind in kinds:
+        t0 = time.perf_counter()
+        index = create_faiss_index(embeddings, use_cosine, kind=kind)
+        build_s = time.perf_counter() - t0
+        ids, ms = timed_search(index)
+        hits = sum(len(set(a) & set(b)) for a, b in zip(ids, truth))
+        rows.append({"kind": kind, "recall": hits / truth.size, "ms_per_query": ms,
+                     "build_s": build_s, **describe_index(index)})
+    return rows
+
+
+def print_recall_report(rows, k=10):
+    print(f"{'index':<10} {'recall@' + str(k):>10} {'ms/query':>10}  params")
+    for r in rows:
+        params = {key: v for key, v in r.items() if key not in ("kind", "recall", "ms_per_query")}
+        print(f"{r['kind']:<10} {r['recall']:>10.3f} {r['ms_per_query']:>10.3f}  {params}")
+
+
+if __name__ == "__main__":
+    # python -m rag.index : compara os modos usando os embeddings já em cache
+    from rag.config import CACHE_DIR, EMBED_MODEL
+    from rag.chunk_store import ChunkStore
+    from rag.embed_store import get_embedding_store
+
+    texts = ChunkStore(CACHE_DIR)
+    embs = get_embedding_store(CACHE_DIR, EMBED_MODEL).get_many(list(texts))
+    if embs is None:
+        print("[ERROR] Embedding cache is incomplete; run the app once to build it.")
+    else:
+        faiss.normalize_L2(embs)
+        print_recall_report(recall_report(embs))
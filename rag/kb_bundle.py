@@ -0,0 +1,101 @@
+# rag/kb_bundle.py
+# Base de conhecimento pronta num .zip (manifest, chunk store, embeddings, BM25
+# e índice FAISS). O mantenedor gera uma vez com a chave da API e publica no
+# release; no primeiro uso o app instala o pacote em vez de embedar tudo de novo.
+#
+#   python -m rag.kb_bundle pack [saida.zip]       empacota o cache/ atual
+#   python -m rag.kb_bundle install <zip ou URL>   instala no cache/
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import urllib.request
+import zipfile
+
+from rag import chunk_store, embed_store
+from rag.index import FAISS_FILE
+from rag.lexical import BM25_FILE
+from rag.manifest import MANIFEST_FILE, save_manifest
+
+BUNDLE_FILES = (
+    MANIFEST_FILE, FAISS_FILE, BM25_FILE,
+    chunk_store.TEXT_FILE, chunk_store.INDEX_FILE, chunk_store.META_FILE,
+    embed_store.VEC_FILE, embed_store.KEYS_FILE, embed_store.META_FILE,
+)
+DOWNLOAD_TIMEOUT = 60  # s
+
+
+def pack(cache_dir, out_path):
+    """Zips the knowledge-base files of `cache_dir`; manifest paths are stored with '/'."""
+    missing = [name for name in BUNDLE_FILES if not os.path.exists(os.path.join(cache_dir, name))]
+    if missing:
+        raise FileNotFoundError(f"cache is incomplete, missing: {', '.join(missing)}")
+    with open(os.path.join(cache_dir, MANIFEST_FILE), "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    manifest["files"] = {path.replace(os.sep, "/"): entry for path, entry in manifest["files"].items()}
+    with zipfile.ZipFile(out_path, "w", zipfile.ZIP_DEFLATED) as z:
+        for name in BUNDLE_FILES:
+            if name == MANIFEST_FILE:
+                z.writestr(name, json.dumps(manifest, indent=2, sort_keys=True))
+            else:
+                z.write(os.path.join(cache_dir, name), name)
+    return out_path
+
+
+def _fetch(source):
+    # URL -> arquivo temporário; caminho local é usado direto
+    if not source.lower().startswith(("http://", "https://")):
+        return source, False
+    fd, tmp = tempfile.mkstemp(suffix=".zip")
+    os.close(fd)
+    print(f"[INFO] Downloading knowledge base from '{source}'...")
+    with urllib.request.urlopen(source, timeout=DOWNLOAD_TIMEOUT) as r, open(tmp, "wb") as f:
+        shutil.copyfileobj(r, f)
+    return tmp, True
+
+
+def install(source, cache_dir):
+    """
+    Installs a bundle (local .zip or http(s) URL) into `cache_dir`. Returns
+    True on success; on any problem prints why and returns False.
+    """
+    tmp = False
+    path = source
+    try:
+        path, tmp = _fetch(source)
+        with zipfile.ZipFile(path) as z:
+            names = set(z.namelist())
+            if names != set(BUNDLE_FILES):
+                raise ValueError(f"unexpected contents: {sorted(names ^ set(BUNDLE_FILES))}")
+            os.makedirs(cache_dir, exist_ok=True)
+            for name in BUNDLE_FILES:
+                if name != MANIFEST_FILE:
+                    with z.open(name) as src, open(os.path.join(cache_dir, name), "wb") as dst:
+                        shutil.copyfileobj(src, dst)
+            manifest = json.loads(z.read(MANIFEST_FILE).decode("utf-8"))
+        # Caminhos dos PDFs no formato do sistema, como o pipeline os encontra
+        manifest["files"] = {p if p.startswith("/") else os.path.join(*p.split("/")): e
+                             for p, e in manifest["files"].items()}
+        save_manifest(os.path.join(cache_dir, MANIFEST_FILE), manifest)  # por último: marca a base completa
+        print(f"[OK] Knowledge base installed from '{source}'.")
+        return True
+    except Exception as e:
+        print(f"[WARNING] Could not install knowledge base from '{source}': {e}")
+        return False
+    finally:
+        if tmp and os.path.exists(path):
+            os.remove(path)
+
+
+if __name__ == "__main__":
+    from rag.config import CACHE_DIR
+    if len(sys.argv) >= 2 and sys.argv[1] == "pack":
+        out = sys.argv[2] if len(sys.argv) > 2 else "knowledge_base.zip"
+        print(f"[OK] Wrote '{pack(CACHE_DIR, out)}'.")
+    elif len(sys.argv) == 3 and sys.argv[1] == "install":
+        sys.exit(0 if install(sys.argv[2], CACHE_DIR) else 1)
+    else:
+        print("usage: python -m rag.kb_bundle pack [out.zip] | install <zip-or-url>")
+        sys.exit(2)
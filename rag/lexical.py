@@ -0,0 +1,122 @@
+# rag/lexical.py
+# Índice invertido BM25 em memória, para nomes próprios (ingredientes, cidades, NPCs)
+# que a busca vetorial costuma perder, e para funcionar sem a API de embeddings.
+
+import os
+import re
+import unicodedata
+
+import numpy as np
+
+BM25_FILE = "bm25.npz"
+K1 = 1.5
+B = 0.75
+RRF_K = 60
+
+_TOKEN = re.compile(r"\w+")
+
+
+def tokenize(text):
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return [t for t in _TOKEN.findall(text) if len(t) > 1]
+
+
+class BM25Index:
+    """Postings in CSR layout: term_ptr[t]:term_ptr[t+1] slices doc_ids/tfs."""
+
+    def __init__(self, terms, term_ptr, doc_ids, tfs, doc_len):
+        self.vocab = {t: i for i, t in enumerate(terms)}
+        self.terms = terms
+        self.term_ptr = term_ptr
+        self.doc_ids = doc_ids
+        self.tfs = tfs
+        self.doc_len = doc_len
+        self.n_docs = len(doc_len)
+        self.avgdl = float(doc_len.mean()) if self.n_docs else 0.0
+        df = np.diff(term_ptr).astype("float32")
+        self.idf = np.log(1.0 + (self.n_docs - df + 0.5) / (df + 0.5)).astype("float32")
+
+    @classmethod
+    def build(cls, texts):
+        postings = {}
+        doc_len = np.zeros(len(texts), dtype="float32")
+        for doc_id, text in enumerate(texts):
+            tokens = tokenize(text)
+            doc_len[doc_id] = len(tokens)
+            counts = {}
+            for tok in tokens:
+                counts[tok] = counts.get(tok, 0) + 1
+            for tok, tf in counts.items():
+                postings.setdefault(tok, []).append((doc_id, tf))
+        terms = sorted(postings)
+        term_ptr = np.zeros(len(terms) + 1, dtype="int64")
+        for i, t in enumerate(terms):
+            term_ptr[i + 1] = term_ptr[i] + len(postings[t])
+        doc_ids = np.empty(term_ptr[-1], dtype="int32")
+        tfs = np.empty(term_ptr[-1], dtype="float32")
+        for i, t in enumerate(terms):
+            plist = postings[t]
+            doc_ids[term_ptr[i]:term_ptr[i + 1]] = [d for d, _ in plist]
+            tfs[term_ptr[i]:term_ptr[i + 1]] = [tf for _, tf in plist]
+        return cls(terms, term_ptr, doc_ids, tfs, doc_len)
+
+    def save(self, directory):
+        path = os.path.join(directory, BM25_FILE)
+        tmp = path + ".tmp.npz"
+        np.savez(tmp, terms=np.array(self.terms, dtype=str), term_ptr=self.term_ptr,
+                 doc_ids=self.doc_ids, tfs=self.tfs, doc_len=self.doc_len)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, directory):
+        with np.load(os.path.join(directory, BM25_FILE), allow_pickle=False) as z:
+            return cls(z["terms"].tolist(), z["term_ptr"], z["doc_ids"], z["tfs"], z["doc_len"])
+
+    def scores(self, query):
+        scores = np.zeros(self.n_docs, dtype="float32")
+        if not self.n_docs:
+            return scores
+        for tok in set(tokenize(query)):
+            t = self.vocab.get(tok)
+            if t is None:
+                continue
+            lo, hi = self.term_ptr[t], self.term_ptr[t + 1]
+            docs, tf = self.doc_ids[lo:hi], self.tfs[lo:hi]
+            norm = K1 * (1 - B + B * self.doc_len[docs] / max(self.avgdl, 1e-6))
+            scores[docs] += self.idf[t] * tf * (K1 + 1) / (tf + norm)
+        return scores
+
+    def search(self, query, k):
+        scores = self.scores(query)
+        k = min(k, self.n_docs)
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [int(i) for i in top if scores[i] > 0]
+
+
+def load_or_build_lexical_index(directory, texts):
+    if os.path.exists(os.path.join(directory, BM25_FILE)):
+        try:
+            lexical = BM25Index.load(directory)
+            if lexical.n_docs == len(texts):
+                return lexical
+        except Exception as e:
+            print(f"[WARNING] Could not load BM25 index: {e}. Rebuilding...")
+    lexical = BM25Index.build(texts)
+    try:
+        lexical.save(directory)
+    except Exception as e:
+        print(f"[WARNING] Could not save BM25 index: {e}")
+    return lexical
+
+
+def reciprocal_rank_fusion(*rankings, k=RRF_K):
+    """Merges ranked id lists; ids ranked high in several lists win."""
+    scores = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores, key=lambda d: (-scores[d], d))
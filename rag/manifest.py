@@ -0,0 +1,105 @@
+# rag/manifest.py
+
+import hashlib
+import json
+import os
+
+MANIFEST_VERSION = 1
+MANIFEST_FILE = "manifest.json"
+
+
+def file_sha256(path, block_size=1 << 20):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def new_manifest(embed_model, chunking):
+    return {"version": MANIFEST_VERSION, "embed_model": embed_model,
+            "chunking": dict(chunking), "files": {}}
+
+
+def load_manifest(path, embed_model, chunking):
+    """Returns the cached manifest, or None if missing/incompatible."""
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except Exception as e:
+        print(f"[WARNING] Could not read cache manifest: {e}")
+        return None
+    if manifest.get("version") != MANIFEST_VERSION or manifest.get("embed_model") != embed_model:
+        print("[INFO] Cache manifest is from an older format or model. Rebuilding...")
+        return None
+    if manifest.get("chunking") != dict(chunking):
+        print("[INFO] Chunking settings changed. Rebuilding...")
+        return None
+    return manifest
+
+
+def save_manifest(path, manifest):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def diff_manifest(manifest, pdf_files):
+    """
+    Compares the PDFs on disk with the manifest.
+    Returns (unchanged, changed, removed). Files whose size and mtime match are
+    trusted without hashing; otherwise the content hash decides.
+    """
+    known = manifest.get("files", {})
+    unchanged, changed = [], []
+    for path in pdf_files:
+        entry = known.get(path)
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        if entry is None:
+            changed.append(path)
+            continue
+        if entry.get("size") == st.st_size and entry.get("mtime") == st.st_mtime:
+            unchanged.append(path)
+            continue
+        if entry.get("sha256") == file_sha256(path):
+            # Só o mtime mudou (cópia, checkout...): conteúdo igual
+            entry["mtime"] = st.st_mtime
+            entry["size"] = st.st_size
+            unchanged.append(path)
+        else:
+            changed.append(path)
+    removed = sorted(set(known) - set(pdf_files))
+    return unchanged, changed, removed
+
+
+def file_entry(path, start, count):
+    st = os.stat(path)
+    return {
+        "sha256": file_sha256(path),
+        "mtime": st.st_mtime,
+        "size": st.st_size,
+        "start": start,
+        "count": count,
+    }
+
+
+def knowledge_base_version(manifest):
+    """
+    Short hash of the manifest describing the knowledge base that is loaded
+    (in memory, not the file on disk); changes whenever the guides, settings
+    or index change. A keyword-only base has index None.
+    """
+    # Só o que muda o conteúdo recuperado: hashes dos PDFs, modelo, chunking e índice
+    key = {
+        "files": sorted(e.get("sha256", "") for e in manifest.get("files", {}).values()),
+        "embed_model": manifest.get("embed_model"),
+        "chunking": manifest.get("chunking"),
+        "index": manifest.get("index"),
+    }
+    return hashlib.sha1(json.dumps(key, sort_keys=True).encode("utf-8")).hexdigest()[:16]
@@ -1,52 +1,104 @@
 # rag/pipeline.py
 
 import os
-import pickle
+import threading
+
 import numpy as np
-import fitz  # PyMuPDF
 import faiss
 
-from rag.config import EMBED_MODEL, configure_gemini
-from rag.gemini import generate_response
+from rag.config import (
+    EMBED_MODEL, EMBED_BATCH_SIZE, EMBED_WORKERS, CHUNKING, INDEX_KIND, HYBRID_CANDIDATES,
+    QUERY_EMBED_TIMEOUT, QUERY_CACHE_FILE, QUERY_VECTOR_MAX_ENTRIES, CACHE_DIR, FILES_DIR,
+    KB_BUNDLE_FILE, KB_BUNDLE_URL, EMBED_ON_FIRST_RUN, configure_gemini
+)
+from rag.chunk_store import ChunkStore, chunk_store_exists, write_chunk_store
+from rag.embedder import EmbeddingExecutor
+from rag.extract import iter_pdf_chunks
+from rag.embed_store import get_embedding_store
+from rag.index import FAISS_FILE, create_faiss_index, resolve_index_kind, describe_index, apply_search_params
+from rag.kb_bundle import install as install_bundle
+from rag.lexical import BM25Index, load_or_build_lexical_index, reciprocal_rank_fusion
+from rag.manifest import (
+    MANIFEST_FILE, new_manifest, load_manifest, save_manifest, diff_manifest, file_entry,
+    knowledge_base_version,
+)
+from rag.query_cache import QueryVectorCache
+from rag.service import DaemonExecutor
+from rag.tracing import incr, span, timed
+
+# Threads daemon: um embed travado não segura o processo na saída.
+# Pool e cache de vetores das perguntas nascem no primeiro uso (import sem efeitos).
+_QUERY_POOL = None
+_QUERY_VECTORS = None
+_LAZY_LOCK = threading.Lock()
+
+
+def _query_pool():
+    global _QUERY_POOL
+    with _LAZY_LOCK:
+        if _QUERY_POOL is None:
+            _QUERY_POOL = DaemonExecutor(2, "query-embed")
+        return _QUERY_POOL
+
+
+def _query_vectors():
+    global _QUERY_VECTORS
+    with _LAZY_LOCK:
+        if _QUERY_VECTORS is None:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            _QUERY_VECTORS = QueryVectorCache(os.path.join(CACHE_DIR, QUERY_CACHE_FILE),
+                                              max_entries=QUERY_VECTOR_MAX_ENTRIES)
+        return _QUERY_VECTORS
 
-GEMINI_KEY = configure_gemini()
 
-def extract_text_from_pdfs(file_names):
+@timed("extract")
+def extract_text_from_pdfs(file_names, chunking=CHUNKING, max_workers=None):
     texts, metadata = [], []
+    counts = {}
     print("[INFO] Starting PDF text extraction...")
-    for file_name in file_names:
-        if not os.path.exists(file_name):
-            print(f"[WARNING] File '{file_name}' not found.")
-            continue
-        try:
-            with fitz.open(file_name) as doc:
-                full_text = "\n".join(page.get_text() for page in doc)
-                chunks = [c.strip() for c in full_text.split("\n\n") if c.strip()]
-                texts.extend(chunks)
-                metadata.extend([{"source": file_name}] * len(chunks))
-            print(f"[OK] Extracted text from '{file_name}'. Chunks: {len(chunks)}")
-        except Exception as e:
-            print(f"[ERROR] Processing '{file_name}': {e}")
+    for file_name, page_no, chunks in iter_pdf_chunks(file_names, chunking, max_workers=max_workers):
+        texts.extend(c.text for c in chunks)
+        metadata.extend({"source": file_name, "page": page_no, "section": c.section} for c in chunks)
+        counts[file_name] = counts.get(file_name, 0) + len(chunks)
+    for file_name, n in counts.items():
+        print(f"[OK] Extracted text from '{file_name}'. Chunks: {n}")
+    incr("extract.files", len(counts))
+    incr("extract.chunks", len(texts))
     return texts, metadata
 
 
-def create_embeddings(texts, batch_size=100, normalize=True):
+def gemini_embed_batch(batch):
     import google.generativeai as genai
+    result = genai.embed_content(model=EMBED_MODEL, content=batch)
+    batch_embeddings = result.get("embedding")
+    if not batch_embeddings:
+        raise RuntimeError("Embedding response missing 'embedding' key.")
+    return batch_embeddings
+
+
+@timed("embeddings")
+def create_embeddings(texts, batch_size=EMBED_BATCH_SIZE, normalize=True, store=None,
+                      embed_fn=None, max_workers=EMBED_WORKERS):
     if not texts:
         print("[WARNING] No texts to embed.")
         return None
-    print("[INFO] Creating embeddings... (this may take a while)")
-    emb_list = []
+    store = store or get_embedding_store(CACHE_DIR, EMBED_MODEL)
+    todo = len(store.missing(texts))
+    print(f"[INFO] Creating embeddings: {len(texts) - todo} cached, {todo} new...")
+    incr("embeddings.cached", len(texts) - todo)
+    incr("embeddings.new", todo)
     try:
-        for i in range(0, len(texts), batch_size):
-            batch = texts[i:i+batch_size]
-            print(f"[INFO] Processing batch {i//batch_size + 1}...")
-            result = genai.embed_content(model=EMBED_MODEL, content=batch)
-            batch_embeddings = result.get("embedding")
-            if not batch_embeddings:
-                raise RuntimeError("Embedding response missing 'embedding' key.")
-            emb_list.extend(batch_embeddings)
-        embs = np.asarray(emb_list, dtype="float32")
+        executor = EmbeddingExecutor(embed_fn or gemini_embed_batch, store,
+                                     max_workers=max_workers, batch_size=batch_size)
+        failed = executor.run(texts)
+        if todo:
+            print(f"[INFO] Embedding stats: {executor.stats}")
+        if failed:
+            raise RuntimeError(f"{len(failed)} chunk(s) could not be embedded; "
+                               "progress was saved and the next run resumes from there.")
+        embs = store.get_many(texts)
+        if embs is None:
+            raise RuntimeError("Embedding store is missing vectors after the build.")
         if normalize:
             faiss.normalize_L2(embs)
         print(f"[OK] Embeddings created. Shape: {embs.shape}")
@@ -56,43 +108,86 @@ def create_embeddings(texts, batch_size=100, normalize=True):
         return None
 
 
-def create_faiss_index(embeddings, use_cosine=True):
-    if embeddings is None or len(embeddings) == 0:
-        print("[WARNING] No embeddings to index.")
-        return None
-    d = embeddings.shape[1]
-    index = faiss.IndexFlatIP(d) if use_cosine else faiss.IndexFlatL2(d)
-    index.add(embeddings)
-    print("[OK] FAISS index created.")
-    return index
+def embed_query(query, vectors=None):
+    # Vetores de perguntas ficam no cache limitado, nunca no store dos chunks
+    import google.generativeai as genai
+    vectors = vectors or _query_vectors()
+    vec = vectors.get(query, EMBED_MODEL)
+    if vec is None:
+        incr("search.embed.api_calls")
+        with span("search.embed.api"):
+            # Prazo também no cliente: senão a thread fica presa depois do timeout
+            r = genai.embed_content(model=EMBED_MODEL, content=query,
+                                    request_options={"timeout": QUERY_EMBED_TIMEOUT})
+        vec = np.asarray(r["embedding"], dtype="float32")
+        vectors.put(query, EMBED_MODEL, vec)
+    else:
+        incr("search.embed.cache_hits")
+    return vec.reshape(1, -1)
 
 
-def search_relevant_context(query, index, texts, top_k=5, use_cosine=True):
-    import google.generativeai as genai
-    if index is None or not texts:
+def _embed_query_with_timeout(query, timeout):
+    # A API lenta não pode segurar a resposta: passado o prazo, seguimos só com o BM25
+    future = _query_pool().submit(embed_query, query)
+    return future.result(timeout=timeout)
+
+
+@timed("search")
+def retrieve(query, index, texts, top_k=5, use_cosine=True, lexical=None,
+             embed_timeout=QUERY_EMBED_TIMEOUT):
+    """
+    (ids of the top_k chunks for `query`, degraded). Vector + BM25 fused;
+    degraded is True when the vector half was skipped because the query
+    embedding failed or timed out. Raises on failure.
+    """
+    k = max(1, min(top_k, len(texts)))
+    vector_ids = []
+    degraded = False
+    if index is not None:
+        try:
+            with span("search.embed"):
+                qvec = _embed_query_with_timeout(query, embed_timeout)
+            if use_cosine:
+                faiss.normalize_L2(qvec)
+            with span("search.faiss"):
+                _, idx = index.search(qvec, k * HYBRID_CANDIDATES if lexical else k)
+            vector_ids = [int(i) for i in idx[0] if 0 <= i < len(texts)]
+        except Exception as e:
+            if lexical is None:
+                raise
+            print(f"[WARNING] Embedding unavailable ({type(e).__name__}); using lexical search only.")
+            incr("search.lexical_fallbacks")
+            degraded = True
+    with span("search.bm25"):
+        lexical_ids = lexical.search(query, k * HYBRID_CANDIDATES) if lexical is not None else []
+    return reciprocal_rank_fusion(vector_ids, lexical_ids)[:k], degraded
+
+
+def build_context(texts, ids):
+    return "\n\n---\n\n".join(texts[i] for i in ids if 0 <= i < len(texts))
+
+
+@timed("search_context")
+def search_relevant_context(query, index, texts, top_k=5, use_cosine=True, lexical=None,
+                            embed_timeout=QUERY_EMBED_TIMEOUT):
+    if (index is None and lexical is None) or not texts:
         return "Sorry, the knowledge base was not loaded correctly."
     try:
-        r = genai.embed_content(model=EMBED_MODEL, content=query)
-        qvec = np.array(r["embedding"], dtype="float32").reshape(1, -1)
-        if use_cosine:
-            faiss.normalize_L2(qvec)
-        k = max(1, min(top_k, len(texts)))
-        _, idx = index.search(qvec, k)
-        candidates = [i for i in idx[0] if 0 <= i < len(texts)]
-        context = "\n\n---\n\n".join(texts[i] for i in candidates)
-        return context or "No relevant passages found."
+        ids, _ = retrieve(query, index, texts, top_k, use_cosine, lexical, embed_timeout)
+        return build_context(texts, ids) or "No relevant passages found."
     except Exception as e:
         print(f"[ERROR] Context search: {e}")
         return "An error occurred while searching the guides."
 
 
 def setup_rag_pipeline():
-    cache_dir = "cache"
+    configure_gemini()
+    cache_dir = CACHE_DIR
     os.makedirs(cache_dir, exist_ok=True)
 
-    index_path = os.path.join(cache_dir, "skyrim_guide.index")
-    texts_path = os.path.join(cache_dir, "skyrim_guide_texts.pkl")
-    files_dir  = "files"
+    index_path = os.path.join(cache_dir, FAISS_FILE)
+    manifest_path = os.path.join(cache_dir, MANIFEST_FILE)
+    files_dir  = FILES_DIR
 
     def find_pdf_files():
         pdfs = []
@@ -107,41 +202,133 @@ def setup_rag_pipeline():
 
     pdf_files = find_pdf_files()
 
-    if os.path.exists(index_path) and os.path.exists(texts_path):
+    # Primeira execução: uma base pronta evita embedar todos os guias pela API
+    first_run = not os.path.exists(manifest_path)
+    if first_run:
+        for source in (KB_BUNDLE_FILE, KB_BUNDLE_URL):
+            if source and (os.path.exists(source) or "://" in source) and install_bundle(source, cache_dir):
+                break
+
+    manifest = load_manifest(manifest_path, EMBED_MODEL, CHUNKING)
+    texts, index = [], None
+    if manifest is not None and os.path.exists(index_path) and chunk_store_exists(cache_dir):
         print("[INFO] Loading knowledge base from cache...")
         try:
-            index = faiss.read_index(index_path)
-            with open(texts_path, "rb") as f:
-                texts = pickle.load(f)
+            index = apply_search_params(faiss.read_index(index_path), manifest.get("index"))
+            texts = ChunkStore(cache_dir)
+            expected = sum(e["count"] for e in manifest["files"].values())
+            if not (len(texts) == index.ntotal == expected):
+                raise RuntimeError("chunk store, index and manifest disagree")
             print("[OK] Loaded from cache.")
-            return texts, index, pdf_files
         except Exception as e:
             print(f"[WARNING] Could not load from cache: {e}. Rebuilding...")
+            _close_store(texts)
+            texts, index = [], None
+    if index is None:
+        manifest = new_manifest(EMBED_MODEL, CHUNKING)
+
+    unchanged, changed, removed = diff_manifest(manifest, pdf_files)
+    if index is not None and not changed and not removed:
+        wanted = resolve_index_kind(INDEX_KIND, index.ntotal)
+        if manifest.get("index", {}).get("kind") == wanted:
+            _save_manifest_quietly(manifest_path, manifest)
+            return _loaded(texts, index, _lexical(cache_dir, texts), pdf_files, manifest)
+        print(f"[INFO] Index mode changed to '{wanted}'. Rebuilding index from cached embeddings...")
 
-    print("[INFO] Building knowledge base from scratch...")
     if not pdf_files:
         print("[ERROR] No PDF files found.")
-        return None, None, []
+        return None, None, None, [], None
 
-    texts, _ = extract_text_from_pdfs(pdf_files)
-    if not texts:
+    if index is not None:
+        print(f"[INFO] Updating knowledge base: {len(changed)} new/changed, "
+              f"{len(removed)} removed, {len(unchanged)} unchanged PDF(s).")
+    else:
+        print("[INFO] Building knowledge base from scratch...")
+
+    fresh_chunks = {path: [] for path in changed}
+    extracted, extracted_meta = extract_text_from_pdfs(changed) if changed else ([], [])
+    for chunk, meta in zip(extracted, extracted_meta):
+        fresh_chunks[meta["source"]].append((chunk, meta))
+
+    # Monta a nova base na ordem dos PDFs: chunks antigos reaproveitados, novos encaixados
+    new_texts, new_meta, files = [], [], {}
+    for path in pdf_files:
+        if path in fresh_chunks:
+            chunks = fresh_chunks[path]
+            files[path] = file_entry(path, len(new_texts), len(chunks))
+        elif path in unchanged:
+            entry = manifest["files"][path]
+            start, count = entry["start"], entry["count"]
+            chunks = [(texts[i], texts.meta(i)) for i in range(start, start + count)]
+            files[path] = dict(entry, start=len(new_texts), count=count)
+        else:
+            continue
+        new_texts.extend(c for c, _ in chunks)
+        new_meta.extend(m for _, m in chunks)
+
+    if not new_texts:
         print("[ERROR] No text extracted. Check PDFs.")
-        return None, None, pdf_files
+        return None, None, None, pdf_files, None
+
+    if index is None and first_run and not EMBED_ON_FIRST_RUN:
+        # Nunca gastar cota da API sem o usuário pedir
+        print("[WARNING] No prebuilt knowledge base found: the guides will be searched by keywords only. "
+              f"Put '{KB_BUNDLE_FILE}' in the app folder, or set EMBED_ON_FIRST_RUN = True in "
+              "rag/config.py to embed them through the Gemini API (uses quota).")
+        return _loaded(new_texts, None, BM25Index.build(new_texts), pdf_files, dict(manifest, files=files))
 
-    embeddings_db = create_embeddings(texts)
+    # Vetores dos chunks inalterados saem do cache de embeddings; só os novos vão para a API
+    embeddings_db = create_embeddings(new_texts)
     if embeddings_db is None:
-        return texts, None, pdf_files
+        if index is not None:
+            print("[WARNING] Keeping the previous knowledge base until embeddings succeed.")
+            return _loaded(texts, index, _lexical(cache_dir, texts), pdf_files, manifest)
+        print("[WARNING] Embeddings unavailable: the guides will be searched by keywords only.")
+        return _loaded(new_texts, None, BM25Index.build(new_texts), pdf_files, dict(manifest, files=files))
 
-    index = create_faiss_index(embeddings_db, use_cosine=True)
-    if index is None:
-        return texts, None, pdf_files
+    new_index = create_faiss_index(embeddings_db, use_cosine=True, kind=INDEX_KIND)
+    if new_index is None:
+        return _loaded(new_texts, None, BM25Index.build(new_texts), pdf_files, dict(manifest, files=files))
+    index = new_index
 
+    manifest["files"] = files
+    manifest["index"] = describe_index(index)
+    _close_store(texts)  # o Windows não deixa substituir arquivos mapeados
     try:
         faiss.write_index(index, index_path)
-        with open(texts_path, "wb") as f:
-            pickle.dump(texts, f)
+        write_chunk_store(cache_dir, new_texts, new_meta)
+        lexical = BM25Index.build(new_texts)
+        lexical.save(cache_dir)
+        save_manifest(manifest_path, manifest)
         print("[OK] Cache saved.")
+        return _loaded(ChunkStore(cache_dir), index, lexical, pdf_files, manifest)
     except Exception as e:
         print(f"[ERROR] Could not save cache: {e}")
 
-    return texts, index, pdf_files
+    return _loaded(new_texts, index, BM25Index.build(new_texts), pdf_files, manifest)
+
+
+def _loaded(texts, index, lexical, pdf_files, manifest):
+    # Versão calculada da base que foi de fato carregada (o manifest em disco pode estar defasado)
+    version = knowledge_base_version(dict(manifest, index=describe_index(index) if index is not None else None))
+    return texts, index, lexical, pdf_files, version
+
+
+def _lexical(cache_dir, texts):
+    try:
+        return load_or_build_lexical_index(cache_dir, texts)
+    except Exception as e:
+        print(f"[WARNING] Lexical index unavailable: {e}")
+        return None
+
+
+def _close_store(texts):
+    if isinstance(texts, ChunkStore):
+        texts.close()
+
+
+def _save_manifest_quietly(path, manifest):
+    try:
+        save_manifest(path, manifest)
+    except Exception as e:
+        print(f"[WARNING] Could not update cache manifest: {e}")
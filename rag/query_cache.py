@@ -0,0 +1,138 @@
+# rag/query_cache.py
+# Cache persistente (SQLite) das perguntas do "Ask the Mage": ids dos chunks
+# recuperados e resposta final, por pergunta normalizada + versão da base, e
+# (em outra tabela, com limite próprio) o embedding de cada pergunta.
+
+import json
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from contextlib import closing, contextmanager
+
+_PUNCT = re.compile(r"[^\w\s]")
+_SPACES = re.compile(r"\s+")
+
+
+def normalize_query(query):
+    """Case, accents, punctuation and spacing do not make a question different."""
+    text = unicodedata.normalize("NFKD", query.lower())
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return _SPACES.sub(" ", _PUNCT.sub(" ", text)).strip()
+
+
+@contextmanager
+def _connect(path):
+    with closing(sqlite3.connect(path, timeout=5)) as db:
+        with db:  # commit/rollback
+            yield db
+
+
+class QueryCache:
+    """LRU (max_entries) + TTL cache. Entries of another kb_version never match."""
+
+    def __init__(self, path, max_entries=500, ttl_seconds=7 * 24 * 3600):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        with self._connect() as db:
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS answers ("
+                " key TEXT PRIMARY KEY, kb_version TEXT, query TEXT,"
+                " chunk_ids TEXT, answer TEXT, created REAL, last_used REAL)"
+            )
+
+    def _connect(self):
+        return _connect(self.path)
+
+    def _key(self, query, kb_version):
+        return f"{kb_version}\0{normalize_query(query)}"
+
+    def get(self, query, kb_version):
+        """Returns {"chunk_ids": [...], "answer": str|None} or None; counts hit/miss."""
+        key = self._key(query, kb_version)
+        now = time.time()
+        with self._lock, self._connect() as db:
+            row = db.execute("SELECT chunk_ids, answer, created FROM answers WHERE key = ?",
+                             (key,)).fetchone()
+            if row is None or now - row[2] > self.ttl:
+                if row is not None:
+                    db.execute("DELETE FROM answers WHERE key = ?", (key,))
+                self.misses += 1
+                return None
+            db.execute("UPDATE answers SET last_used = ? WHERE key = ?", (now, key))
+            if row[1] is None:
+                # Só a recuperação ficou em cache (a geração falhou da última vez)
+                self.misses += 1
+            else:
+                self.hits += 1
+            return {"chunk_ids": json.loads(row[0]), "answer": row[1]}
+
+    def put(self, query, kb_version, chunk_ids, answer=None):
+        key = self._key(query, kb_version)
+        now = time.time()
+        with self._lock, self._connect() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO answers (key, kb_version, query, chunk_ids, answer, created, last_used)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, kb_version, query, json.dumps([int(i) for i in chunk_ids]), answer, now, now),
+            )
+            db.execute("DELETE FROM answers WHERE created < ?", (now - self.ttl,))
+            db.execute(
+                "DELETE FROM answers WHERE key NOT IN"
+                " (SELECT key FROM answers ORDER BY last_used DESC LIMIT ?)",
+                (self.max_entries,),
+            )
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0}
+
+
+class QueryVectorCache:
+    """
+    Query embeddings by (model, normalized question), LRU-capped at
+    max_entries. Kept apart from the chunk embedding store so questions
+    never grow or mix with the document vectors.
+    """
+
+    def __init__(self, path, max_entries=2000):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        with _connect(path) as db:
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS query_vectors ("
+                " key TEXT PRIMARY KEY, vector BLOB, last_used REAL)"
+            )
+
+    def _key(self, query, model):
+        return f"{model}\0{normalize_query(query)}"
+
+    def get(self, query, model):
+        """float32 vector, or None."""
+        import numpy as np
+        key = self._key(query, model)
+        with self._lock, _connect(self.path) as db:
+            row = db.execute("SELECT vector FROM query_vectors WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            db.execute("UPDATE query_vectors SET last_used = ? WHERE key = ?", (time.time(), key))
+        return np.frombuffer(row[0], dtype="float32").copy()
+
+    def put(self, query, model, vector):
+        import numpy as np
+        blob = np.ascontiguousarray(vector, dtype="float32").tobytes()
+        with self._lock, _connect(self.path) as db:
+            db.execute("INSERT OR REPLACE INTO query_vectors (key, vector, last_used) VALUES (?, ?, ?)",
+                       (self._key(query, model), blob, time.time()))
+            db.execute(
+                "DELETE FROM query_vectors WHERE key NOT IN"
+                " (SELECT key FROM query_vectors ORDER BY last_used DESC LIMIT ?)",
+                (self.max_entries,),
+            )
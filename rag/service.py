@@ -0,0 +1,231 @@
+# rag/service.py
+# Serviço de perguntas do "Ask the Mage": fila limitada + workers fixos em
+# threads daemon (uma chamada de rede travada nunca segura o processo na
+# saída), prazo por etapa (embed, search, generate) e cancelamento.
+
+import itertools
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+from rag.tracing import incr, observe, span
+
+STAGE_POLL = 0.1  # s entre checagens de cancelamento enquanto uma etapa roda
+
+
+class AskCancelled(Exception):
+    """The request was cancelled (window closed or service shut down)."""
+
+
+class StageTimeout(TimeoutError):
+    def __init__(self, stage, seconds):
+        super().__init__(f"stage '{stage}' exceeded {seconds:g}s")
+        self.stage = stage
+
+
+class DaemonExecutor:
+    """
+    Fixed pool of daemon threads over a queue. Same submit()/Future contract
+    as ThreadPoolExecutor, but shutdown never waits on a hung call.
+    max_pending=0 means an unbounded queue; otherwise submit() raises queue.Full.
+    """
+
+    def __init__(self, workers, name, max_pending=0):
+        self._jobs = queue.Queue()
+        self._max_pending = max_pending
+        self._closed = False
+        self._threads = [threading.Thread(target=self._run, name=f"{name}-{i}", daemon=True)
+                         for i in range(max(1, workers))]
+        for t in self._threads:
+            t.start()
+
+    def submit(self, fn, *args, **kwargs):
+        if self._closed:
+            raise RuntimeError("executor is shut down")
+        if self._max_pending and self._jobs.qsize() >= self._max_pending:
+            raise queue.Full()
+        future = Future()
+        self._jobs.put((future, fn, args, kwargs))
+        return future
+
+    def pending(self):
+        return self._jobs.qsize()
+
+    def _run(self):
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                return
+            future, fn, args, kwargs = job
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(fn(*args, **kwargs))
+            except BaseException as e:
+                future.set_exception(e)
+
+    def shutdown(self, timeout=None):
+        """Cancels queued jobs, stops the workers and waits up to `timeout` s for them."""
+        self._closed = True
+        while True:
+            try:
+                job = self._jobs.get_nowait()
+            except queue.Empty:
+                break
+            if job is not None:
+                job[0].cancel()
+        for _ in self._threads:
+            self._jobs.put(None)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for t in self._threads:
+            t.join(None if deadline is None else max(0.0, deadline - time.monotonic()))
+
+
+class AskRequest:
+    """
+    One question. Events ("route", route), ("chunk", text) and ("done", answer)
+    are read by the UI from `events`; stage()/stream() run the slow steps
+    with a deadline and give up as soon as the request is cancelled.
+    """
+
+    _ids = itertools.count(1)
+
+    def __init__(self, query, stages):
+        self.id = next(self._ids)
+        self.query = query
+        self.events = queue.Queue()
+        self.cancelled = threading.Event()
+        self.finished = False
+        self.submitted = time.perf_counter()
+        self._stages = stages
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def emit(self, kind, payload):
+        if self.cancelled.is_set():
+            raise AskCancelled()
+        if kind == "done":
+            self.finished = True
+        self.events.put((kind, payload))
+
+    def check(self):
+        if self.cancelled.is_set():
+            raise AskCancelled()
+
+    def stage(self, name, fn, *args, timeout):
+        """
+        fn(*args) in the stage pool; StageTimeout after `timeout` s. The call
+        itself is not interrupted: fn must bound its own I/O (client timeouts).
+        """
+        self.check()
+        future = self._stages.submit(fn, *args)
+        deadline = time.monotonic() + timeout
+        while True:
+            left = deadline - time.monotonic()
+            if left <= 0:
+                future.cancel()
+                incr(f"ask.timeouts.{name}")
+                raise StageTimeout(name, timeout)
+            try:
+                return future.result(timeout=min(STAGE_POLL, left))
+            except FutureTimeout:
+                if self.cancelled.is_set():
+                    future.cancel()
+                    raise AskCancelled()
+
+    def stream(self, name, fn, *args, first_timeout, timeout):
+        """
+        Iterates fn(*args) in the stage pool and yields its pieces here. The
+        first piece must arrive within `first_timeout` s, the whole stream
+        within `timeout` s.
+        """
+        self.check()
+        pieces = queue.Queue()
+        end = object()
+
+        def produce():
+            try:
+                for piece in fn(*args):
+                    if self.cancelled.is_set():
+                        break
+                    pieces.put(piece)
+            finally:
+                pieces.put(end)
+
+        self._stages.submit(produce)
+        start = time.monotonic()
+        got_first = False
+        while True:
+            limit = timeout if got_first else min(first_timeout, timeout)
+            left = start + limit - time.monotonic()
+            if left <= 0:
+                incr(f"ask.timeouts.{name}")
+                raise StageTimeout(name, limit)
+            try:
+                piece = pieces.get(timeout=min(STAGE_POLL, left))
+            except queue.Empty:
+                self.check()
+                continue
+            if piece is end:
+                return
+            got_first = True
+            yield piece
+
+
+class AskService:
+    """
+    Runs handler(request) for each submitted question on `workers` threads.
+    At most `max_pending` questions wait in the queue; more raise queue.Full.
+    """
+
+    def __init__(self, handler, workers=2, max_pending=8, stage_workers=None):
+        self.handler = handler
+        self._workers = DaemonExecutor(workers, "ask", max_pending=max_pending)
+        # Etapas rodam à parte para poderem estourar o prazo sem travar o worker.
+        # A thread de uma etapa abandonada segue ocupada até a chamada de rede
+        # voltar (limitada pelo timeout do cliente), daí a folga no pool.
+        self._stages = DaemonExecutor(stage_workers or workers * 2, "ask-stage")
+        self._active = set()
+        self._lock = threading.Lock()
+
+    def submit(self, query):
+        request = AskRequest(query, self._stages)
+        with self._lock:
+            self._workers.submit(self._run, request)
+            self._active.add(request)
+        return request
+
+    def pending(self):
+        """Questions submitted and not answered yet."""
+        with self._lock:
+            return len(self._active)
+
+    def _run(self, request):
+        observe("ask.queue_wait", (time.perf_counter() - request.submitted) * 1000)
+        try:
+            with span("ask"):
+                self.handler(request)
+        except AskCancelled:
+            incr("ask.cancelled")
+        except Exception as e:
+            incr("ask.errors")
+            print(f"[ERROR] Ask the Mage: {e}")
+        finally:
+            with self._lock:
+                self._active.discard(request)
+            if not request.finished and not request.cancelled.is_set():
+                from rag.gemini import ERROR_ANSWER
+                request.emit("done", ERROR_ANSWER)
+
+    def cancel_all(self):
+        with self._lock:
+            active = list(self._active)
+        for request in active:
+            request.cancel()
+
+    def shutdown(self, timeout=2.0):
+        self.cancel_all()
+        self._workers.shutdown(timeout)
+        self._stages.shutdown(0)
@@ -0,0 +1,153 @@
+# rag/tracing.py
+# Instrumentação leve (só stdlib): spans com tempo, contadores e histogramas
+# em memória. Exporta para JSON/CSV e alimenta o painel de diagnóstico do app.
+
+import csv
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# Limites superiores dos baldes do histograma (ms); o último é "acima disso"
+BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+SAMPLES = 512       # amostras recentes por span, para os percentis
+RECENT_SPANS = 200  # últimos spans (com pai e erro) guardados para o painel
+
+
+class Histogram:
+    """Latencies of one span name: totals, fixed buckets and the last SAMPLES values."""
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+        self.buckets = [0] * (len(BUCKETS_MS) + 1)
+        self.samples = deque(maxlen=SAMPLES)
+
+    def add(self, ms, error=False):
+        self.count += 1
+        self.errors += bool(error)
+        self.total += ms
+        self.min = ms if self.min is None else min(self.min, ms)
+        self.max = ms if self.max is None else max(self.max, ms)
+        k = 0
+        while k < len(BUCKETS_MS) and ms > BUCKETS_MS[k]:
+            k += 1
+        self.buckets[k] += 1
+        self.samples.append(ms)
+
+    def percentile(self, p):
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))]
+
+    def summary(self):
+        return {
+            "count": self.count, "errors": self.errors,
+            "mean_ms": self.total / self.count if self.count else None,
+            "p50_ms": self.percentile(50), "p95_ms": self.percentile(95),
+            "min_ms": self.min, "max_ms": self.max, "total_ms": self.total,
+            "buckets": dict(zip([f"<={b}" for b in BUCKETS_MS] + [f">{BUCKETS_MS[-1]}"], self.buckets)),
+        }
+
+
+class Tracer:
+    """
+    span("search") times a block (nested spans remember their parent),
+    timed("search") does the same for a function, observe() records a
+    duration measured elsewhere and incr() bumps a counter. Thread-safe.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.histograms = {}
+            self.counters = {}
+            self.recent = deque(maxlen=RECENT_SPANS)
+            self.started = time.time()
+
+    def observe(self, name, ms, error=False, parent=None):
+        with self._lock:
+            hist = self.histograms.get(name)
+            if hist is None:
+                hist = self.histograms[name] = Histogram()
+            hist.add(ms, error)
+            self.recent.append({"name": name, "parent": parent, "end": time.time(),
+                                "ms": ms, "error": bool(error)})
+
+    def incr(self, name, n=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    @contextmanager
+    def span(self, name):
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        parent = stack[-1] if stack else None
+        stack.append(name)
+        t0 = time.perf_counter()
+        error = False
+        try:
+            yield
+        except BaseException:
+            error = True
+            raise
+        finally:
+            stack.pop()
+            self.observe(name, (time.perf_counter() - t0) * 1000, error, parent)
+
+    def timed(self, name):
+        def wrap(fn):
+            @functools.wraps(fn)
+            def inner(*args, **kwargs):
+                with self.span(name):
+                    return fn(*args, **kwargs)
+            return inner
+        return wrap
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "started": self.started,
+                "exported": time.time(),
+                "spans": {name: h.summary() for name, h in sorted(self.histograms.items())},
+                "counters": dict(sorted(self.counters.items())),
+                "recent": list(self.recent),
+            }
+
+    def export(self, path):
+        """Writes the snapshot as JSON, or as CSV (one row per span, then counters) for a .csv path."""
+        snap = self.snapshot()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        if path.lower().endswith(".csv"):
+            fields = ["count", "errors", "mean_ms", "p50_ms", "p95_ms", "min_ms", "max_ms", "total_ms"]
+            with open(path, "w", newline="", encoding="utf-8") as f:
+                w = csv.writer(f)
+                w.writerow(["kind", "name"] + fields + [f"le_{b}ms" for b in BUCKETS_MS] + ["over"])
+                for name, s in snap["spans"].items():
+                    values = [round(s[k], 3) if isinstance(s[k], float) else s[k] for k in fields]
+                    w.writerow(["span", name] + values + list(s["buckets"].values()))
+                for name, n in snap["counters"].items():
+                    w.writerow(["counter", name, n])
+        else:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(snap, f, indent=2)
+        return path
+
+
+TRACER = Tracer()
+span = TRACER.span
+timed = TRACER.timed
+observe = TRACER.observe
+incr = TRACER.incr
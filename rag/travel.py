@@ -0,0 +1,224 @@
+# rag/travel.py
+# Rotas de viagem calculadas localmente: grafo de locais do mapa com arestas a pé
+# (distância × terreno) e de carruagem, Dijkstra com cache por origem.
+
+import heapq
+import math
+import re
+import unicodedata
+
+WALK_NEIGHBORS = 4          # vizinhos mais próximos ligados a pé, por local
+WALK_HOURS_PER_PX = 0.02    # horas de jogo por px do mapa andando (aprox.)
+CARRIAGE_HOURS_PER_PX = 0.012
+CARRIAGE_BOARDING_HOURS = 0.5
+
+# Estábulos com carruagem: as cinco cidades grandes, que levam a qualquer capital de hold
+CARRIAGE_STATIONS = ("Whiterun", "Solitude", "Windhelm", "Riften", "Markarth")
+
+# Multiplicador de terreno por local (neve, montanha); 1.0 = estrada comum
+TERRAIN = {
+    "Winterhold": 1.35,
+    "Dawnstar": 1.25,
+    "Markarth": 1.25,
+    "Windhelm": 1.15,
+    "Morthal": 1.15,  # pântano
+}
+
+# Palavras logo antes de um local que dizem se ele é origem ou destino (inglês e português)
+_FROM_CUE = re.compile(r"\b(?:from|leaving|de|desde)\s+(?:the\s+)?$")
+_TO_CUE = re.compile(r"\b(?:to|towards?|into|reach|para|pra|ate|(?:chegar|ir|vou|voltar) a)\s+(?:the\s+)?$")
+# Só perguntas de viagem ganham rota; "Whiterun é mais segura que Riften?" não
+_TRAVEL_INTENT = re.compile(
+    r"\b(?:travel\w*|routes?|journey|get(?:ting)? (?:to|from)|go(?:ing)? (?:to|from)|head(?:ing)? (?:to|from)"
+    r"|how far|how long (?:to|does it take)|distance|carriages?|walk(?:ing)? (?:to|from)"
+    r"|viage\w*|viajar|rotas?|caminho|carruage\w*|distancia|quanto tempo|(?:ir|chegar|andar) (?:de|ate|a|em|para))\b")
+
+
+def _fold(text):
+    text = unicodedata.normalize("NFKD", text.lower())
+    return "".join(ch for ch in text if not unicodedata.combining(ch))
+
+
+class Route:
+    def __init__(self, nodes, legs, hours):
+        self.nodes = nodes  # nomes, da origem ao destino
+        self.points = []    # coordenadas no mapa de cada nó, para desenhar
+        self.legs = legs    # [(de, para, "walk"|"carriage", horas)]
+        self.hours = hours
+
+    def describe(self):
+        parts = []
+        for a, b, mode, hours in self.legs:
+            verb = "carriage" if mode == "carriage" else "walk"
+            parts.append(f"{verb} {a} -> {b} (~{hours:.1f} h)")
+        return "; ".join(parts) + f". Total ~{self.hours:.1f} in-game hours."
+
+
+class TravelGraph:
+    """
+    Nodes are map locations {name: (x, y)}. Walking edges connect every
+    location with its WALK_NEIGHBORS nearest ones (both ways); carriage edges
+    go from each station to every other location. Shortest-path trees are
+    cached per (source, mode), so repeated questions cost a dict lookup.
+    """
+
+    def __init__(self, locations, stations=CARRIAGE_STATIONS, terrain=TERRAIN):
+        self.names = list(locations)
+        self.coords = [tuple(map(float, locations[n])) for n in self.names]
+        self._id = {n: i for i, n in enumerate(self.names)}
+        self._folded = sorted(((_fold(n), n) for n in self.names), key=lambda t: -len(t[0]))
+        n = len(self.names)
+        self.walk = [[] for _ in range(n)]
+        self.carriage = [[] for _ in range(n)]
+        self._trees = {}
+
+        factor = [terrain.get(name, 1.0) for name in self.names]
+        for i in range(n):
+            near = sorted((self._dist(i, j), j) for j in range(n) if j != i)[:WALK_NEIGHBORS]
+            for d, j in near:
+                hours = d * WALK_HOURS_PER_PX * (factor[i] + factor[j]) / 2
+                self._add(self.walk, i, j, hours)
+                self._add(self.walk, j, i, hours)
+        for station in stations:
+            s = self._id.get(station)
+            if s is None:
+                continue
+            for j in range(n):
+                if j != s:
+                    hours = CARRIAGE_BOARDING_HOURS + self._dist(s, j) * CARRIAGE_HOURS_PER_PX
+                    self._add(self.carriage, s, j, hours)
+
+    def _dist(self, i, j):
+        (x1, y1), (x2, y2) = self.coords[i], self.coords[j]
+        return math.hypot(x2 - x1, y2 - y1)
+
+    @staticmethod
+    def _add(adj, i, j, hours):
+        for k, (to, _) in enumerate(adj[i]):
+            if to == j:
+                adj[i][k] = (j, min(hours, adj[i][k][1]))
+                return
+        adj[i].append((j, hours))
+
+    def _tree(self, source, mode):
+        key = (source, mode)
+        tree = self._trees.get(key)
+        if tree is not None:
+            return tree
+        n = len(self.names)
+        dist = [math.inf] * n
+        prev = [None] * n  # (nó anterior, modo da perna)
+        dist[source] = 0.0
+        heap = [(0.0, source)]
+        while heap:
+            d, i = heapq.heappop(heap)
+            if d > dist[i]:
+                continue
+            edges = [(j, h, "walk") for j, h in self.walk[i]]
+            if mode == "any":
+                edges += [(j, h, "carriage") for j, h in self.carriage[i]]
+            for j, h, leg in edges:
+                nd = d + h
+                if nd < dist[j]:
+                    dist[j] = nd
+                    prev[j] = (i, leg)
+                    heapq.heappush(heap, (nd, j))
+        tree = self._trees[key] = (dist, prev)
+        return tree
+
+    def route(self, origin, destination, mode="any"):
+        """Fastest route by mode "walk" or "any" (walk + carriage); None if unknown/unreachable."""
+        s, t = self._id.get(origin), self._id.get(destination)
+        if s is None or t is None or s == t:
+            return None
+        dist, prev = self._tree(s, mode)
+        if math.isinf(dist[t]):
+            return None
+        legs = []
+        j = t
+        while j != s:
+            i, leg = prev[j]
+            legs.append((self.names[i], self.names[j], leg, dist[j] - dist[i]))
+            j = i
+        legs.reverse()
+        route = Route([self.names[s]] + [b for _, b, _, _ in legs], legs, dist[t])
+        route.points = [self.coords[self._id[name]] for name in route.nodes]
+        return route
+
+    def _mentions(self, text):
+        # [(posição, nome)] na ordem do texto; o texto dobrado volta junto para ler o contexto
+        folded = _fold(text)
+        original = folded
+        found = []
+        for key, name in self._folded:  # nomes longos primeiro
+            m = re.search(r"\b" + re.escape(key) + r"\b", folded)
+            if m:
+                found.append((m.start(), name))
+                folded = folded[:m.start()] + " " * len(key) + folded[m.end():]
+        return sorted(found), original
+
+    def places_in(self, text):
+        """Known location names mentioned in `text`, in order of appearance."""
+        return [name for _, name in self._mentions(text)[0]]
+
+    def trip_in(self, text):
+        """
+        (origin, destination, sure) for the first two places in `text`. "from X" /
+        "de X" marks the origin and "to Y" / "para Y" the destination; without
+        either cue the order of mention is used and sure is False. None if fewer than two places.
+        """
+        found, folded = self._mentions(text)
+        if len(found) < 2:
+            return None
+        (pa, a), (pb, b) = found[:2]
+
+        def cue(pos):
+            before = folded[max(0, pos - 20):pos]
+            if _FROM_CUE.search(before):
+                return "from"
+            if _TO_CUE.search(before):
+                return "to"
+            return None
+        ca, cb = cue(pa), cue(pb)
+        if ca == "to" or cb == "from":
+            return b, a, True
+        if ca == "from" or cb == "to":
+            return a, b, True
+        return a, b, False
+
+    def routes_for_query(self, query):
+        """
+        [(walking route, fastest route)] for the trip named in `query`, origin to
+        destination; both directions when the wording does not say which. None
+        unless the question is about travelling ("route", "how far", "carriage",
+        ...) between two named, reachable places.
+        """
+        if not _TRAVEL_INTENT.search(_fold(query)):
+            return None
+        trip = self.trip_in(query)
+        if trip is None:
+            return None
+        origin, destination, sure = trip
+        legs = [(origin, destination)] if sure else [(origin, destination), (destination, origin)]
+        out = []
+        for a, b in legs:
+            walk = self.route(a, b, mode="walk")
+            fastest = self.route(a, b, mode="any")
+            if walk is not None or fastest is not None:
+                out.append((walk, fastest))
+        return out or None
+
+
+def travel_context(routes):
+    """Text block with the computed routes (routes_for_query output), for the prompt CONTEXT."""
+    lines = ["TRAVEL ROUTES (computed from the map):"]
+    for walk, fastest in routes:
+        trip = walk or fastest
+        lines.append(f"From {trip.nodes[0]} to {trip.nodes[-1]}:")
+        if walk is not None:
+            lines.append(f"- On foot: {walk.describe()}")
+        if fastest is not None and (walk is None or fastest.legs != walk.legs):
+            lines.append(f"- Fastest, using carriages: {fastest.describe()}")
+        elif fastest is not None:
+            lines.append("- No carriage makes this trip faster than walking.")
+    return "\n".join(lines)
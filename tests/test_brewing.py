@@ -0,0 +1,27 @@
+# tests/test_brewing.py
+# Otimizador de preparo: o limite do modo efeito precisa podar e provar o ótimo.
+
+from app.brewing import optimize_brewing, parse_counts
+from app.recipe_table import get_recipe_table
+
+INVENTORY = ("Lavender x8, Garlic x6, Large Antlers x4, Bee x5, Honeycomb x3, Blue Mountain Flower x7, "
+             "Wheat x5, Salt Pile x6, Snowberries x5, Juniper Berries x4, Hawk Beak x3, Creep Cluster x4")
+
+
+def test_effect_mode_prunes_and_proves_optimal():
+    counts, unknown = parse_counts(INVENTORY)
+    assert not unknown
+    result = optimize_brewing(get_recipe_table(), counts, effect="Fortify Stamina", time_budget=5)
+    stats = result["stats"]
+    assert stats["pruned"] > 0
+    assert stats["optimal"] and not stats["timed_out"]
+    assert result["total"] >= stats["greedy_total"]
+
+
+def test_effect_mode_brews_as_many_pairs_as_the_stock_allows():
+    # Os três têm Fortify Stamina: 7 unidades, 2 por preparo -> 3 preparos de mesma magnitude
+    counts, _ = parse_counts("Lavender x2, Garlic x3, Large Antlers x2")
+    result = optimize_brewing(get_recipe_table(), counts, effect="Fortify Stamina", time_budget=5)
+    assert sum(times for _, times, _ in result["plan"]) == 3
+    assert result["total"] == 3 * result["plan"][0][2]
+    assert result["stats"]["optimal"]
@@ -0,0 +1,85 @@
+# tests/test_embedder.py
+# EmbeddingExecutor contra o FakeEmbedder: retries, backoff e retomada depois
+# de falha parcial, sem rede e sem dormir de verdade.
+
+import numpy as np
+
+from rag.embed_store import EmbeddingStore
+from rag.embedder import EmbeddingExecutor, FakeEmbedder
+
+TEXTS = [f"chunk {i}" for i in range(40)]
+
+
+def make_store(tmp_path):
+    return EmbeddingStore(str(tmp_path), "fake-model")
+
+
+def test_retries_injected_failures_until_everything_is_stored(tmp_path):
+    store = make_store(tmp_path)
+    fake = FakeEmbedder(dim=8, error_rate=0.3, rate_limit_rate=0.15, seed=3)
+    sleeps = []
+    executor = EmbeddingExecutor(fake, store, max_workers=3, batch_size=8, min_batch_size=2,
+                                 max_retries=20, sleep=sleeps.append)
+
+    failed = executor.run(TEXTS)
+
+    assert failed == []
+    assert executor.stats["embedded"] == len(TEXTS)
+    assert executor.stats["retries"] > 0
+    assert executor.stats["rate_limited"] > 0
+    assert sleeps and all(s > 0 for s in sleeps)
+    np.testing.assert_array_equal(store.get_many(TEXTS), np.array([fake.vector(t) for t in TEXTS]))
+
+
+def test_backoff_grows_exponentially_with_jitter(tmp_path):
+    store = make_store(tmp_path)
+    fake = FakeEmbedder(dim=4)
+    failures = {"left": 3}
+
+    def flaky(batch):
+        if failures["left"]:
+            failures["left"] -= 1
+            raise RuntimeError("transient")
+        return fake(batch)
+
+    sleeps = []
+    executor = EmbeddingExecutor(flaky, store, max_workers=1, batch_size=4, max_retries=5,
+                                 base_delay=1.0, max_delay=30.0, sleep=sleeps.append)
+
+    assert executor.run(TEXTS[:4]) == []
+    # tentativa n espera base * 2^(n-1), com jitter entre 0.5x e 1.5x
+    assert len(sleeps) == 3
+    for attempt, delay in enumerate(sleeps, 1):
+        nominal = 2 ** (attempt - 1)
+        assert 0.5 * nominal <= delay <= 1.5 * nominal
+
+
+def test_partial_failure_is_checkpointed_and_resumed(tmp_path):
+    bad = {"chunk 5", "chunk 17"}
+    fake = FakeEmbedder(dim=8)
+
+    def rejects_bad(batch):
+        if bad & set(batch):
+            raise RuntimeError("bad input")
+        return fake(batch)
+
+    store = make_store(tmp_path)
+    executor = EmbeddingExecutor(rejects_bad, store, max_workers=2, batch_size=8, min_batch_size=1,
+                                 max_retries=4, sleep=lambda s: None)
+    failed = executor.run(TEXTS)
+
+    # Lotes que falham são divididos até isolar os textos ruins; o resto fica salvo
+    assert set(failed) == bad
+    assert set(store.missing(TEXTS)) == bad
+
+    # Nova execução (outro processo: store reaberto do disco) só embeda o que faltou
+    embedded = []
+
+    def healthy(batch):
+        embedded.extend(batch)
+        return fake(batch)
+
+    store = make_store(tmp_path)
+    assert EmbeddingExecutor(healthy, store, sleep=lambda s: None).run(TEXTS) == []
+    assert set(embedded) == bad
+    np.testing.assert_array_equal(store.get_many(TEXTS), np.array([fake.vector(t) for t in TEXTS]))
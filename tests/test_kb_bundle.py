@@ -0,0 +1,42 @@
+# tests/test_kb_bundle.py
+# Pacote da base de conhecimento: pack -> install devolve o mesmo cache.
+
+import json
+import os
+import zipfile
+
+from rag.kb_bundle import BUNDLE_FILES, install, pack
+from rag.manifest import MANIFEST_FILE
+
+
+def fake_cache(path):
+    os.makedirs(path)
+    for name in BUNDLE_FILES:
+        with open(os.path.join(path, name), "wb") as f:
+            f.write(name.encode())
+    manifest = {"files": {os.path.join("files", "guide.pdf"): {"sha": "x"}}}
+    with open(os.path.join(path, MANIFEST_FILE), "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+
+
+def test_pack_install_round_trip(tmp_path):
+    src, dst = str(tmp_path / "src"), str(tmp_path / "dst")
+    fake_cache(src)
+    bundle = pack(src, str(tmp_path / "kb.zip"))
+    with zipfile.ZipFile(bundle) as z:
+        assert "files/guide.pdf" in json.loads(z.read(MANIFEST_FILE))["files"]
+
+    assert install(bundle, dst)
+    for name in BUNDLE_FILES:
+        if name != MANIFEST_FILE:
+            assert open(os.path.join(dst, name), "rb").read() == name.encode()
+    with open(os.path.join(dst, MANIFEST_FILE), encoding="utf-8") as f:
+        assert list(json.load(f)["files"]) == [os.path.join("files", "guide.pdf")]
+
+
+def test_install_rejects_foreign_zip(tmp_path):
+    bundle = str(tmp_path / "other.zip")
+    with zipfile.ZipFile(bundle, "w") as z:
+        z.writestr("readme.txt", "not a knowledge base")
+    assert not install(bundle, str(tmp_path / "dst"))
+    assert not os.path.exists(tmp_path / "dst" / MANIFEST_FILE)
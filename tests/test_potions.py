@@ -0,0 +1,66 @@
+# tests/test_potions.py
+# Avaliador de poções contra valores conhecidos da UESP (Alchemy 15, sem perks).
+
+import numpy as np
+
+from app.potions import describe_potion, evaluate
+from app.recipe_table import get_recipe_table
+from data.ingredients import INGREDIENT_NAMES
+
+
+def row_of(table, *names):
+    ids = sorted(INGREDIENT_NAMES.index(n) for n in names)
+    ids += [-1] * (3 - len(ids))
+    hit = np.flatnonzero((np.sort(table.combo, axis=1)[:, ::-1] == sorted(ids, reverse=True)).all(axis=1))
+    assert len(hit) == 1
+    return int(hit[0])
+
+
+def effect_line(report, effect):
+    return next(line for line in report[1] if line[0] == effect)
+
+
+def test_giants_toe_fortify_health_override():
+    # Fortify Health: 4 pts x 4.3 -> 17 pts por 60 s; custo 0.35, e o Giant's Toe vale 2.5x
+    base = 0.35 * 17 ** 1.1 * (60 / 10) ** 1.1
+    _, mag, dur, value = effect_line(describe_potion(["Giant's Toe", "Wheat"]), "Fortify Health")
+    assert (mag, dur) == (17, 60)
+    assert int(value) == int(2.5 * base) == 141
+
+    # Sem o Giant's Toe o mesmo efeito fica no valor base
+    _, _, _, plain = effect_line(describe_potion(["Wheat", "Blue Mountain Flower"]), "Fortify Health")
+    assert int(plain) == int(base) == 56
+
+
+def test_evaluate_uses_strongest_ingredient_per_effect():
+    table = get_recipe_table()
+    row = row_of(table, "Crimson Nirnroot", "Nirnroot")
+    ev = evaluate(table, [row], effect="Damage Stamina")
+    # Damage Stamina 3 pts, x3 no Crimson Nirnroot: floor(9 * 4.3 + 0.5) = 39
+    assert ev["magnitude"][0] == 39
+    _, mag, _, _ = effect_line(describe_potion(["Crimson Nirnroot", "Nirnroot"]), "Damage Stamina")
+    assert mag == 39
+
+    # Dois ingredientes mais fracos que a base: vale o menos fraco (0.6x contra 0.4x)
+    _, mag, _, _ = effect_line(describe_potion(["Blisterwort", "Eye of Sabre Cat"]), "Restore Health")
+    assert mag == 13
+
+
+def test_evaluate_matches_describe_potion():
+    table = get_recipe_table()
+    for names in (("Giant's Toe", "Wheat"), ("Crimson Nirnroot", "Nirnroot"),
+                  ("Blue Mountain Flower", "Giant's Toe", "Wheat")):
+        ev = evaluate(table, [row_of(table, *names)])
+        assert ev["value"][0] == describe_potion(list(names))[2]
+
+
+def test_total_is_sum_of_whole_effect_values():
+    kind, effects, total = describe_potion(["Blue Mountain Flower", "Wheat"])
+    assert all(isinstance(v, int) for _, _, _, v in effects)
+    assert total == sum(v for _, _, _, v in effects)
+
+
+def test_same_ingredient_twice_is_not_a_potion():
+    assert describe_potion(["Wheat", "Wheat"]) is None
+    assert describe_potion(["Wheat", "Wheat", "Blue Mountain Flower"]) == \
+        describe_potion(["Wheat", "Blue Mountain Flower"])
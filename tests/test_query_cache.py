@@ -0,0 +1,29 @@
+# tests/test_query_cache.py
+# Vetores das perguntas: tabela própria no SQLite, com limite LRU.
+
+import numpy as np
+
+from rag.query_cache import QueryCache, QueryVectorCache
+
+
+def test_query_vectors_are_lru_capped(tmp_path):
+    path = str(tmp_path / "q.sqlite")
+    cache = QueryVectorCache(path, max_entries=2)
+    cache.put("Where is Whiterun?", "m", np.ones(4))
+    cache.put("Who is Ulfric?", "m", np.zeros(4))
+    cache.get("where is whiterun", "m")  # normalizada; vira a mais recente
+    cache.put("What is a Nirnroot?", "m", np.full(4, 2.0))
+
+    assert cache.get("Who is Ulfric?", "m") is None
+    np.testing.assert_array_equal(cache.get("Where is Whiterun?", "m"), np.ones(4, dtype="float32"))
+    assert cache.get("Where is Whiterun?", "other-model") is None
+
+
+def test_query_vectors_share_the_file_with_answers(tmp_path):
+    path = str(tmp_path / "q.sqlite")
+    answers = QueryCache(path)
+    vectors = QueryVectorCache(path)
+    answers.put("Where is Whiterun?", "kb1", [1, 2], "In the center of Skyrim.")
+    vectors.put("Where is Whiterun?", "m", np.ones(3))
+    assert answers.get("Where is Whiterun?", "kb1")["answer"] == "In the center of Skyrim."
+    assert vectors.get("Where is Whiterun?", "m").shape == (3,)